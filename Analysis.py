@@ -0,0 +1,280 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a post-game analyser for Xiangqi. Every ply of a
+#              game is searched by the Engine in a pool of worker
+#              processes, each rebuilding its positions by replaying the
+#              move prefix with XiangqiGame.make_move(). The report gives
+#              per-move scores, the engine's best alternative and flags
+#              moves that lost too much against it as blunders.
+
+import multiprocessing
+
+from Engine import Engine
+from XiangqiGame import XiangqiGame, AlgNot, Error
+
+
+class GameAnalyser:
+    """Class to analyse whole games in parallel.
+
+    Plies are split into contiguous chunks, one task per chunk, so each
+    worker only replays the moves before its chunk once and then walks
+    through the chunk move by move. The player to move in each position
+    gets:
+        - the engine's best move and its score,
+        - the score of the move played, from the same root search limited
+          to that move and to the depth the best move's search completed,
+        - the loss (best score less played score) and whether it is a
+          blunder.
+    Scores are from the point of view of the player making the move (see
+    Engine.search()).
+    """
+    # Class level constants
+    _DEFAULT_BLUNDER_MARGIN = 50  # Points, a soldier is worth 10.
+    _CHUNKS_PER_PROCESS = 4
+
+    def __init__(self, engine_config=None, processes=None,
+                 blunder_margin=_DEFAULT_BLUNDER_MARGIN):
+        """Create an analyser.
+
+        Parameters
+        ----------
+        engine_config: dict
+            Keyword arguments for Engine.__init__(). None for the defaults.
+        processes: int
+            Number of worker processes. If None uses the CPU count.
+        blunder_margin: int
+            Moves losing at least this many points against the best move
+            are flagged as blunders.
+        """
+        self._engine_config = {} if engine_config is None else engine_config
+        self._processes = (multiprocessing.cpu_count() if processes is None
+                           else processes)
+        self._blunder_margin = blunder_margin
+
+    def analyse_game(self, moves, depth=None, movetime=None, start_fen=None):
+        """Analyse every ply of a game.
+
+        Raises
+        ------
+        IllegalGameMoveError:
+            When a move of the game is illegal. Nothing is analysed.
+
+        Parameters
+        ----------
+        moves: sequence of tuple of str
+            Size 2 tuples (alg_start, alg_end) in the order they were played.
+        depth: int
+            Search depth per position (see Engine.search()).
+        movetime: float
+            Seconds to search per position. If neither depth nor movetime
+            is given the engine's default depth is used.
+        start_fen: str
+            FEN of the start position. None for the standard start.
+
+        Returns
+        -------
+        list of dict
+            One dictionary per ply with keys 'ply', 'color', 'move',
+            'score', 'best_move', 'best_score', 'loss' and 'blunder'. Moves
+            are size 2 tuples of algebraic notation strings.
+        """
+        moves = [tuple(move) for move in moves]
+        GameAnalyser.replay(moves, start_fen)  # Check the moves up front.
+        if len(moves) == 0:
+            return []
+
+        limits = {'depth': depth, 'movetime': movetime}
+        chunk_size = -(-len(moves) // (self._processes
+                                       * GameAnalyser._CHUNKS_PER_PROCESS))
+        tasks = [(moves, start_fen, first, min(first + chunk_size, len(moves)),
+                  limits)
+                 for first in range(0, len(moves), chunk_size)]
+
+        report = []
+        with multiprocessing.Pool(self._processes, initializer=_init_worker,
+                                  initargs=(self._engine_config,)) as pool:
+            for chunk in pool.imap(_analyse_chunk, tasks):
+                report += chunk
+
+        for entry in report:
+            entry['loss'] = max(entry['best_score'] - entry['score'], 0)
+            entry['blunder'] = entry['loss'] >= self._blunder_margin
+        return report
+
+    @staticmethod
+    def replay(moves, start_fen=None):
+        """Replay moves with XiangqiGame.make_move().
+
+        Raises
+        ------
+        IllegalGameMoveError:
+            When a move is illegal.
+
+        Parameters
+        ----------
+        moves: sequence of tuple of str
+            Size 2 tuples (alg_start, alg_end).
+        start_fen: str
+            FEN of the start position. None for the standard start.
+
+        Returns
+        -------
+        XiangqiGame
+            Game with every move made.
+        """
+        game = XiangqiGame()
+        if start_fen is not None:
+            game.set_fen(start_fen)
+        for ply, (alg_start, alg_end) in enumerate(moves):
+            if not game.make_move(alg_start, alg_end):
+                raise IllegalGameMoveError(ply, alg_start, alg_end)
+        return game
+
+    @staticmethod
+    def format_report(report):
+        """Format an analysis as text, one line per ply.
+
+        Parameters
+        ----------
+        report: list of dict
+            Result of analyse_game().
+
+        Returns
+        -------
+        str
+            Report text.
+        """
+        lines = []
+        for entry in report:
+            move = '-'.join(entry['move'])
+            line = (f"{entry['ply'] + 1:4d}. {entry['color']:5s} {move:8s} "
+                    f"{entry['score']:7d}")
+            if entry['move'] != entry['best_move']:
+                best = '-'.join(entry['best_move'])
+                line += f"  best {best} {entry['best_score']}"
+            if entry['blunder']:
+                line += '  ??'
+            lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+
+def analyse_game(moves, depth=None, movetime=None, start_fen=None,
+                 engine_config=None, processes=None):
+    """Analyse every ply of a game with a GameAnalyser. See
+    GameAnalyser.__init__() and GameAnalyser.analyse_game()."""
+    analyser = GameAnalyser(engine_config, processes)
+    return analyser.analyse_game(moves, depth, movetime, start_fen)
+
+
+# Per process state of the worker processes (see _init_worker()).
+_worker = {}
+
+
+def _init_worker(engine_config):
+    """Worker initializer. Create the worker's engine."""
+    _worker['engine'] = Engine(**engine_config)
+
+
+def _analyse_chunk(task):
+    """Worker task. Analyse a contiguous range of plies of a game.
+
+    Parameters
+    ----------
+    task: tuple
+        Size 5 tuple (moves, start_fen, first, last, limits) where plies
+        first up to but not including last are analysed and limits are
+        keyword arguments for Engine.search().
+
+    Returns
+    -------
+    list of dict
+        One dictionary per ply (see GameAnalyser.analyse_game()) without
+        the 'loss' and 'blunder' keys.
+    """
+    moves, start_fen, first, last, limits = task
+    engine = _worker['engine']
+    game = GameAnalyser.replay(moves[:first], start_fen)
+    chunk = []
+
+    for ply in range(first, last):
+        color = game.get_mover().get_color()
+        best_move, best_score = engine.search(game, **limits)
+        depth = max(engine.get_completed_depth(), 1)
+        played = (AlgNot.alg_to_row_col(moves[ply][0]),
+                  AlgNot.alg_to_row_col(moves[ply][1]))
+
+        # The played move gets the same root search as the best move, to
+        # the depth that search completed, so the two scores compare.
+        if played == best_move:
+            score = best_score
+        else:
+            score = engine.search(game, depth=depth, root_moves=[played])[1]
+
+        # The engine scores any repetition as a draw. The game knows who
+        # is to blame for it (perpetual check or chase).
+        game.make_move(*moves[ply])
+        if game.get_game_state() == XiangqiGame.get_DRAW():
+            score = 0
+        elif game.get_game_state() == XiangqiGame.get_LOSS()[color]:
+            score = 1 - Engine.get_MATE_SCORE()
+        if played == best_move:
+            best_score = score
+
+        chunk.append({'ply': ply, 'color': color, 'move': moves[ply],
+                      'score': score,
+                      'best_move': (AlgNot.row_col_to_alg(best_move[0]),
+                                    AlgNot.row_col_to_alg(best_move[1])),
+                      'best_score': best_score})
+
+    return chunk
+
+
+class AnalysisError(Error):
+    """Base exception class for game analysis errors."""
+    pass
+
+
+class IllegalGameMoveError(AnalysisError):
+    """Exception class for a game to analyse containing an illegal move."""
+    def __init__(self, ply, alg_start, alg_end):
+        """Create an instance of IllegalGameMoveError."""
+        self._ply = ply
+        super().__init__(f'Move {alg_start}-{alg_end} at ply {ply} is '
+                         + 'illegal.')
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from OpeningBook import OpeningBookBuilder
+
+    parser = argparse.ArgumentParser(
+        description='Analyse a game given as <start>-<end> moves, e.g. '
+                    'h3-e3 h10-g8.')
+    parser.add_argument('moves', nargs='*',
+                        help='moves of the game (default: read from stdin)')
+    parser.add_argument('-d', '--depth', type=int, default=None)
+    parser.add_argument('-t', '--movetime', type=float, default=None,
+                        help='seconds per position')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--fen', default=None, help='start position')
+    parser.add_argument('--blunder-margin', type=int,
+                        default=GameAnalyser._DEFAULT_BLUNDER_MARGIN)
+    args = parser.parse_args()
+
+    tokens = args.moves if len(args.moves) > 0 else sys.stdin.read().split()
+    try:
+        game_moves = OpeningBookBuilder.parse_moves(' '.join(tokens))
+    except Error as err:
+        parser.error(str(err))
+
+    analyser = GameAnalyser(processes=args.processes,
+                            blunder_margin=args.blunder_margin)
+    try:
+        game_report = analyser.analyse_game(game_moves, args.depth,
+                                            args.movetime, args.fen)
+    except Error as err:
+        parser.error(str(err))
+    sys.stdout.write(GameAnalyser.format_report(game_report))
@@ -0,0 +1,573 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a batched random playout kernel for Xiangqi. Many
+#              independent games are stored as rows of a NumPy int8 array
+#              and advanced together, one ply per step: moves for every
+#              board are generated from a precomputed table of piece
+#              moves with array operations and random legal moves are
+#              applied in bulk. Used for MctsEngine leaf evaluation and
+#              for generating game data without a XiangqiGame per game.
+#              NumPy is optional for the rest of the package and only
+#              needed here.
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from Engine import Engine
+from XiangqiGame import Player, Error
+
+
+class BatchPlayouts:
+    """Class to play random games from many positions at once.
+
+    Boards are N x 90 int8 arrays indexed by row * 9 + col, always seen
+    from the player to move: its pieces are positive codes (see
+    BatchPlayouts.get_CODES()), the opponent's the same codes negated and 0
+    is an empty square. The player to move sits on rows 5 to 9, so a board
+    where black is to move is the real board turned half way round (square
+    s is square 89 - s). See BatchPlayouts.encode_game().
+
+    Each ply, for every board still playing:
+        1) pseudo legal moves are found by testing, for all pieces of all
+           boards at once, the entries of the move table (piece, start,
+           end, squares in between, number of those that must be occupied,
+           allowed end square contents) for the piece and its square,
+        2) the moves of each board are shuffled and tried in order until
+           one does not leave the mover's general attacked (including by
+           the facing general), the same rejection sampling as
+           MctsEngine.playout(),
+        3) a board without a legal move is lost by its mover (checkmate or
+           stalemate), the others are turned round for the opponent.
+    Boards still playing at the ply limit are adjudicated on material as
+    in MctsEngine. Repetitions are not tracked.
+    """
+    # Class level constants
+    _DEFAULT_MAX_PLIES = 60
+    _ROWS = 10
+    _COLS = 9
+    _SQUARES = _ROWS * _COLS
+
+    # Extra column appended to every board that is always empty. Unused
+    # slots of the between squares in the move table point to it.
+    _EMPTY_SQUARE = _SQUARES
+    _MAX_BETWEEN = 8
+
+    # Piece codes.
+    _CODES = {Player.get_GENERAL(): 1,
+              Player.get_ADVISOR(): 2,
+              Player.get_ELEPHANT(): 3,
+              Player.get_HORSE(): 4,
+              Player.get_CHARIOT(): 5,
+              Player.get_CANNON(): 6,
+              Player.get_SOLDIER(): 7}
+
+    # Allowed end square contents of a move table entry, as inclusive
+    # (lowest, highest) codes.
+    _TO_EMPTY_OR_ENEMY = (-7, 0)
+    _TO_EMPTY = (0, 0)
+    _TO_ENEMY = (-7, -1)
+    _TO_ENEMY_GENERAL = (-1, -1)
+
+    # Playouts reaching the ply limit are adjudicated by material: a lead
+    # of at least this many points (see Engine.get_PIECE_VALUES()) wins,
+    # anything less is a draw. Same as MctsEngine.
+    _ADJUDICATION_MARGIN = 40
+
+    # Results of a playout for the player to move at the start.
+    _WIN = 1.0
+    _DRAW = 0.5
+    _LOSS = 0.0
+
+    def __init__(self, max_plies=_DEFAULT_MAX_PLIES, seed=None):
+        """Create a kernel.
+
+        Raises
+        ------
+        NumpyMissingError:
+            When NumPy is not installed.
+
+        Parameters
+        ----------
+        max_plies: int
+            Playouts are stopped and adjudicated after this many plies.
+        seed: int
+            Seed for the random moves. None for a random seed.
+        """
+        if np is None:
+            raise NumpyMissingError()
+        self._max_plies = max_plies
+        self._rng = np.random.default_rng(seed)
+        self._ply_count = 0
+
+        (self._from, self._to, self._piece, self._lowest, self._highest,
+         self._between, self._screens) = BatchPlayouts.build_move_table()
+        self._moves = self.build_piece_table()
+        self._moves_to = self._to[self._moves]
+        self._moves_lowest = self._lowest[self._moves]
+        self._moves_highest = self._highest[self._moves]
+        self._attacks = self.build_attack_table()
+
+        # Turns a board round for the opponent: square s becomes 89 - s and
+        # the empty column stays put.
+        self._turn = np.append(np.arange(BatchPlayouts._SQUARES - 1, -1, -1),
+                               BatchPlayouts._EMPTY_SQUARE)
+
+        values = Engine.get_PIECE_VALUES()
+        self._values = np.zeros(15, dtype=np.int32)
+        for key, code in BatchPlayouts._CODES.items():
+            self._values[code] = values[key]
+            self._values[-code] = -values[key]
+
+    def get_ply_count(self):
+        """Getter. Return the number of plies made over all boards by the
+        last run()."""
+        return self._ply_count
+
+    def run(self, boards):
+        """Play random games from every board until they end or reach the
+        ply limit.
+
+        Parameters
+        ----------
+        boards: array_like
+            N x 90 boards as described in the class docstring. Not changed.
+
+        Returns
+        -------
+        numpy.ndarray
+            N results for the player to move on each board:
+            BatchPlayouts._WIN (1.0), BatchPlayouts._DRAW (0.5) or
+            BatchPlayouts._LOSS (0.0).
+        """
+        boards = np.asarray(boards, dtype=np.int8)
+        count = boards.shape[0]
+        boards = np.concatenate(
+            (boards, np.zeros((count, 1), dtype=np.int8)), axis=1)
+        results = np.full(count, BatchPlayouts._DRAW)
+        playing = np.arange(count)
+        self._ply_count = 0
+
+        for ply in range(self._max_plies):
+            if playing.size == 0:
+                break
+            moved, after = self.make_random_moves(boards[playing])
+
+            # The player to move at the start moves on even plies.
+            results[playing[~moved]] = (BatchPlayouts._LOSS if ply % 2 == 0
+                                        else BatchPlayouts._WIN)
+            playing = playing[moved]
+            boards[playing] = after[moved]
+            self._ply_count += playing.size
+
+        if playing.size > 0:
+            balance = self._values[boards[playing]].sum(axis=1)
+            if self._max_plies % 2 == 1:
+                balance = -balance
+            margin = BatchPlayouts._ADJUDICATION_MARGIN
+            results[playing[balance >= margin]] = BatchPlayouts._WIN
+            results[playing[balance <= -margin]] = BatchPlayouts._LOSS
+
+        return results
+
+    def play_game(self, game, count):
+        """Play random games from the current position of a game.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to play from. Not changed.
+        count: int
+            Number of games to play.
+
+        Returns
+        -------
+        numpy.ndarray
+            count results for the player to move (see run()).
+        """
+        board = BatchPlayouts.encode_game(game)
+        return self.run(np.repeat(board[None, :], count, axis=0))
+
+    def make_random_moves(self, boards):
+        """Make a random legal move on every board.
+
+        Parameters
+        ----------
+        boards: numpy.ndarray
+            N x 91 boards with the empty column.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Size 2 tuple (moved, after) where moved is N booleans, False
+            for boards without a legal move, and after holds the boards of
+            the moves made, turned round for the opponent (undefined where
+            moved is False).
+        """
+        count = boards.shape[0]
+        board_ids, entries = self.find_pseudo_moves(boards)
+
+        # Shuffle the moves of each board, keeping them grouped by board.
+        order = np.argsort(board_ids + self._rng.random(board_ids.size))
+        entries = entries[order]
+        counts = np.bincount(board_ids, minlength=count)
+        starts = np.cumsum(counts) - counts
+        tries = np.zeros(count, dtype=np.int64)
+
+        after = np.empty_like(boards)
+        pending = np.nonzero(counts > 0)[0]
+        while pending.size > 0:
+            moves = entries[starts[pending] + tries[pending]]
+            turned = self.make_moves(boards[pending], moves)
+            legal = ~self.find_attacked(turned)
+
+            after[pending[legal]] = turned[legal]
+            pending = pending[~legal]
+            tries[pending] += 1
+            pending = pending[tries[pending] < counts[pending]]
+
+        return tries < counts, after
+
+    def find_pseudo_moves(self, boards):
+        """Find every pseudo legal move of the player to move on every
+        board.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Size 2 tuple (board_ids, entries) of the same length where
+            entries are move table indices, sorted by board id.
+        """
+        # Only look at the entries of the pieces on each board. Squares are
+        # looked up in the flattened boards, which is much faster than
+        # indexing rows and columns.
+        width = boards.shape[1]
+        flat = boards.ravel()
+        piece_ids, squares = np.nonzero(boards[:, :-1] > 0)
+        slots = (boards[piece_ids, squares].astype(np.int64)
+                 * BatchPlayouts._SQUARES + squares)
+        targets = flat[(piece_ids * width)[:, None] + self._moves_to[slots]]
+        rows, cols = np.nonzero((targets >= self._moves_lowest[slots])
+                                & (targets <= self._moves_highest[slots]))
+        board_ids = piece_ids[rows]
+        entries = self._moves[slots[rows], cols]
+
+        between = flat[(board_ids * width)[:, None] + self._between[entries]]
+        keep = (np.count_nonzero(between, axis=1)
+                == self._screens[entries])
+        return board_ids[keep], entries[keep]
+
+    def make_moves(self, boards, entries):
+        """Make one move per board.
+
+        Parameters
+        ----------
+        boards: numpy.ndarray
+            N x 91 boards. Not changed.
+        entries: numpy.ndarray
+            N move table indices.
+
+        Returns
+        -------
+        numpy.ndarray
+            The boards after the moves, turned round for the opponent.
+        """
+        boards = boards.copy()
+        rows = np.arange(boards.shape[0])
+        boards[rows, self._to[entries]] = boards[rows, self._from[entries]]
+        boards[rows, self._from[entries]] = 0
+        return -boards[:, self._turn]
+
+    def find_attacked(self, boards):
+        """Predicate. For every board, True if the player to move can take
+        the opponent's general, i.e. the opponent's last move was illegal.
+
+        Returns
+        -------
+        numpy.ndarray
+            N booleans.
+        """
+        general = -BatchPlayouts._CODES[Player.get_GENERAL()]
+        width = boards.shape[1]
+        flat = boards.ravel()
+        targets = np.argmax(boards == general, axis=1)
+        entries = self._attacks[targets]      # N x attackers
+        offsets = np.arange(boards.shape[0]) * width
+
+        # Pieces standing where an attacker would, then their lines.
+        rows, cols = np.nonzero(flat[offsets[:, None] + self._from[entries]]
+                                == self._piece[entries])
+        entries = entries[rows, cols]
+        between = flat[offsets[rows, None] + self._between[entries]]
+        found = np.count_nonzero(between, axis=1) == self._screens[entries]
+
+        attacked = np.zeros(boards.shape[0], dtype=bool)
+        attacked[rows[found]] = True
+        return attacked
+
+    def build_piece_table(self):
+        """Group the move table entries by piece code and start square.
+
+        Returns
+        -------
+        numpy.ndarray
+            (8 * 90) x K move table indices, row code * 90 + square, padded
+            with the index of an entry that never matches.
+        """
+        never = self._from.size - 1
+        width = 0
+        groups = {}
+        for i in range(never):
+            key = (int(self._piece[i]), int(self._from[i]))
+            groups.setdefault(key, []).append(i)
+            width = max(width, len(groups[key]))
+
+        table = np.full((8 * BatchPlayouts._SQUARES, width), never,
+                        dtype=np.int64)
+        for (code, sq), group in groups.items():
+            table[code * BatchPlayouts._SQUARES + sq, :len(group)] = group
+        return table
+
+    def build_attack_table(self):
+        """Group the capturing move table entries by end square, for the
+        squares of the opponent's palace.
+
+        Returns
+        -------
+        numpy.ndarray
+            90 x K move table indices, padded with the index of an entry
+            that never matches.
+        """
+        never = self._from.size - 1
+        groups = [[] for _ in range(BatchPlayouts._SQUARES)]
+        for row in range(3):
+            for col in range(3, 6):
+                sq = row * BatchPlayouts._COLS + col
+                groups[sq] = np.nonzero((self._to == sq)
+                                        & (self._lowest < 0))[0].tolist()
+
+        width = max(len(group) for group in groups)
+        table = np.full((BatchPlayouts._SQUARES, width), never,
+                        dtype=np.int64)
+        for sq, group in enumerate(groups):
+            table[sq, :len(group)] = group
+        return table
+
+    @staticmethod
+    def build_move_table():
+        """Build the table of every move a piece of the player to move can
+        make on an empty board (see class docstring).
+
+        The last entry is a padding entry that never matches.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            Size 7 tuple (from, to, piece, lowest, highest, between,
+            screens) with one element (one row of _MAX_BETWEEN squares for
+            between) per entry. lowest and highest bound the contents of
+            the end square and screens is the number of between squares
+            that must be occupied.
+        """
+        rows, cols = BatchPlayouts._ROWS, BatchPlayouts._COLS
+        codes = BatchPlayouts._CODES
+        table = []
+
+        def on_board(row, col):
+            return 0 <= row < rows and 0 <= col < cols
+
+        def in_palace(row, col):
+            return 7 <= row <= 9 and 3 <= col <= 5
+
+        def add(kind, beg, end, to_range, between=(), screens=0):
+            table.append((beg[0] * cols + beg[1], end[0] * cols + end[1],
+                          codes[kind], to_range[0], to_range[1],
+                          [r * cols + c for r, c in between], screens))
+
+        orthogonal = ((-1, 0), (1, 0), (0, -1), (0, 1))
+        for row in range(rows):
+            for col in range(cols):
+                beg = (row, col)
+
+                # Chariots and cannons slide along ranks and files.
+                for d_row, d_col in orthogonal:
+                    between = []
+                    end = (row + d_row, col + d_col)
+                    while on_board(*end):
+                        add(Player.get_CHARIOT(), beg, end,
+                            BatchPlayouts._TO_EMPTY_OR_ENEMY, between)
+                        add(Player.get_CANNON(), beg, end,
+                            BatchPlayouts._TO_EMPTY, between)
+                        if len(between) > 0:
+                            add(Player.get_CANNON(), beg, end,
+                                BatchPlayouts._TO_ENEMY, between, 1)
+                        between = between + [end]
+                        end = (end[0] + d_row, end[1] + d_col)
+
+                # Horses jump unless the leg next to them is blocked.
+                for d_row, d_col in ((-2, -1), (-2, 1), (2, -1), (2, 1),
+                                     (-1, -2), (1, -2), (-1, 2), (1, 2)):
+                    end = (row + d_row, col + d_col)
+                    if on_board(*end):
+                        leg = ((row + d_row // 2, col) if abs(d_row) == 2
+                               else (row, col + d_col // 2))
+                        add(Player.get_HORSE(), beg, end,
+                            BatchPlayouts._TO_EMPTY_OR_ENEMY, [leg])
+
+                # Elephants stay on their side unless the eye is blocked.
+                for d_row, d_col in ((-2, -2), (-2, 2), (2, -2), (2, 2)):
+                    end = (row + d_row, col + d_col)
+                    if row >= 5 and end[0] >= 5 and on_board(*end):
+                        eye = (row + d_row // 2, col + d_col // 2)
+                        add(Player.get_ELEPHANT(), beg, end,
+                            BatchPlayouts._TO_EMPTY_OR_ENEMY, [eye])
+
+                # Advisors and generals stay in the palace.
+                if in_palace(row, col):
+                    for d_row, d_col in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+                        end = (row + d_row, col + d_col)
+                        if in_palace(*end):
+                            add(Player.get_ADVISOR(), beg, end,
+                                BatchPlayouts._TO_EMPTY_OR_ENEMY)
+                    for d_row, d_col in orthogonal:
+                        end = (row + d_row, col + d_col)
+                        if in_palace(*end):
+                            add(Player.get_GENERAL(), beg, end,
+                                BatchPlayouts._TO_EMPTY_OR_ENEMY)
+
+                    # Facing generals, only used to find illegal moves.
+                    for end_row in range(3):
+                        between = [(r, col) for r in range(end_row + 1, row)]
+                        add(Player.get_GENERAL(), beg, (end_row, col),
+                            BatchPlayouts._TO_ENEMY_GENERAL, between)
+
+                # Soldiers move forward, and sideways once over the river.
+                if row > 0:
+                    add(Player.get_SOLDIER(), beg, (row - 1, col),
+                        BatchPlayouts._TO_EMPTY_OR_ENEMY)
+                if row <= 4:
+                    for d_col in (-1, 1):
+                        if on_board(row, col + d_col):
+                            add(Player.get_SOLDIER(), beg, (row, col + d_col),
+                                BatchPlayouts._TO_EMPTY_OR_ENEMY)
+
+        # Padding entry: no piece has code 127, no end square contents are
+        # allowed and it needs an occupied square out of none.
+        empty = BatchPlayouts._EMPTY_SQUARE
+        table.append((empty, empty, 127, 1, 0, [], 1))
+
+        width = BatchPlayouts._MAX_BETWEEN
+        between = np.full((len(table), width), empty, dtype=np.int64)
+        for i, entry in enumerate(table):
+            between[i, :len(entry[5])] = entry[5]
+        columns = list(zip(*table))
+        return (np.array(columns[0], dtype=np.int64),
+                np.array(columns[1], dtype=np.int64),
+                np.array(columns[2], dtype=np.int8),
+                np.array(columns[3], dtype=np.int8),
+                np.array(columns[4], dtype=np.int8),
+                between,
+                np.array(columns[6], dtype=np.int64))
+
+    @staticmethod
+    def encode_game(game):
+        """Encode the current position of a game as a board seen from the
+        player to move (see class docstring).
+
+        Raises
+        ------
+        NumpyMissingError:
+            When NumPy is not installed.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to encode.
+
+        Returns
+        -------
+        numpy.ndarray
+            90 int8 codes.
+        """
+        if np is None:
+            raise NumpyMissingError()
+        board = np.zeros(BatchPlayouts._SQUARES, dtype=np.int8)
+        mover = game.get_mover()
+        turned = mover.get_color() == Player.get_BLACK()
+
+        for player in game.get_players().values():
+            sign = 1 if player is mover else -1
+            for piece in Player.get_all_pieces(player):
+                row, col = piece.get_pos()
+                sq = row * BatchPlayouts._COLS + col
+                if turned:
+                    sq = BatchPlayouts._SQUARES - 1 - sq
+                board[sq] = sign * BatchPlayouts._CODES[player.find_key(piece)]
+        return board
+
+    @staticmethod
+    def get_CODES():
+        """Getter. Return a copy of the dictionary of piece codes by piece
+        key."""
+        return dict(BatchPlayouts._CODES)
+
+    @staticmethod
+    def get_WIN():
+        """Getter. Return the result of a won playout."""
+        return BatchPlayouts._WIN
+
+    @staticmethod
+    def get_DRAW():
+        """Getter. Return the result of a drawn playout."""
+        return BatchPlayouts._DRAW
+
+    @staticmethod
+    def get_LOSS():
+        """Getter. Return the result of a lost playout."""
+        return BatchPlayouts._LOSS
+
+
+class BatchPlayoutError(Error):
+    """Base exception class for batched playout errors."""
+    pass
+
+
+class NumpyMissingError(BatchPlayoutError):
+    """Exception class for batched playouts without NumPy installed."""
+    def __init__(self):
+        """Create an instance of NumpyMissingError."""
+        super().__init__('Batched playouts need NumPy (pip install numpy).')
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from XiangqiGame import XiangqiGame
+
+    parser = argparse.ArgumentParser(
+        description='Play random games in a batch and report the results.')
+    parser.add_argument('--fen', default=XiangqiGame.get_START_FEN(),
+                        help='position to play from (default: start '
+                             'position)')
+    parser.add_argument('-n', '--playouts', type=int, default=1000)
+    parser.add_argument('--max-plies', type=int,
+                        default=BatchPlayouts._DEFAULT_MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    position = XiangqiGame()
+    position.set_fen(args.fen)
+    kernel = BatchPlayouts(args.max_plies, args.seed)
+
+    start = time.monotonic()
+    playout_results = kernel.play_game(position, args.playouts)
+    seconds = time.monotonic() - start
+    wins = np.count_nonzero(playout_results == BatchPlayouts.get_WIN())
+    losses = np.count_nonzero(playout_results == BatchPlayouts.get_LOSS())
+    print(f'{wins} won, {args.playouts - wins - losses} drawn, {losses} lost '
+          f'for the player to move, score {playout_results.mean():.3f}')
+    print(f'{args.playouts} playouts, {kernel.get_ply_count()} plies in '
+          f'{seconds:.2f}s ({kernel.get_ply_count() / max(seconds, 1e-9):.0f}'
+          ' plies/s)')
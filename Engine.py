@@ -0,0 +1,996 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a move search engine for Xiangqi. The engine
+#              searches XiangqiGame positions with iterative deepening
+#              negamax alpha-beta search and a transposition table, and
+#              evaluates positions by material. It can optionally answer
+#              from an opening book and probe endgame tablebases, and
+#              ponder the expected reply on the opponent's time.
+
+import threading
+import time
+
+from OpeningBook import OpeningBook
+from Tablebase import Tablebase, TablebaseFile
+from XiangqiGame import AlgNot, Board, Player, Error, IllegalMoveError
+
+
+class Engine:
+    """Class to search for the best move in a XiangqiGame position.
+
+    Scores are from the point of view of the player to move and are in
+    "points" where a soldier is worth 10. A forced mate scores
+    Engine._MATE_SCORE less the number of plies to the mate.
+
+    The engine works on the game passed to it with XiangqiGame.push_move()
+    and XiangqiGame.pop_move() and always leaves the position as it found
+    it.
+    """
+    # Class level constants
+    _DEFAULT_DEPTH = 2
+    _MAX_DEPTH = 64
+    _MATE_SCORE = 100000
+    _MATE_BOUND = _MATE_SCORE - 1000  # Scores beyond this are mates.
+    _INFINITY = 1000000
+    _DRAW_SCORE = 0
+    _MAX_TABLE_ENTRIES = 1000000
+
+    _PIECE_VALUES = {Player.get_GENERAL(): 0,
+                     Player.get_ADVISOR(): 20,
+                     Player.get_ELEPHANT(): 20,
+                     Player.get_HORSE(): 40,
+                     Player.get_CHARIOT(): 90,
+                     Player.get_CANNON(): 45,
+                     Player.get_SOLDIER(): 10}
+    _CROSSED_SOLDIER_BONUS = 10
+
+    # Only probe the tablebases with this many pieces or less on the board.
+    _TABLEBASE_MAX_PIECES = 6
+
+    # The clock and the stop event are only looked at every _CHECK_INTERVAL
+    # nodes so a search checks its limits at almost no cost. Kept small
+    # as a node takes about a millisecond, which bounds the overrun of a
+    # deadline to about _CHECK_INTERVAL milliseconds.
+    _CHECK_INTERVAL = 16
+
+    # Seconds between looks at the stop event while waiting for a ponder
+    # search to finish.
+    _PONDER_POLL = 0.01
+
+    # Time allocation from a game clock (see Engine.allocate_time()).
+    _DEFAULT_MOVES_TO_GO = 30
+    _HARD_TIME_FACTOR = 4        # Hard limit as a multiple of the soft one.
+    _MAX_CLOCK_FRACTION = 0.5    # Never use more of the clock on one move.
+    _CLOCK_MARGIN = 0.05         # Seconds kept back for overhead.
+
+    # Transposition table bound types.
+    _EXACT = 0
+    _LOWER = 1
+    _UPPER = 2
+
+    def __init__(self, depth=_DEFAULT_DEPTH, piece_values=None,
+                 crossed_soldier_bonus=_CROSSED_SOLDIER_BONUS,
+                 book_path=None, tablebase_dir=None, ponder=False):
+        """Create an engine. All parameters are plain values so an engine
+        configuration can be sent to another process as a dictionary of
+        keyword arguments.
+
+        Parameters
+        ----------
+        depth: int
+            Default search depth in plies.
+        piece_values: dict
+            Value of each piece kind keyed by piece dictionary key. Missing
+            kinds use the defaults in Engine._PIECE_VALUES.
+        crossed_soldier_bonus: int
+            Extra value of a soldier that has crossed the river.
+        book_path: str
+            Path to an opening book file to play from. None for no book.
+        tablebase_dir: str
+            Directory of endgame tablebases to probe. None for none.
+        ponder: bool
+            If True choose_move() ponders the expected reply after each
+            move (see Engine.start_ponder()).
+        """
+        self._depth = depth
+        self._piece_values = dict(Engine._PIECE_VALUES)
+        if piece_values is not None:
+            self._piece_values.update(piece_values)
+        self._crossed_soldier_bonus = crossed_soldier_bonus
+        self._book = None if book_path is None else OpeningBook(book_path)
+        self._tablebase = (None if tablebase_dir is None
+                           else Tablebase(tablebase_dir))
+
+        # hash -> (depth, score, bound, move)
+        self._table = {}
+        self._nodes = 0
+
+        # Limits of the search in progress (see Engine.search()).
+        self._node_limit = None
+        self._deadline = None       # Hard deadline, ends the search.
+        self._soft_deadline = None  # No new iteration is started after it.
+        self._stop_event = None
+        self._next_check = 0        # Node count of the next limit check.
+        self._start = None          # Start time of the search.
+        self._lines = []            # Lines of a multi-PV search.
+        self._max_depth = 0         # Deepest iteration to search.
+        self._completed_depth = 0   # Deepest iteration completed.
+        self._root_moves = None     # Root moves to search, None for all.
+
+        # Background search of the expected reply (see start_ponder()).
+        self._ponder = ponder
+        self._ponder_thread = None
+        self._ponder_hash = None
+        self._ponder_stop = None
+        self._ponder_started = None
+        self._ponder_result = None
+
+    def get_nodes(self):
+        """Getter. Return the number of nodes searched by the last search."""
+        return self._nodes
+
+    def get_completed_depth(self):
+        """Getter. Return the depth of the deepest iteration completed by the
+        last search."""
+        return self._completed_depth
+
+    def set_depth(self, depth):
+        """Setter. Set the default search depth in plies."""
+        self._depth = depth
+
+    def clear(self):
+        """Forget everything learned in previous searches."""
+        self.stop_ponder()
+        self._table = {}
+
+    def choose_move(self, game):
+        """Choose a move for the player to move. Plays from the opening book
+        if the position is in it, otherwise searches.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to choose a move in.
+
+        Returns
+        -------
+        tuple of str
+            Size 2 tuple (alg_start, alg_end). None if there are no legal
+            moves.
+        """
+        if self._book is not None:
+            book_move = self._book.choose_move(game)
+            if book_move is not None:
+                self.stop_ponder()
+                return book_move
+
+        if self._ponder:
+            move, score = self.ponder_hit(game)
+        else:
+            move, score = self.search(game)
+        if move is None:
+            return None
+
+        if self._ponder:
+            reply = self.get_ponder_move(game, move)
+            if reply is not None:
+                self.start_ponder(game, move, reply)
+        return AlgNot.row_col_to_alg(move[0]), AlgNot.row_col_to_alg(move[1])
+
+    def search(self, game, depth=None, nodes=None, movetime=None,
+               stop_event=None, info=None, clock=None, increment=0,
+               moves_to_go=None, multipv=1, root_moves=None, started=None):
+        """Search the current position with iterative deepening.
+
+        The search ends when the depth is reached or as soon as any of the
+        other limits is hit, in which case the best move of the deepest
+        iteration searched (even partly) is returned. With a game clock no
+        new iteration is started after the soft time limit and the search
+        is cut short at the hard one (see Engine.allocate_time()).
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search. Left as it was found.
+        depth: int
+            Depth in plies. If None uses the engine's default depth, or
+            no depth limit if nodes or movetime are given.
+        nodes: int
+            Stop after searching about this many nodes. None for no limit.
+        movetime: float
+            Stop after about this many seconds. None for no limit.
+        stop_event: threading.Event
+            Stop as soon as the event is set (e.g. from another thread).
+        info: callable
+            Called after each completed iteration as info(depth, score,
+            nodes, seconds, pv) where pv is a list of moves.
+        clock: float
+            Seconds left on the mover's clock. None for no clock.
+        increment: float
+            Seconds added to the mover's clock after each move.
+        moves_to_go: int
+            Moves to make before the clock is next topped up. None if
+            unknown.
+        multipv: int
+            Number of best moves to find exact scores and lines for (see
+            Engine.search_multipv()).
+        root_moves: list of tuple
+            Only search these size 2 tuples (beg_pos, end_pos) at the root,
+            e.g. to score a given move the same way as the best one. None
+            for every legal move.
+        started: threading.Event
+            Set once the search has set its limits, after which another
+            thread may change them with set_limits() (see
+            Engine.ponder_hit()).
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (move, score) where move is a size 2 tuple
+            (beg_pos, end_pos) of row/col positions and score the score of
+            the move for the player to move. move is None if there are no
+            legal moves.
+        """
+        # Only one search at a time. A ponder search left running is of no
+        # use to a search from elsewhere.
+        if (self._ponder_thread is not None
+                and threading.current_thread() is not self._ponder_thread):
+            self.stop_ponder()
+
+        self._start = time.monotonic()
+        self._nodes = 0
+        self._completed_depth = 0
+        self._lines = []
+        self._stop_event = stop_event
+        self._root_moves = root_moves
+        self.set_limits(depth, nodes, movetime, clock, increment, moves_to_go)
+        if len(self._table) > Engine._MAX_TABLE_ENTRIES:
+            self._table = {}
+        if started is not None:
+            started.set()
+
+        # Always search at least one ply so there is a move to return. The
+        # depth limit is read on every iteration as set_limits() may lower
+        # it while searching.
+        best = [None, -Engine._INFINITY]
+        iteration_depth = 0
+        while iteration_depth < self._max_depth:
+            iteration_depth += 1
+            try:
+                if multipv > 1:
+                    self.search_root_multipv(game, iteration_depth, best,
+                                             multipv)
+                else:
+                    self.search_root(game, iteration_depth, best)
+            except SearchAbortedError:
+                break
+            if best[0] is None:
+                break
+            self._completed_depth = iteration_depth
+            if info is not None:
+                info(iteration_depth, best[1], self._nodes,
+                     time.monotonic() - self._start,
+                     self.get_pv(game, iteration_depth))
+
+            # No point searching deeper once a mate is found.
+            if abs(best[1]) > Engine._MATE_BOUND:
+                break
+
+            # A deeper iteration would most likely not finish in time.
+            if (self._soft_deadline is not None
+                    and time.monotonic() >= self._soft_deadline):
+                break
+
+        self._stop_event = None
+        self._root_moves = None
+        return best[0], best[1]
+
+    def search_multipv(self, game, count, **limits):
+        """Search the current position for its best count moves in one
+        search. Every root move is searched with a window just above the
+        score of the count-th best move found so far, so moves outside the
+        top count are cut off cheaply and all of them share the
+        transposition table.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search. Left as it was found.
+        count: int
+            Number of moves to return (less if there are fewer legal
+            moves).
+        limits:
+            Keyword arguments for Engine.search().
+
+        Returns
+        -------
+        list of tuple
+            Size 3 tuples (move, score, pv), best first, where pv is the
+            list of moves of the line starting with move.
+        """
+        move, score = self.search(game, multipv=count, **limits)
+        if len(self._lines) == 0 and move is not None:
+            # A single line search, or stopped during the first iteration.
+            pv = self.get_pv(game, max(self._completed_depth, 1))
+            return [(move, score, pv if pv[:1] == [move] else [move])]
+        return self._lines
+
+    def get_lines(self):
+        """Getter. Return the lines (see search_multipv()) of the deepest
+        iteration completed by the last multi-PV search."""
+        return self._lines
+
+    def set_limits(self, depth=None, nodes=None, movetime=None, clock=None,
+                   increment=0, moves_to_go=None):
+        """Setter. Set the limits of the search (see Engine.search() for the
+        parameters). Times are counted from the call.
+
+        May be called from another thread while a search is running to
+        give an unlimited search limits (as when a ponder search turns
+        into the real one, see Engine.ponder_hit()), once the search has
+        set its started event. Earlier, the search would overwrite the
+        limits with its own. A depth limit at or below the depth already
+        completed ends the search at once.
+
+        Returns
+        -------
+        None
+        """
+        if depth is None:
+            unlimited = (nodes is not None or movetime is not None
+                         or clock is not None)
+            depth = Engine._MAX_DEPTH if unlimited else self._depth
+
+        start = time.monotonic()
+        deadline = None if movetime is None else start + movetime
+        soft_deadline = None
+        if clock is not None:
+            soft, hard = Engine.allocate_time(clock, increment, moves_to_go)
+            soft_deadline = start + soft
+            if deadline is None or start + hard < deadline:
+                deadline = start + hard
+
+        self._node_limit = nodes
+        self._deadline = deadline
+        self._soft_deadline = soft_deadline
+        self._max_depth = max(depth, 1)
+
+        # Make the next node check the limits straight away.
+        self._next_check = 0
+        if self._completed_depth >= self._max_depth:
+            self._deadline = start
+
+    def start_ponder(self, game, move, reply):
+        """Search on a background thread, until ponder_hit() or
+        stop_ponder() is called, the position expected after the engine's
+        move and the opponent's reply. The game is not touched.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game the engine is about to play move in.
+        move: tuple
+            Engine's move (beg_pos, end_pos).
+        reply: tuple
+            Expected reply (beg_pos, end_pos) (see get_ponder_move()).
+
+        Returns
+        -------
+        None
+        """
+        self.stop_ponder()
+
+        ponder_game = game.clone()
+        try:
+            ponder_game.push_move(*move)
+            ponder_game.push_move(*reply)
+        except IllegalMoveError:
+            return
+        if ponder_game.get_game_state() != ponder_game.get_UNFINISHED():
+            return
+
+        self._ponder_hash = ponder_game.get_hash()
+        self._ponder_stop = threading.Event()
+        self._ponder_started = threading.Event()
+        self._ponder_result = []
+        self._ponder_thread = threading.Thread(
+            target=self.run_ponder,
+            args=(ponder_game, self._ponder_stop, self._ponder_started,
+                  self._ponder_result),
+            daemon=True)
+        self._ponder_thread.start()
+
+    def run_ponder(self, game, stop_event, started, result):
+        """Ponder thread body. Search without limits until stopped or given
+        limits and append (move, score) to result. started is set once the
+        search has set its limits (see Engine.search())."""
+        result.append(self.search(game, depth=Engine._MAX_DEPTH,
+                                  stop_event=stop_event, started=started))
+
+    def is_pondering(self):
+        """Predicate. True if a ponder search is running."""
+        return self._ponder_thread is not None
+
+    def stop_ponder(self):
+        """Stop the ponder search (if any) and discard its result. What it
+        stored in the transposition table is kept."""
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        self._ponder_hash = None
+
+    def ponder_hit(self, game, **limits):
+        """Search the current position, reusing the ponder search if it was
+        searching this very position. The ponder search then carries on as
+        the real search with the given limits (counted from now).
+        Otherwise, or if the ponder search ended without a result, it is
+        stopped and a new search started.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search. Left as it was found.
+        limits:
+            Keyword arguments for Engine.search().
+
+        Returns
+        -------
+        tuple
+            Same as Engine.search().
+        """
+        if (self._ponder_thread is None
+                or game.get_hash() != self._ponder_hash):
+            self.stop_ponder()
+            return self.search(game, **limits)
+
+        ponder_limits = dict(limits)
+        stop_event = ponder_limits.pop('stop_event', None)
+        ponder_limits.pop('info', None)
+
+        # Hand the limits over only once the ponder search has set its own,
+        # or they would be overwritten. Pass on a stop request meanwhile.
+        handed_over = False
+        while self._ponder_thread.is_alive():
+            if stop_event is not None and stop_event.is_set():
+                self._ponder_stop.set()
+            if not handed_over and self._ponder_started.is_set():
+                self.set_limits(**ponder_limits)
+                handed_over = True
+            self._ponder_thread.join(Engine._PONDER_POLL)
+
+        thread_result = self._ponder_result
+        self._ponder_thread = None
+        self._ponder_hash = None
+        if len(thread_result) == 0:
+            return self.search(game, **limits)
+        return thread_result[0]
+
+    def get_ponder_move(self, game, move):
+        """Find the reply expected to move from the transposition table.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game the move is to be played in. Left as it was found.
+        move: tuple
+            Move (beg_pos, end_pos).
+
+        Returns
+        -------
+        tuple
+            Expected reply (beg_pos, end_pos). None if not known.
+        """
+        try:
+            game.push_move(*move, detect_game_over=False)
+        except IllegalMoveError:
+            return None
+        try:
+            return self.get_table_move(game)
+        finally:
+            game.pop_move()
+
+    def search_root(self, game, depth, best):
+        """Search the root position to a fixed depth.
+
+        Raises
+        ------
+        SearchAbortedError:
+            When a search limit is hit. best holds the best move found so
+            far in the iteration (if any).
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search.
+        depth: int
+            Depth in plies.
+        best: list
+            Size 2 list [move, score] updated with the best move found.
+            The move of the previous iteration is searched first, so any
+            move found to be better is better than the previous result.
+
+        Returns
+        -------
+        None
+        """
+        moves = self.order_moves(game, self.find_root_moves(game),
+                                 self.get_table_move(game))
+        if len(moves) == 0:
+            best[0], best[1] = None, -Engine._MATE_SCORE
+            return
+
+        # Have a move ready in case the first iteration is cut short.
+        if best[0] is None:
+            best[0], best[1] = moves[0], self.evaluate(game)
+
+        alpha, beta = -Engine._INFINITY, Engine._INFINITY
+        best_move = moves[0]
+        for beg_pos, end_pos in moves:
+            game.push_move(beg_pos, end_pos, detect_game_over=False)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, 1)
+            finally:
+                game.pop_move()
+
+            if score > alpha:
+                alpha = score
+                best_move = (beg_pos, end_pos)
+                best[0], best[1] = best_move, score
+
+        if self._root_moves is None:
+            self.store(game, depth, alpha, Engine._EXACT, best_move, 0)
+
+    def search_root_multipv(self, game, depth, best, count):
+        """Search the root position to a fixed depth for the best count moves
+        (see Engine.search_multipv()). self._lines is replaced with them
+        once the iteration completes.
+
+        Raises
+        ------
+        SearchAbortedError:
+            When a search limit is hit.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search.
+        depth: int
+            Depth in plies.
+        best: list
+            Same as for Engine.search_root().
+        count: int
+            Number of moves to find.
+
+        Returns
+        -------
+        None
+        """
+        moves = self.order_moves(game, self.find_root_moves(game),
+                                 self.get_table_move(game))
+        if len(moves) == 0:
+            best[0], best[1] = None, -Engine._MATE_SCORE
+            return
+
+        # Lines of the previous iteration first, in their order.
+        previous = {line[0]: i for i, line in enumerate(self._lines)}
+        moves.sort(key=lambda move: previous.get(move, len(previous)))
+
+        if best[0] is None:
+            best[0], best[1] = moves[0], self.evaluate(game)
+
+        found = []  # [score, move] best first, at most count long.
+        for beg_pos, end_pos in moves:
+            # Only scores above the count-th best so far are of interest.
+            alpha = found[-1][0] if len(found) == count else -Engine._INFINITY
+            game.push_move(beg_pos, end_pos, detect_game_over=False)
+            try:
+                score = -self.negamax(game, depth - 1, -Engine._INFINITY,
+                                      -alpha, 1)
+            finally:
+                game.pop_move()
+
+            if score > alpha:
+                index = 0
+                while index < len(found) and found[index][0] >= score:
+                    index += 1
+                found.insert(index, [score, (beg_pos, end_pos)])
+                del found[count:]
+                if index == 0:
+                    best[0], best[1] = (beg_pos, end_pos), score
+
+        if self._root_moves is None:
+            self.store(game, depth, found[0][0], Engine._EXACT, found[0][1],
+                       0)
+
+        lines = []
+        for score, move in found:
+            game.push_move(move[0], move[1], detect_game_over=False)
+            try:
+                pv = [move] + self.get_pv(game, depth - 1)
+            finally:
+                game.pop_move()
+            lines.append((move, score, pv))
+        self._lines = lines
+
+    def find_root_moves(self, game):
+        """Find the legal moves to search at the root, only those in
+        self._root_moves if set (see Engine.search())."""
+        moves = game.get_legal_moves()
+        if self._root_moves is not None:
+            moves = [move for move in moves if move in self._root_moves]
+        return moves
+
+    def check_limits(self):
+        """Raise SearchAbortedError if a search limit has been hit.
+
+        Called by negamax() once the node count reaches self._next_check,
+        which is then moved _CHECK_INTERVAL nodes on (or to the node limit
+        if that is closer), so other nodes only pay for one comparison.
+        """
+        if ((self._node_limit is not None and self._nodes >= self._node_limit)
+                or (self._stop_event is not None
+                    and self._stop_event.is_set())
+                or (self._deadline is not None
+                    and time.monotonic() >= self._deadline)):
+            raise SearchAbortedError()
+
+        self._next_check = self._nodes + Engine._CHECK_INTERVAL
+        if self._node_limit is not None:
+            self._next_check = min(self._next_check, self._node_limit)
+
+    @staticmethod
+    def allocate_time(clock, increment=0, moves_to_go=None):
+        """Work out how long to search a move from the game clock.
+
+        The soft limit is an even share of the clock over the moves to go
+        plus the increment. The hard limit allows a few times that for
+        iterations already under way, but never more than a fixed fraction
+        of what is left on the clock.
+
+        Parameters
+        ----------
+        clock: float
+            Seconds left on the mover's clock.
+        increment: float
+            Seconds added to the clock after each move.
+        moves_to_go: int
+            Moves to make before the clock is next topped up. None if
+            unknown.
+
+        Returns
+        -------
+        tuple of float
+            Size 2 tuple (soft, hard) of seconds.
+        """
+        if moves_to_go is None:
+            moves_to_go = Engine._DEFAULT_MOVES_TO_GO
+        clock = max(clock - Engine._CLOCK_MARGIN, 0)
+
+        hard = min((clock / max(moves_to_go, 1) + increment)
+                   * Engine._HARD_TIME_FACTOR,
+                   clock * Engine._MAX_CLOCK_FRACTION)
+        soft = min(clock / max(moves_to_go, 1) + increment, hard)
+        return soft, hard
+
+    def get_pv(self, game, depth):
+        """Follow the remembered best moves from the current position to get
+        the principal variation.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game searched. Left as it was found.
+        depth: int
+            Maximum number of moves to follow.
+
+        Returns
+        -------
+        list of tuple
+            Moves as (beg_pos, end_pos).
+        """
+        pv = []
+        while len(pv) < depth:
+            move = self.get_table_move(game)
+            if move is None:
+                break
+            try:
+                game.push_move(move[0], move[1], detect_game_over=False)
+            except IllegalMoveError:
+                break
+            pv.append(move)
+
+        for move in pv:
+            game.pop_move()
+        return pv
+
+    def negamax(self, game, depth, alpha, beta, ply):
+        """Alpha-beta search of the current position.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search. Left as it was found.
+        depth: int
+            Remaining depth in plies.
+        alpha: int
+            Lower bound of scores of interest.
+        beta: int
+            Upper bound of scores of interest.
+        ply: int
+            Distance in plies from the root.
+
+        Returns
+        -------
+        int
+            Score for the player to move.
+        """
+        self._nodes += 1
+        if self._nodes >= self._next_check:
+            self.check_limits()
+        alpha_orig = alpha
+
+        # A position met before is heading for a repetition. Score it as a
+        # draw rather than judging who is to blame, which would need the
+        # whole cycle.
+        if game.get_repetition_count() > 1:
+            return Engine._DRAW_SCORE
+
+        # Transposition table cut off.
+        entry = self.probe_table(game)
+        if entry is not None and entry[0] >= depth:
+            entry_depth, score, bound, move = entry
+            score = Engine.score_from_table(score, ply)
+            if bound == Engine._EXACT:
+                return score
+            if bound == Engine._LOWER and score >= beta:
+                return score
+            if bound == Engine._UPPER and score <= alpha:
+                return score
+
+        tablebase_score = self.probe_tablebase(game, ply)
+        if tablebase_score is not None:
+            return tablebase_score
+
+        if depth <= 0:
+            return self.evaluate(game)
+
+        moves = game.get_legal_moves()
+        if len(moves) == 0:
+            return -Engine._MATE_SCORE + ply  # Mated or stalemated.
+        moves = self.order_moves(game, moves,
+                                 None if entry is None else entry[3])
+
+        best_score, best_move = -Engine._INFINITY, None
+        for beg_pos, end_pos in moves:
+            game.push_move(beg_pos, end_pos, detect_game_over=False)
+            try:
+                score = -self.negamax(game, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                game.pop_move()
+
+            if score > best_score:
+                best_score, best_move = score, (beg_pos, end_pos)
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+
+        if best_score <= alpha_orig:
+            bound = Engine._UPPER
+        elif best_score >= beta:
+            bound = Engine._LOWER
+        else:
+            bound = Engine._EXACT
+        self.store(game, depth, best_score, bound, best_move, ply)
+
+        return best_score
+
+    def evaluate(self, game):
+        """Score the position by material for the player to move.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to evaluate.
+
+        Returns
+        -------
+        int
+            Material balance of the player to move less the opponent's.
+        """
+        mover = game.get_mover()
+        score = 0
+
+        for player, sign in ((mover, 1), (mover.get_opponent(), -1)):
+            for piece in Player.get_all_pieces(player):
+                key = player.find_key(piece)
+                score += sign * self._piece_values[key]
+                if (key == Player.get_SOLDIER()
+                        and Board.is_across_river(piece.get_pos(), player)):
+                    score += sign * self._crossed_soldier_bonus
+
+        return score
+
+    def probe_tablebase(self, game, ply):
+        """Score the position from the tablebases if it is covered.
+
+        Returns
+        -------
+        int
+            Score for the player to move. None if not covered.
+        """
+        if self._tablebase is None:
+            return None
+
+        piece_count = len(Player.get_all_pieces(*game.get_players().values()))
+        if piece_count > Engine._TABLEBASE_MAX_PIECES:
+            return None
+
+        result = self._tablebase.probe(game)
+        if result is None:
+            return None
+
+        outcome, plies = result
+        if outcome == TablebaseFile.get_DRAW():
+            return 0
+        mate_score = Engine._MATE_SCORE - ply - plies
+        return mate_score if outcome == TablebaseFile.get_WIN() else -mate_score
+
+    def order_moves(self, game, moves, first_move=None):
+        """Sort moves so the most promising are searched first: the
+        remembered best move, then captures of the most valuable pieces by
+        the least valuable ones, then the rest.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game the moves are for.
+        moves: list of tuple
+            Legal moves as (beg_pos, end_pos).
+        first_move: tuple
+            Move to put first if present. May be None.
+
+        Returns
+        -------
+        list of tuple
+            The sorted moves.
+        """
+        board = game.get_board()
+
+        def move_order(move):
+            """Sort key. Smaller keys are searched first."""
+            if move == first_move:
+                return -Engine._INFINITY
+            target = board.get_piece(move[1])
+            if target is None:
+                return 0
+            attacker = board.get_piece(move[0])
+            return (-10 * self.get_piece_value(target)
+                    + self.get_piece_value(attacker))
+
+        return sorted(moves, key=move_order)
+
+    def get_piece_value(self, piece):
+        """Getter. Return the value of a piece."""
+        return self._piece_values[piece.get_player().find_key(piece)]
+
+    def get_table_move(self, game):
+        """Getter. Return the best move remembered for the position or None."""
+        entry = self.probe_table(game)
+        return None if entry is None else entry[3]
+
+    def probe_table(self, game):
+        """Look up the current position in the transposition table.
+
+        Positions are stored under XiangqiGame.get_canonical_hash() so a
+        position and its mirror image share an entry. The stored move is
+        mirrored back if needed.
+
+        Returns
+        -------
+        tuple
+            Size 4 tuple (depth, score, bound, move) as stored by store().
+            None if the position is not in the table.
+        """
+        pos_hash, mirrored = game.get_canonical_hash()
+        entry = self._table.get(pos_hash)
+        if entry is None or not mirrored or entry[3] is None:
+            return entry
+        return (*entry[:3], Board.mirror_move(entry[3]))
+
+    def store(self, game, depth, score, bound, move, ply):
+        """Remember the result of searching the current position.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game that was searched.
+        depth: int
+            Depth searched.
+        score: int
+            Score found.
+        bound: int
+            One of Engine._EXACT, Engine._LOWER or Engine._UPPER.
+        move: tuple
+            Best move found.
+        ply: int
+            Distance from the root.
+
+        Returns
+        -------
+        None
+        """
+        pos_hash, mirrored = game.get_canonical_hash()
+        if mirrored and move is not None:
+            move = Board.mirror_move(move)
+        self._table[pos_hash] = (depth, Engine.score_to_table(score, ply),
+                                 bound, move)
+
+    @staticmethod
+    def score_to_table(score, ply):
+        """Make mate scores relative to the node instead of the root so they
+        stay correct when the position is reached at another ply."""
+        if score > Engine._MATE_BOUND:
+            return score + ply
+        if score < -Engine._MATE_BOUND:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_table(score, ply):
+        """Inverse of Engine.score_to_table()."""
+        if score > Engine._MATE_BOUND:
+            return score - ply
+        if score < -Engine._MATE_BOUND:
+            return score + ply
+        return score
+
+    @staticmethod
+    def get_mate_plies(score):
+        """Find the number of plies to mate for a mate score.
+
+        Returns
+        -------
+        int
+            Plies to mate, positive if the player to move mates and negative
+            if they are mated. None if score is not a mate score.
+        """
+        if abs(score) <= Engine._MATE_BOUND:
+            return None
+        plies = Engine._MATE_SCORE - abs(score)
+        return plies if score > 0 else -plies
+
+    @staticmethod
+    def get_MATE_SCORE():
+        """Getter. Get the score of a mate on the board."""
+        return Engine._MATE_SCORE
+
+    @staticmethod
+    def get_PIECE_VALUES():
+        """Getter. Get a copy of the default piece values by piece
+        dictionary key."""
+        return dict(Engine._PIECE_VALUES)
+
+    @staticmethod
+    def get_DEFAULT_DEPTH():
+        """Getter. Get the default search depth."""
+        return Engine._DEFAULT_DEPTH
+
+    @staticmethod
+    def get_MAX_DEPTH():
+        """Getter. Get the deepest depth searched without a depth limit."""
+        return Engine._MAX_DEPTH
+
+
+class EngineError(Error):
+    """Base exception class for engine errors."""
+    pass
+
+
+class SearchAbortedError(EngineError):
+    """Exception class used to unwind a search when one of its limits (node
+    count, time or stop request) is hit."""
+    def __init__(self):
+        """Create an instance of SearchAbortedError."""
+        super().__init__('Search limit reached.')
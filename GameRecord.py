@@ -0,0 +1,554 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a compact binary format for Xiangqi game records.
+#              Each game is stored as its start position and result
+#              followed by its moves packed into 2 bytes each. Record
+#              files are memory-mapped and indexed so millions of games
+#              can be read without parsing text, with move lists handed
+#              out as zero-copy views of the file.
+
+import mmap
+import struct
+import sys
+
+from XiangqiGame import XiangqiGame, AlgNot, Board, Error
+
+
+class GameRecord:
+    """Class to hold one game: start position, moves and result.
+
+    Moves are kept packed as start square * 90 + end square (see
+    Board.pos_to_sq()), the same packing as OpeningBook.encode_move(), so
+    records read from a file need no decoding until the moves are used.
+    """
+    # Class level constants
+    _UNKNOWN = '*'
+    _RED_WIN = '1-0'
+    _BLACK_WIN = '0-1'
+    _DRAW = '1/2-1/2'
+    _RESULTS = (_UNKNOWN, _RED_WIN, _BLACK_WIN, _DRAW)
+    _STATE_RESULTS = {XiangqiGame.get_RED_WON(): _RED_WIN,
+                      XiangqiGame.get_BLACK_WON(): _BLACK_WIN,
+                      XiangqiGame.get_DRAW(): _DRAW}
+
+    def __init__(self, moves, result=_UNKNOWN, start_fen=None):
+        """Create a game record.
+
+        Parameters
+        ----------
+        moves: sequence of int
+            Packed moves (see GameRecord.encode_move()) in the order they
+            were played.
+        result: str
+            One of '1-0', '0-1', '1/2-1/2' or '*' (unknown or unfinished).
+        start_fen: str
+            FEN of the start position. None for the standard start.
+        """
+        if result not in GameRecord._RESULTS:
+            raise GameRecordError(f'"{result}" is not a game result.')
+        self._moves = moves
+        self._result = result
+        self._start_fen = start_fen
+
+    def __len__(self):
+        """Return the number of moves in the game."""
+        return len(self._moves)
+
+    def get_packed_moves(self):
+        """Getter. Return the sequence of packed moves."""
+        return self._moves
+
+    def get_result(self):
+        """Getter. Return the result string."""
+        return self._result
+
+    def get_start_fen(self):
+        """Getter. Return the FEN of the start position, or None for the
+        standard start."""
+        return self._start_fen
+
+    def get_moves(self):
+        """Unpack the moves.
+
+        Returns
+        -------
+        list of tuple
+            Size 2 tuples (beg_pos, end_pos) of row/col positions.
+        """
+        return [GameRecord.decode_move(move) for move in self._moves]
+
+    def get_alg_moves(self):
+        """Unpack the moves into algebraic notation.
+
+        Returns
+        -------
+        list of tuple of str
+            Size 2 tuples (alg_start, alg_end).
+        """
+        return [(AlgNot.row_col_to_alg(beg_pos), AlgNot.row_col_to_alg(end_pos))
+                for beg_pos, end_pos in self.get_moves()]
+
+    def to_game(self):
+        """Replay the game.
+
+        Moves are made with XiangqiGame.push_move() without counting the
+        opponent's legal moves after each one, which is much faster than
+        make_move() while still rejecting illegal moves. A move after a
+        mate is illegal anyway, so mates are only looked for when a move
+        fails and after the last one. Repetitions are judged on every ply
+        as they reach the limit, as push_move() would.
+
+        Raises
+        ------
+        GameRecordError:
+            When a move is illegal or comes after the end of the game (mate
+            or repetition). The error says which ply.
+
+        Returns
+        -------
+        XiangqiGame
+            Game with every move of the record made.
+        """
+        game = XiangqiGame()
+        if self._start_fen is not None:
+            game.set_fen(self._start_fen)
+
+        for ply, (beg_pos, end_pos) in enumerate(self.get_moves()):
+            if game.get_game_state() != XiangqiGame.get_UNFINISHED():
+                raise GameRecordError(f'Move at ply {ply} is after the end of '
+                                      + 'the game.')
+            try:
+                game.push_move(beg_pos, end_pos, detect_game_over=False)
+            except Error as err:
+                if not game.has_legal_move():
+                    raise GameRecordError(f'Move at ply {ply} is after the '
+                                          + 'end of the game (mate).')
+                raise GameRecordError(f'Move at ply {ply} is illegal: {err}')
+
+            if (game.get_repetition_count()
+                    >= XiangqiGame.get_REPETITION_LIMIT()):
+                game.set_game_state(game.judge_repetition())
+
+        if (game.get_game_state() == XiangqiGame.get_UNFINISHED()
+                and not game.has_legal_move()):
+            game.set_game_state(
+                XiangqiGame.get_LOSS()[game.get_mover().get_color()])
+        return game
+
+    @staticmethod
+    def from_game(game, result=None):
+        """Make a record of a game's moves so far.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to record.
+        result: str
+            Result to record. If None it is worked out from the game state
+            ('*' for an unfinished game).
+
+        Returns
+        -------
+        GameRecord
+            Record of the game.
+        """
+        if result is None:
+            result = GameRecord._STATE_RESULTS.get(game.get_game_state(),
+                                                   GameRecord._UNKNOWN)
+        start_fen = game.get_start_fen()
+        if start_fen == XiangqiGame.get_START_FEN():
+            start_fen = None
+        return GameRecord([GameRecord.encode_move(beg_pos, end_pos)
+                           for beg_pos, end_pos in game.get_moves()],
+                          result, start_fen)
+
+    @staticmethod
+    def from_alg_moves(moves, result=_UNKNOWN, start_fen=None):
+        """Make a record from moves in algebraic notation without checking
+        them. Use to_game() to check them.
+
+        Parameters
+        ----------
+        moves: iterable of tuple of str
+            Size 2 tuples (alg_start, alg_end).
+        result: str
+            See GameRecord.__init__().
+        start_fen: str
+            See GameRecord.__init__().
+
+        Returns
+        -------
+        GameRecord
+            Record of the game.
+        """
+        return GameRecord([GameRecord.encode_move(AlgNot.alg_to_row_col(start),
+                                                  AlgNot.alg_to_row_col(end))
+                           for start, end in moves],
+                          result, start_fen)
+
+    @staticmethod
+    def encode_move(beg_pos, end_pos):
+        """Pack a move into 16 bits as start square * 90 + end square."""
+        return (Board.pos_to_sq(beg_pos) * Board.get_SQUARE_COUNT()
+                + Board.pos_to_sq(end_pos))
+
+    @staticmethod
+    def decode_move(move):
+        """Unpack a move packed by GameRecord.encode_move(). Returns a size 2
+        tuple (beg_pos, end_pos)."""
+        beg_sq, end_sq = divmod(move, Board.get_SQUARE_COUNT())
+        return Board.sq_to_pos(beg_sq), Board.sq_to_pos(end_sq)
+
+    @staticmethod
+    def get_RESULTS():
+        """Getter. Get the tuple of result strings, indexed by their code in
+        record files."""
+        return GameRecord._RESULTS
+
+
+class GameRecordFile:
+    """Class to read game records from a memory-mapped record file.
+
+    The file consists of a header, the records one after the other, then an
+    index of the offset of every record:
+        header  magic, version, reserved, record count, index offset
+        record  result code (unsigned 8 bit), start FEN length (unsigned
+                8 bit, 0 for the standard start), move count (unsigned 16
+                bit), the start FEN in ASCII, then the packed moves
+                (unsigned 16 bit each)
+        index   record offsets (unsigned 64 bit each)
+    All numbers are little endian.
+
+    Records can be read by index (records[i]) or in order by iterating. Can be
+    used as a context manager to close the mapping when done.
+    """
+    # Class level constants
+    _MAGIC = b'XQGR'
+    _VERSION = 1
+    _HEADER = struct.Struct('<4sHHQQ')  # magic, version, reserved, count,
+    #                                     index offset
+    _RECORD = struct.Struct('<BBH')     # result, FEN length, move count
+    _OFFSET = struct.Struct('<Q')
+    _MOVE_SIZE = 2
+
+    def __init__(self, path):
+        """Open and memory-map the record file at path.
+
+        Raises
+        ------
+        GameRecordFormatError:
+            When the file is not a game record file or is truncated.
+
+        Parameters
+        ----------
+        path: str
+            Path of the record file to open.
+        """
+        self._file = open(path, 'rb')
+        self._mmap = None
+        self._view = None
+        self._count = 0
+        self._index_offset = 0
+
+        try:
+            header = self._file.read(GameRecordFile._HEADER.size)
+            if len(header) < GameRecordFile._HEADER.size:
+                raise GameRecordFormatError(path, 'file too short for header')
+
+            (magic, version, reserved,
+             count, index_offset) = GameRecordFile._HEADER.unpack(header)
+            if magic != GameRecordFile._MAGIC:
+                raise GameRecordFormatError(path, 'bad magic number')
+            if version != GameRecordFile._VERSION:
+                raise GameRecordFormatError(path,
+                                            f'unsupported version {version}')
+
+            self._file.seek(0, 2)
+            if (self._file.tell()
+                    < index_offset + count * GameRecordFile._OFFSET.size):
+                raise GameRecordFormatError(path, 'file truncated')
+
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+            self._count = count
+            self._index_offset = index_offset
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self):
+        """Enter context. Return the file itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context. Close the file."""
+        self.close()
+
+    def __len__(self):
+        """Return the number of records in the file."""
+        return self._count
+
+    def __getitem__(self, index):
+        """Read the record at the given index. See read_record()."""
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(f'record index {index} out of range')
+        offset = GameRecordFile._OFFSET.unpack_from(
+            self._mmap, self._index_offset + index * GameRecordFile._OFFSET.size)
+        return self.read_record(offset[0])[0]
+
+    def __iter__(self):
+        """Read every record in file order without using the index."""
+        offset = GameRecordFile._HEADER.size
+        for index in range(self._count):
+            record, offset = self.read_record(offset)
+            yield record
+
+    def close(self):
+        """Release the memory map and the underlying file. Records read
+        from the file keep views of the map, in which case it is only
+        unmapped once they are all gone."""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass
+            self._mmap = None
+        self._file.close()
+
+    def read_record(self, offset):
+        """Read the record starting at a file offset.
+
+        The packed moves of the record are a view of the mapped file rather
+        than a copy.
+
+        Parameters
+        ----------
+        offset: int
+            Offset of the record in the file.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (record, next_offset) of the GameRecord and the
+            offset of the record after it.
+        """
+        result, fen_length, move_count = GameRecordFile._RECORD.unpack_from(
+            self._mmap, offset)
+        offset += GameRecordFile._RECORD.size
+
+        start_fen = None
+        if fen_length > 0:
+            start_fen = bytes(self._view[offset:offset + fen_length]).decode(
+                'ascii')
+            offset += fen_length
+
+        end = offset + move_count * GameRecordFile._MOVE_SIZE
+        moves = self._view[offset:end]
+        if sys.byteorder == 'little':
+            moves = moves.cast('H')
+        else:
+            # Big endian hosts have to copy to swap the bytes.
+            moves = [value for (value,) in struct.iter_unpack('<H', moves)]
+
+        return GameRecord(moves, GameRecord.get_RESULTS()[result],
+                          start_fen), end
+
+
+class GameRecordWriter:
+    """Class to write game records to a file readable by GameRecordFile.
+
+    Records are streamed to the file as they are added, so any number of
+    games can be written in constant memory (apart from 8 bytes of index per
+    game). Must be closed (or used as a context manager) for the file to be
+    complete.
+    """
+    # Class level constants
+    _MAX_FEN_LENGTH = 0xFF
+    _MAX_MOVES = 0xFFFF
+
+    def __init__(self, path):
+        """Create the record file at path, overwriting any file there."""
+        self._file = open(path, 'wb')
+        self._offsets = []
+
+        # Header is filled in once the count and index offset are known.
+        self._file.write(bytes(GameRecordFile._HEADER.size))
+
+    def __enter__(self):
+        """Enter context. Return the writer itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context. Finish the file."""
+        self.close()
+
+    def get_count(self):
+        """Getter. Return the number of records written so far."""
+        return len(self._offsets)
+
+    def write(self, record):
+        """Append a game record.
+
+        Raises
+        ------
+        GameRecordError:
+            When the start FEN is longer than 255 characters or there are
+            more than 65535 moves.
+
+        Parameters
+        ----------
+        record: GameRecord
+            Record to append.
+
+        Returns
+        -------
+        None
+        """
+        start_fen = record.get_start_fen()
+        fen_bytes = b'' if start_fen is None else start_fen.encode('ascii')
+        moves = record.get_packed_moves()
+        if len(fen_bytes) > GameRecordWriter._MAX_FEN_LENGTH:
+            raise GameRecordError('Start FEN too long to record.')
+        if len(moves) > GameRecordWriter._MAX_MOVES:
+            raise GameRecordError('Too many moves to record.')
+
+        self._offsets.append(self._file.tell())
+        self._file.write(GameRecordFile._RECORD.pack(
+            GameRecord.get_RESULTS().index(record.get_result()),
+            len(fen_bytes), len(moves)))
+        self._file.write(fen_bytes)
+        self._file.write(struct.pack(f'<{len(moves)}H', *moves))
+
+    def write_game(self, game, result=None):
+        """Append a record of a game. See GameRecord.from_game()."""
+        self.write(GameRecord.from_game(game, result))
+
+    def close(self):
+        """Write the index and header and close the file."""
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(struct.pack(f'<{len(self._offsets)}Q',
+                                     *self._offsets))
+        self._file.seek(0)
+        self._file.write(GameRecordFile._HEADER.pack(
+            GameRecordFile._MAGIC, GameRecordFile._VERSION, 0,
+            len(self._offsets), index_offset))
+        self._file.close()
+
+
+class GameRecordError(Error):
+    """Exception class for game records that can't be written or replayed."""
+    pass
+
+
+class GameRecordFormatError(GameRecordError):
+    """Exception class for when a file is not a valid game record file."""
+    def __init__(self, path, reason):
+        """Create an instance of GameRecordFormatError.
+
+        path should be the offending file and reason a short description
+        of what is wrong with it.
+        """
+        self._path = path
+        self._reason = reason
+        super().__init__(f'{path} is not a valid game record file: {reason}.')
+
+
+class GameArchiveFormatError(GameRecordError):
+    """Exception class for a JSON lines archive line that can't be read."""
+    def __init__(self, path, line_number, reason):
+        """Create an instance of GameArchiveFormatError.
+
+        path should be the archive, line_number the offending line and
+        reason what is wrong with it.
+        """
+        self._path = path
+        self._line_number = line_number
+        self._reason = reason
+        super().__init__(f'{path} line {line_number}: {reason}')
+
+
+def convert_json(json_path, record_path):
+    """Convert a JSON lines game archive to a record file.
+
+    Each line of the archive is a JSON object with a "moves" list of
+    <start>-<end> strings (e.g. "h3-e3"), and optionally a "result" and a
+    start "fen". Moves must be written as squares but are not checked to be
+    legal.
+
+    Returns
+    -------
+    int
+        Number of games converted.
+
+    Raises
+    ------
+    GameArchiveFormatError:
+        When a line is not a game object or has a malformed move.
+    """
+    import json
+
+    with open(json_path) as infile, GameRecordWriter(record_path) as writer:
+        for line_number, line in enumerate(infile, 1):
+            if line.strip() == '':
+                continue
+            try:
+                game = json.loads(line)
+            except ValueError:
+                raise GameArchiveFormatError(json_path, line_number,
+                                             'not valid JSON')
+            if not isinstance(game, dict) or not isinstance(game.get('moves'),
+                                                            list):
+                raise GameArchiveFormatError(json_path, line_number,
+                                             'expected an object with a '
+                                             '"moves" list')
+
+            moves = []
+            for move in game['moves']:
+                alg_move = (tuple(move.split('-', 1))
+                            if isinstance(move, str) else ())
+                if len(alg_move) != 2:
+                    raise GameArchiveFormatError(
+                        json_path, line_number,
+                        f'expected <start>-<end> move but got {move!r}')
+                moves.append(alg_move)
+
+            try:
+                writer.write(GameRecord.from_alg_moves(
+                    moves, game.get('result', GameRecord._UNKNOWN),
+                    game.get('fen')))
+            except Error as err:
+                raise GameArchiveFormatError(json_path, line_number, err)
+        return writer.get_count()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Convert a JSON lines game archive to a binary record '
+                    'file, or list the games of a record file.')
+    parser.add_argument('path', help='JSON lines archive or record file')
+    parser.add_argument('-o', '--output', default=None,
+                        help='record file to write (convert mode)')
+    args = parser.parse_args()
+
+    if args.output is not None:
+        try:
+            count = convert_json(args.path, args.output)
+        except Error as err:
+            parser.error(str(err))
+        print(f'{count} games written to {args.output}')
+    else:
+        with GameRecordFile(args.path) as records:
+            for record in records:
+                moves = ' '.join(f'{start}-{end}'
+                                 for start, end in record.get_alg_moves())
+                print(f'{record.get_result()} {moves}')
@@ -0,0 +1,493 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines an asyncio game server hosting many XiangqiGame
+#              sessions in a single process. Clients connect over TCP or
+#              a Unix socket and exchange one JSON object per line. Moves
+#              are validated and repetitions judged on the event loop
+#              while the expensive work (mate detection, legal move lists
+#              and engine hints) is handed to a pool of worker processes
+#              so that one busy game never holds up the others.
+
+import asyncio
+import concurrent.futures
+import json
+import sys
+
+from Engine import Engine
+from XiangqiGame import (XiangqiGame, AlgNot, Error, AlgStrFormattingError,
+                         IllegalMoveError)
+
+
+class GameSession:
+    """Class to hold one hosted game.
+
+    The lock serializes requests on the game, since a move is only done
+    once its game-over detection comes back from the worker pool.
+    """
+    def __init__(self, game_id, game):
+        """Create a session for a game.
+
+        Parameters
+        ----------
+        game_id: int
+            Id clients use to refer to the game.
+        game: XiangqiGame
+            Game to host.
+        """
+        self._game_id = game_id
+        self._game = game
+        self._lock = asyncio.Lock()
+
+    def get_game_id(self):
+        """Getter. Return the id of the game."""
+        return self._game_id
+
+    def get_game(self):
+        """Getter. Return the XiangqiGame."""
+        return self._game
+
+    def get_lock(self):
+        """Getter. Return the asyncio.Lock serializing requests."""
+        return self._lock
+
+    def describe(self):
+        """Make the reply fields describing the current state of the game.
+
+        Returns
+        -------
+        dict
+            Keys 'game', 'fen', 'state', 'mover', 'in_check' and 'ply'.
+        """
+        game = self._game
+        mover = game.get_mover()
+        return {'game': self._game_id,
+                'fen': game.get_fen(),
+                'state': game.get_game_state(),
+                'mover': mover.get_color(),
+                'in_check': mover.get_in_check(),
+                'ply': game.get_ply()}
+
+
+class GameServer:
+    """Class to host games for clients connected over a socket.
+
+    Every request is a JSON object on one line with a 'cmd' key and an
+    optional 'id' that is echoed back in the reply. Replies are JSON objects
+    on one line with 'ok' set to true, or to false with an 'error' message.
+    Commands are:
+        {"cmd": "new", ["fen": <fen>]}          start a game
+        {"cmd": "state", "game": <id>}          describe a game
+        {"cmd": "move", "game": <id>, "from": <alg>, "to": <alg>}
+        {"cmd": "legal", "game": <id>}          list the mover's legal moves
+        {"cmd": "hint", "game": <id>}           ask the engine for a move
+        {"cmd": "lines", "game": <id>, ["count": <n>]}
+                                                the engine's best n moves
+                                                with scores and lines
+        {"cmd": "close", "game": <id>}          stop hosting a game
+        {"cmd": "count"}                        number of games hosted
+    Positions are in algebraic notation (e.g. "h3") as in
+    XiangqiGame.make_move(). Games are not tied to the connection that
+    created them, so two clients can play the same game by its id.
+    """
+    # Class level constants
+    _DEFAULT_MAX_GAMES = 10000
+    _DEFAULT_HINT_DEPTH = 2
+    _DEFAULT_LINE_COUNT = 3
+    _MAX_LINE_COUNT = 10
+    _BACKLOG = 1024  # Pending connections queued by the listening socket.
+
+    def __init__(self, processes=None, max_games=_DEFAULT_MAX_GAMES,
+                 engine_config=None):
+        """Create a server with no games.
+
+        Parameters
+        ----------
+        processes: int
+            Number of worker processes. If None uses the CPU count.
+        max_games: int
+            Most games hosted at once. New games are refused beyond it.
+        engine_config: dict
+            Keyword arguments for the Engine giving hints. If None the
+            engine searches to a depth of 2.
+        """
+        self._processes = processes
+        self._max_games = max_games
+        self._engine_config = ({'depth': GameServer._DEFAULT_HINT_DEPTH}
+                               if engine_config is None
+                               else dict(engine_config))
+
+        self._sessions = {}  # game id -> GameSession
+        self._next_game_id = 1
+        self._pool = None
+
+        self._commands = {'new': self.do_new,
+                          'state': self.do_state,
+                          'move': self.do_move,
+                          'legal': self.do_legal,
+                          'hint': self.do_hint,
+                          'lines': self.do_lines,
+                          'close': self.do_close,
+                          'count': self.do_count}
+
+    def get_game_count(self):
+        """Getter. Return the number of games hosted."""
+        return len(self._sessions)
+
+    async def serve(self, host=None, port=None, path=None):
+        """Accept clients until cancelled.
+
+        Parameters
+        ----------
+        host: str
+            Host to listen on over TCP.
+        port: int
+            Port to listen on over TCP.
+        path: str
+            Path of a Unix socket to listen on instead of TCP.
+
+        Returns
+        -------
+        None
+        """
+        self._pool = concurrent.futures.ProcessPoolExecutor(
+            self._processes, initializer=_init_worker,
+            initargs=(self._engine_config,))
+        try:
+            if path is not None:
+                server = await asyncio.start_unix_server(
+                    self.handle_client, path, backlog=GameServer._BACKLOG)
+            else:
+                server = await asyncio.start_server(
+                    self.handle_client, host, port,
+                    backlog=GameServer._BACKLOG)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def handle_client(self, reader, writer):
+        """Answer the requests of one connection until it closes.
+
+        Requests from a connection are answered one at a time, in order.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip() == b'':
+                    continue
+
+                reply = await self.handle(line)
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def handle(self, line):
+        """Answer one request line.
+
+        Parameters
+        ----------
+        line: bytes or str
+            JSON request.
+
+        Returns
+        -------
+        dict
+            Reply to send back.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'ok': False, 'error': 'request is not valid JSON'}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': 'request is not a JSON object'}
+
+        command = self._commands.get(request.get('cmd'))
+        if command is None:
+            reply = {'ok': False,
+                     'error': f'unknown command {request.get("cmd")!r}'}
+        else:
+            try:
+                reply = await command(request)
+                reply['ok'] = True
+            except Error as err:
+                reply = {'ok': False, 'error': str(err)}
+
+        if 'id' in request:
+            reply['id'] = request['id']
+        return reply
+
+    def get_session(self, request):
+        """Find the session a request refers to by its 'game' key.
+
+        Raises
+        ------
+        UnknownGameError:
+            When no game has the id.
+        """
+        session = self._sessions.get(request.get('game'))
+        if session is None:
+            raise UnknownGameError(request.get('game'))
+        return session
+
+    async def run_in_pool(self, func, *args):
+        """Run a worker function in the process pool without blocking the
+        event loop and return its result.
+
+        Raises
+        ------
+        WorkerFailedError:
+            When the pool fails to run the function (e.g. a worker process
+            died and broke the pool).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._pool, func, *args)
+        except Error:
+            raise
+        except Exception as err:
+            raise WorkerFailedError(err)
+
+    async def do_new(self, request):
+        """Start a game from the starting position or a FEN."""
+        if len(self._sessions) >= self._max_games:
+            raise ServerFullError(self._max_games)
+
+        game = XiangqiGame()
+        if 'fen' in request:
+            game.set_fen(str(request['fen']))
+
+        session = GameSession(self._next_game_id, game)
+        self._sessions[session.get_game_id()] = session
+        self._next_game_id += 1
+        return session.describe()
+
+    async def do_state(self, request):
+        """Describe a game."""
+        session = self.get_session(request)
+        async with session.get_lock():
+            return session.describe()
+
+    async def do_move(self, request):
+        """Make a move in a game.
+
+        The move is checked and made on the event loop. Whether it mated
+        is worked out in the worker pool, then a repeated position is
+        judged on the session's own game, which has the move history (see
+        XiangqiGame.judge_repetition()).
+        """
+        session = self.get_session(request)
+        game = session.get_game()
+        async with session.get_lock():
+            if game.get_game_state() != XiangqiGame.get_UNFINISHED():
+                raise GameOverError(game.get_game_state())
+
+            try:
+                beg_pos = AlgNot.alg_to_row_col(str(request.get('from')))
+                end_pos = AlgNot.alg_to_row_col(str(request.get('to')))
+            except AlgStrFormattingError as err:
+                raise IllegalMoveRequestError(err)
+
+            try:
+                game.push_move(beg_pos, end_pos, detect_game_over=False)
+            except IllegalMoveError as err:
+                raise IllegalMoveRequestError(err)
+
+            try:
+                game_state = await self.run_in_pool(_detect_game_over,
+                                                    game.get_fen())
+            except BaseException:
+                # Take the move back, so a game whose check failed (or was
+                # cancelled) is left as it was before the request.
+                game.pop_move()
+                raise
+            if (game_state == XiangqiGame.get_UNFINISHED()
+                    and game.get_repetition_count()
+                    >= XiangqiGame.get_REPETITION_LIMIT()):
+                game_state = game.judge_repetition()
+            game.set_game_state(game_state)
+            return session.describe()
+
+    async def do_legal(self, request):
+        """List the legal moves of the player to move."""
+        session = self.get_session(request)
+        async with session.get_lock():
+            fen = session.get_game().get_fen()
+        return {'game': session.get_game_id(),
+                'moves': await self.run_in_pool(_find_legal_moves, fen)}
+
+    async def do_hint(self, request):
+        """Ask the engine for a move for the player to move. The game is
+        free for other requests while the engine searches."""
+        session = self.get_session(request)
+        async with session.get_lock():
+            fen = session.get_game().get_fen()
+        move = await self.run_in_pool(_find_hint, fen)
+        return {'game': session.get_game_id(),
+                'from': None if move is None else move[0],
+                'to': None if move is None else move[1]}
+
+    async def do_lines(self, request):
+        """Ask the engine for the best few moves of the player to move, each
+        with its score and line, from a single multi-PV search."""
+        session = self.get_session(request)
+        count = request.get('count', GameServer._DEFAULT_LINE_COUNT)
+        if not isinstance(count, int) or count < 1:
+            raise ServerError('"count" must be a positive integer.')
+        count = min(count, GameServer._MAX_LINE_COUNT)
+        async with session.get_lock():
+            fen = session.get_game().get_fen()
+        return {'game': session.get_game_id(),
+                'lines': await self.run_in_pool(_find_lines, fen, count)}
+
+    async def do_close(self, request):
+        """Stop hosting a game."""
+        session = self.get_session(request)
+        del self._sessions[session.get_game_id()]
+        return {'game': session.get_game_id()}
+
+    async def do_count(self, request):
+        """Count the games hosted."""
+        return {'count': len(self._sessions)}
+
+
+class ServerError(Error):
+    """Base exception class for requests the game server can't carry out."""
+    pass
+
+
+class UnknownGameError(ServerError):
+    """Exception class for requests naming a game that is not hosted."""
+    def __init__(self, game_id):
+        """Create an instance of UnknownGameError."""
+        self._game_id = game_id
+        super().__init__(f'No game with id {game_id!r}.')
+
+
+class ServerFullError(ServerError):
+    """Exception class for new games beyond the server's limit."""
+    def __init__(self, max_games):
+        """Create an instance of ServerFullError."""
+        self._max_games = max_games
+        super().__init__(f'Server already hosts {max_games} games.')
+
+
+class GameOverError(ServerError):
+    """Exception class for moves made after a game has ended."""
+    def __init__(self, game_state):
+        """Create an instance of GameOverError."""
+        self._game_state = game_state
+        super().__init__(f'Game is over ({game_state}).')
+
+
+class IllegalMoveRequestError(ServerError):
+    """Exception class for move requests that are malformed or illegal."""
+    def __init__(self, cause):
+        """Create an instance of IllegalMoveRequestError from the error the
+        game raised."""
+        self._cause = cause
+        super().__init__(f'Illegal move: {cause}')
+
+
+class WorkerFailedError(ServerError):
+    """Exception class for requests the worker pool failed to carry out."""
+    def __init__(self, cause):
+        """Create an instance of WorkerFailedError from the error the pool
+        raised."""
+        self._cause = cause
+        super().__init__(f'Worker failed: {cause!r}')
+
+
+# Worker process state, set up once per process by _init_worker().
+_worker = {}
+
+
+def _init_worker(engine_config):
+    """Worker process initializer. Sets up a scratch game and the hint
+    engine."""
+    _worker['game'] = XiangqiGame()
+    _worker['engine'] = Engine(**engine_config)
+
+
+def _detect_game_over(fen):
+    """Worker task. Return the game state of a position given in FEN, i.e.
+    whether the player to move has been mated."""
+    game = _worker['game']
+    game.set_fen(fen)
+    return game.get_game_state()
+
+
+def _find_legal_moves(fen):
+    """Worker task. Return the legal moves of a position given in FEN as a
+    list of [alg_start, alg_end] lists."""
+    game = _worker['game']
+    game.set_fen(fen)
+    return [[AlgNot.row_col_to_alg(beg_pos), AlgNot.row_col_to_alg(end_pos)]
+            for beg_pos, end_pos in game.get_legal_moves()]
+
+
+def _find_hint(fen):
+    """Worker task. Return the engine's choice of move in a position given
+    in FEN as a size 2 tuple (alg_start, alg_end), or None if there are no
+    legal moves."""
+    game = _worker['game']
+    game.set_fen(fen)
+    if game.get_game_state() != XiangqiGame.get_UNFINISHED():
+        return None
+    return _worker['engine'].choose_move(game)
+
+
+def _find_lines(fen, count):
+    """Worker task. Return the engine's best count moves in a position given
+    in FEN as a list of dictionaries with keys 'from', 'to', 'score' and
+    'pv' (list of [alg_start, alg_end])."""
+    game = _worker['game']
+    game.set_fen(fen)
+    if game.get_game_state() != XiangqiGame.get_UNFINISHED():
+        return []
+    lines = _worker['engine'].search_multipv(game, count)
+    return [{'from': AlgNot.row_col_to_alg(move[0]),
+             'to': AlgNot.row_col_to_alg(move[1]),
+             'score': score,
+             'pv': [[AlgNot.row_col_to_alg(beg_pos),
+                     AlgNot.row_col_to_alg(end_pos)]
+                    for beg_pos, end_pos in pv]}
+            for move, score, pv in lines]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from Tournament import parse_engine
+
+    parser = argparse.ArgumentParser(
+        description='Host Xiangqi games over a line-delimited JSON socket.')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='host to listen on over TCP')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='port to listen on over TCP')
+    parser.add_argument('--unix', default=None,
+                        help='Unix socket path to listen on instead of TCP')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--max-games', type=int,
+                        default=GameServer._DEFAULT_MAX_GAMES)
+    parser.add_argument('--engine', default=None,
+                        help='hint engine as key=value,... '
+                             '(e.g. depth=3,book_path="book.xqob")')
+    args = parser.parse_args()
+
+    engine_config = (None if args.engine is None
+                     else parse_engine(f'hint:{args.engine}')[1])
+    server = GameServer(args.processes, args.max_games, engine_config)
+    print(f'Serving on {args.unix or f"{args.host}:{args.port}"}',
+          file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
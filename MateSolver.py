@@ -0,0 +1,459 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a mate solver for Xiangqi puzzles. Forced mates are
+#              proved with proof-number search over a tree where the
+#              attacker only plays checking moves and the defender plays
+#              every legal reply, using the check rules of XiangqiGame
+#              (flying generals, cannon screens and so on). Proving a mate
+#              this way touches a tiny fraction of the positions a full
+#              width alpha-beta search would.
+
+import time
+
+from XiangqiGame import XiangqiGame, AlgNot, Error, IllegalMoveError
+
+
+class ProofNode:
+    """Class to represent a position in a MateSolver proof tree.
+
+    OR nodes have the attacker to move and are proved by any one child. AND
+    nodes have the defender to move and are proved once every child is.
+    The proof number is the least number of leaves that still have to be
+    proved to prove the node and the disproof number the least number that
+    have to be disproved to disprove it.
+    """
+    # Proof trees reach millions of nodes, so skip the per node dictionary.
+    __slots__ = ('_move', '_parent', '_is_or', '_ply', '_moves',
+                 '_children', '_proof', '_disproof')
+
+    def __init__(self, move, parent, is_or, ply):
+        """Create an unevaluated leaf.
+
+        Parameters
+        ----------
+        move: tuple
+            Size 2 tuple (beg_pos, end_pos) of the move leading to the node.
+            None for the root.
+        parent: ProofNode
+            Node the move was made from. None for the root.
+        is_or: bool
+            True if the attacker is to move.
+        ply: int
+            Number of moves from the root.
+        """
+        self._move = move
+        self._parent = parent
+        self._is_or = is_or
+        self._ply = ply
+        self._moves = []      # Moves to expand with, found by evaluate().
+        self._children = []
+        self._proof = 1
+        self._disproof = 1
+
+    def get_move(self):
+        """Getter. Return the move leading to the node."""
+        return self._move
+
+    def get_parent(self):
+        """Getter. Return the parent node."""
+        return self._parent
+
+    def get_children(self):
+        """Getter. Return the list of child nodes (empty for a leaf)."""
+        return self._children
+
+    def get_ply(self):
+        """Getter. Return the number of moves from the root."""
+        return self._ply
+
+    def get_proof(self):
+        """Getter. Return the proof number."""
+        return self._proof
+
+    def get_disproof(self):
+        """Getter. Return the disproof number."""
+        return self._disproof
+
+    def is_or(self):
+        """Predicate. True if the attacker is to move."""
+        return self._is_or
+
+    def is_proved(self):
+        """Predicate. True if the node is proved to be a forced mate."""
+        return self._proof == 0
+
+    def is_disproved(self):
+        """Predicate. True if the node is proved not to be a forced mate."""
+        return self._disproof == 0
+
+
+class MateSolver:
+    """Class to prove forced mates of up to a given number of moves.
+
+    The position to solve has the attacker to move. The solver grows a
+    proof tree (see ProofNode) one most-proving leaf at a time, walking the
+    game down to the leaf with XiangqiGame.push_move() and back up with
+    XiangqiGame.pop_move(), so the game is left as it was found. A leaf is
+    evaluated as soon as it is made:
+        - an attacker leaf without checking moves, or past the move limit,
+          is disproved,
+        - a defender leaf without legal moves is mated and proved,
+        - a position met before on the path is disproved, as perpetual
+          check is not a win,
+        - otherwise the numbers start at (1, number of checks) for the
+          attacker and (number of replies, 1) for the defender, so narrow
+          lines are tried first.
+    """
+    # Class level constants
+    _INFINITY = 1 << 30
+    _DEFAULT_MAX_NODES = 1000000
+
+    # Search results
+    _PROVED = 'PROVED'
+    _DISPROVED = 'DISPROVED'
+    _UNKNOWN = 'UNKNOWN'  # Ran out of nodes or time.
+
+    def __init__(self, max_nodes=_DEFAULT_MAX_NODES, max_time=None):
+        """Create a solver.
+
+        Parameters
+        ----------
+        max_nodes: int
+            Most nodes a single solve() may create before giving up.
+        max_time: float
+            Most seconds a solve() or find_mate() may take before giving
+            up. None for no limit.
+        """
+        self._max_nodes = max_nodes
+        self._max_time = max_time
+        self._deadline = None
+        self._node_count = 0
+        self._max_ply = 0
+
+    def get_node_count(self):
+        """Getter. Return the number of nodes created by the last solve() or
+        find_mate()."""
+        return self._node_count
+
+    def find_mate(self, game, max_moves):
+        """Find the shortest forced mate of up to max_moves moves by solving
+        for one move, then two and so on.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game with the attacker to move.
+        max_moves: int
+            Longest mate to look for, in attacker moves.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (result, line) as returned by solve(). The result
+            is MateSolver._DISPROVED only if there is no mate of any length
+            up to max_moves.
+        """
+        self.start_clock()
+        node_count = 0
+        result, line = MateSolver._DISPROVED, []
+        for moves in range(1, max_moves + 1):
+            result, line = self.prove(game, moves)
+            node_count += self._node_count
+            if result != MateSolver._DISPROVED:
+                break
+        self._node_count = node_count
+        return result, line
+
+    def solve(self, game, moves):
+        """Prove or disprove a forced mate in at most the given number of
+        attacker moves.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game with the attacker to move.
+        moves: int
+            Number of attacker moves allowed.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (result, line) where result is one of
+            MateSolver._PROVED, MateSolver._DISPROVED or
+            MateSolver._UNKNOWN. For a proved mate line is the list of
+            size 2 tuples (beg_pos, end_pos) of the main line, the quickest
+            mate against the longest defence. Otherwise it is empty.
+        """
+        self.start_clock()
+        return self.prove(game, moves)
+
+    def start_clock(self):
+        """Start counting max_time from now."""
+        self._deadline = (None if self._max_time is None
+                          else time.time() + self._max_time)
+
+    def prove(self, game, moves):
+        """Helper method for solve() and find_mate(). Same as solve() but
+        keeps the deadline already set by start_clock()."""
+        self._node_count = 1
+        self._max_ply = 2 * moves - 1
+        root = ProofNode(None, None, True, 0)
+
+        if game.get_game_state() != XiangqiGame.get_UNFINISHED():
+            return MateSolver._DISPROVED, []
+        self.evaluate(game, root)
+
+        while (not root.is_proved() and not root.is_disproved()
+               and self._node_count < self._max_nodes
+               and (self._deadline is None or time.time() < self._deadline)):
+            node = self.select_most_proving(game, root)
+            self.expand(game, node)
+            self.update_ancestors(game, node)
+
+        if root.is_proved():
+            return MateSolver._PROVED, MateSolver.find_line(root)
+        if root.is_disproved():
+            return MateSolver._DISPROVED, []
+        return MateSolver._UNKNOWN, []
+
+    def select_most_proving(self, game, node):
+        """Walk down from node to its most-proving leaf, making the moves on
+        the way.
+
+        The most-proving leaf is reached by following the child with the
+        smallest proof number from OR nodes and the child with the smallest
+        disproof number from AND nodes.
+
+        Returns
+        -------
+        ProofNode
+            The leaf. The game is in the leaf's position.
+        """
+        while len(node._children) > 0:
+            if node._is_or:
+                node = min(node._children, key=ProofNode.get_proof)
+            else:
+                node = min(node._children, key=ProofNode.get_disproof)
+            game.push_move(*node._move, detect_game_over=False)
+        return node
+
+    def expand(self, game, node):
+        """Make and evaluate a child for every move of a leaf. Stops early
+        once a child settles the leaf.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game in the leaf's position.
+        node: ProofNode
+            Leaf to expand.
+
+        Returns
+        -------
+        None
+        """
+        for move in node._moves:
+            child = ProofNode(move, node, not node._is_or, node._ply + 1)
+            game.push_move(*move, detect_game_over=False)
+            self.evaluate(game, child)
+            game.pop_move()
+            node._children.append(child)
+            self._node_count += 1
+
+            # One proved move proves an OR node, one escape disproves an
+            # AND node.
+            if child._proof == 0 if node._is_or else child._disproof == 0:
+                break
+        node._moves = None
+        MateSolver.set_numbers(node)
+
+    def evaluate(self, game, node):
+        """Set the starting proof and disproof numbers of a new leaf and
+        find the moves to expand it with (see class docstring).
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game in the leaf's position.
+        node: ProofNode
+            Leaf to evaluate.
+
+        Returns
+        -------
+        None
+        """
+        if node._ply > 0 and game.get_repetition_count() > 1:
+            node._proof, node._disproof = MateSolver._INFINITY, 0
+            return
+
+        if node._is_or:
+            if node._ply < self._max_ply:
+                node._moves = MateSolver.find_checks(game)
+            if len(node._moves) == 0:
+                node._proof, node._disproof = MateSolver._INFINITY, 0
+            else:
+                node._proof, node._disproof = 1, len(node._moves)
+        else:
+            moves = game.get_legal_moves()
+            if len(moves) == 0:
+                node._proof, node._disproof = 0, MateSolver._INFINITY
+            elif node._ply >= self._max_ply:
+                # Out of attacker moves and the defender can still move.
+                node._proof, node._disproof = MateSolver._INFINITY, 0
+            else:
+                node._moves = moves
+                node._proof, node._disproof = len(moves), 1
+
+    def update_ancestors(self, game, node):
+        """Recompute the numbers of every node from node up to the root,
+        taking back the moves on the way.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game in node's position. Left in the root's position.
+        node: ProofNode
+            Node just expanded.
+
+        Returns
+        -------
+        None
+        """
+        while node._parent is not None:
+            game.pop_move()
+            node = node._parent
+            MateSolver.set_numbers(node)
+
+    @staticmethod
+    def set_numbers(node):
+        """Setter. Set the proof and disproof numbers of an inner node from
+        its children."""
+        proofs = [child._proof for child in node._children]
+        disproofs = [child._disproof for child in node._children]
+        if len(proofs) == 0:
+            # Only reached by a leaf with no moves, already settled.
+            return
+        if node._is_or:
+            node._proof = min(proofs)
+            node._disproof = min(sum(disproofs), MateSolver._INFINITY)
+        else:
+            node._proof = min(sum(proofs), MateSolver._INFINITY)
+            node._disproof = min(disproofs)
+
+    @staticmethod
+    def find_checks(game):
+        """Find every legal move of the player to move that gives check.
+
+        Each pseudo legal move is made with XiangqiGame.push_move(), which
+        rejects moves into check and works out whether the opponent is in
+        check, and then taken back.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to find the checking moves in.
+
+        Returns
+        -------
+        list of tuple
+            List of size 2 tuples (beg_pos, end_pos).
+        """
+        board = game.get_board()
+        mover = game.get_mover()
+        checks = []
+
+        for piece in mover.get_all_pieces(mover):
+            beg_pos = piece.get_pos()
+            for end_pos in piece.get_moves(board):
+                try:
+                    game.push_move(beg_pos, end_pos, detect_game_over=False)
+                except IllegalMoveError:
+                    continue
+                if game.get_mover().get_in_check():
+                    checks.append((beg_pos, end_pos))
+                game.pop_move()
+
+        return checks
+
+    @staticmethod
+    def find_mate_length(node):
+        """Find the number of moves to mate from a proved node, playing the
+        quickest mate against the longest defence within the proof tree.
+
+        Returns
+        -------
+        int
+            Number of plies to mate.
+        """
+        if len(node._children) == 0:
+            return 0
+        lengths = [MateSolver.find_mate_length(child)
+                   for child in node._children if child.is_proved()]
+        return 1 + (min(lengths) if node._is_or else max(lengths))
+
+    @staticmethod
+    def find_line(root):
+        """Follow the main line of a proved tree (see find_mate_length()).
+
+        Returns
+        -------
+        list of tuple
+            List of size 2 tuples (beg_pos, end_pos) ending with the mate.
+        """
+        line = []
+        node = root
+        while len(node._children) > 0:
+            children = [child for child in node._children if child.is_proved()]
+            pick = min if node._is_or else max
+            node = pick(children, key=MateSolver.find_mate_length)
+            line.append(node._move)
+        return line
+
+    @staticmethod
+    def get_PROVED():
+        """Getter. Result of a proved mate."""
+        return MateSolver._PROVED
+
+    @staticmethod
+    def get_DISPROVED():
+        """Getter. Result when there is no mate within the move limit."""
+        return MateSolver._DISPROVED
+
+    @staticmethod
+    def get_UNKNOWN():
+        """Getter. Result when the node or time limit was hit first."""
+        return MateSolver._UNKNOWN
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Look for a forced mate from a position.')
+    parser.add_argument('fen', help='position with the attacker to move')
+    parser.add_argument('-n', '--moves', type=int, default=3,
+                        help='longest mate to look for, in attacker moves')
+    parser.add_argument('--max-nodes', type=int,
+                        default=MateSolver._DEFAULT_MAX_NODES)
+    parser.add_argument('-t', '--max-time', type=float, default=None,
+                        help='seconds to give up after')
+    args = parser.parse_args()
+
+    puzzle = XiangqiGame()
+    try:
+        puzzle.set_fen(args.fen)
+    except Error as err:
+        parser.error(str(err))
+
+    solver = MateSolver(args.max_nodes, args.max_time)
+    mate_result, mate_line = solver.find_mate(puzzle, args.moves)
+    if mate_result == MateSolver.get_PROVED():
+        print(f'mate in {(len(mate_line) + 1) // 2}: '
+              + ' '.join(f'{AlgNot.row_col_to_alg(beg)}-'
+                         f'{AlgNot.row_col_to_alg(end)}'
+                         for beg, end in mate_line))
+    elif mate_result == MateSolver.get_DISPROVED():
+        print(f'no mate in {args.moves}')
+    else:
+        print('unknown, node or time limit reached')
+    print(f'{solver.get_node_count()} nodes')
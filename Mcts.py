@@ -0,0 +1,431 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a Monte Carlo tree search engine for Xiangqi. The
+#              engine grows a UCT search tree over XiangqiGame positions
+#              and scores its leaves with random playouts. Playouts use
+#              XiangqiGame.push_fast_move(), which only tests that the
+#              mover's general is not left attacked, so a playout costs a
+#              small fraction of playing the same moves with push_move().
+#              Meant as a lighter, more erratic playing style than Engine.
+#              With NumPy installed each leaf can instead be scored by a
+#              batch of playouts run together by BatchPlayouts.
+
+import math
+import random
+import time
+
+from BatchPlayouts import BatchPlayouts
+from Engine import Engine
+from XiangqiGame import (XiangqiGame, AlgNot, Player, IllegalMoveError)
+
+
+class MctsNode:
+    """Class to represent a position in an MctsEngine search tree.
+
+    Moves out of the node are tried lazily: untried moves are pseudo legal
+    and only turn into children once made successfully. Wins are counted
+    for the player who made the move leading to the node (1 for a win, 0.5
+    for a draw) so the parent can pick the child best for its mover.
+    """
+    # Search trees reach hundreds of thousands of nodes, so skip the per
+    # node dictionary.
+    __slots__ = ('_move', '_parent', '_color', '_untried', '_children',
+                 '_visits', '_wins')
+
+    def __init__(self, move, parent, color, untried):
+        """Create a node.
+
+        Parameters
+        ----------
+        move: tuple
+            Size 2 tuple (beg_pos, end_pos) of the move leading to the node.
+            None for the root.
+        parent: MctsNode
+            Node the move was made from. None for the root.
+        color: str
+            Color of the player who made the move.
+        untried: list of tuple
+            Pseudo legal moves of the player to move in the node.
+        """
+        self._move = move
+        self._parent = parent
+        self._color = color
+        self._untried = untried
+        self._children = []
+        self._visits = 0
+        self._wins = 0.0
+
+    def get_move(self):
+        """Getter. Return the move leading to the node."""
+        return self._move
+
+    def get_children(self):
+        """Getter. Return the list of child nodes."""
+        return self._children
+
+    def get_visits(self):
+        """Getter. Return the number of playouts through the node."""
+        return self._visits
+
+    def get_win_rate(self):
+        """Getter. Return the share of playouts through the node won by the
+        player who moved into it (draws count half). 0.5 if unvisited."""
+        return 0.5 if self._visits == 0 else self._wins / self._visits
+
+    def is_terminal(self):
+        """Predicate. True if the player to move has no legal moves."""
+        return len(self._untried) == 0 and len(self._children) == 0
+
+
+class MctsEngine:
+    """Class to choose moves in a XiangqiGame position by Monte Carlo tree
+    search.
+
+    Each iteration:
+        1) selects a path down the tree, picking the child with the best
+           UCT value win rate + exploration * sqrt(ln(parent visits) /
+           visits) at every node,
+        2) expands the last node with one of its untried moves,
+        3) plays random moves from there (see MctsEngine.playout()),
+        4) counts the result at every node of the path.
+    Tree moves are made with XiangqiGame.push_move() and taken back with
+    XiangqiGame.pop_move(), so the game is left as it was found. A
+    position met before in the game or tree is scored as a draw.
+
+    The move returned is a mate in one if there is one found, otherwise
+    the root child played out the most. Its win rate is returned as the
+    score, from 0.0 (lost) to 1.0 (won).
+    """
+    # Class level constants
+    _DEFAULT_EXPLORATION = math.sqrt(2)
+    _DEFAULT_PLAYOUTS = 1000
+    _DEFAULT_MAX_PLAYOUT_PLIES = 60
+
+    # Playouts reaching the ply limit are adjudicated by material: a lead
+    # of at least this many points (see Engine.get_PIECE_VALUES()) wins,
+    # anything less is a draw.
+    _ADJUDICATION_MARGIN = 40
+
+    # Results of a playout for the player who moved into the start node.
+    _WIN = 1.0
+    _DRAW = 0.5
+    _LOSS = 0.0
+
+    def __init__(self, exploration=_DEFAULT_EXPLORATION,
+                 playouts=_DEFAULT_PLAYOUTS,
+                 max_playout_plies=_DEFAULT_MAX_PLAYOUT_PLIES, seed=None,
+                 batch_size=1):
+        """Create an engine.
+
+        Raises
+        ------
+        NumpyMissingError:
+            When batch_size is more than 1 and NumPy is not installed.
+
+        Parameters
+        ----------
+        exploration: float
+            UCT exploration constant. Higher values spread playouts over
+            more moves, lower values focus on the best looking ones.
+        playouts: int
+            Default number of playouts per search.
+        max_playout_plies: int
+            Playouts are stopped and adjudicated after this many plies.
+        seed: int
+            Seed for the random playouts. None for a random seed.
+        batch_size: int
+            Playouts per leaf. More than 1 plays them all at once with
+            BatchPlayouts and scores the leaf with their mean result.
+        """
+        self._exploration = exploration
+        self._playouts = playouts
+        self._max_playout_plies = max_playout_plies
+        self._rng = random.Random(seed)
+        self._batch_size = batch_size
+        self._batch = (None if batch_size == 1
+                       else BatchPlayouts(max_playout_plies, seed))
+        self._piece_values = Engine.get_PIECE_VALUES()
+        self._playout_count = 0
+        self._playout_plies = 0
+
+    def get_playout_count(self):
+        """Getter. Return the number of playouts of the last search. Each
+        iteration counts batch_size playouts."""
+        return self._playout_count
+
+    def get_playout_plies(self):
+        """Getter. Return the number of plies played out by the last
+        search."""
+        return self._playout_plies
+
+    def choose_move(self, game):
+        """Choose a move for the player to move.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to choose a move in.
+
+        Returns
+        -------
+        tuple of str
+            Size 2 tuple (alg_start, alg_end). None if there are no legal
+            moves.
+        """
+        move, score = self.search(game)
+        if move is None:
+            return None
+        return AlgNot.row_col_to_alg(move[0]), AlgNot.row_col_to_alg(move[1])
+
+    def search(self, game, playouts=None, movetime=None, stop_event=None):
+        """Search the current position.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to search. Left as it was found.
+        playouts: int
+            Number of playouts, rounded up to a whole number of batches.
+            If None uses the engine's default, or no limit if movetime is
+            given.
+        movetime: float
+            Stop after about this many seconds. None for no limit.
+        stop_event: threading.Event
+            Stop as soon as the event is set (e.g. from another thread).
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (move, score) where move is a size 2 tuple
+            (beg_pos, end_pos) of row/col positions and score its win rate
+            for the player to move. move is None if there are no legal
+            moves.
+        """
+        if playouts is None and movetime is None:
+            playouts = self._playouts
+        deadline = None if movetime is None else time.monotonic() + movetime
+        self._playout_count = 0
+        self._playout_plies = 0
+
+        root = MctsNode(None, None, game.get_inactive().get_color(),
+                        MctsEngine.find_pseudo_moves(game))
+
+        # Always finish one playout so there is a move to return.
+        while True:
+            self.run_iteration(game, root)
+            self._playout_count += self._batch_size
+            if ((playouts is not None and self._playout_count >= playouts)
+                    or (deadline is not None and time.monotonic() >= deadline)
+                    or (stop_event is not None and stop_event.is_set())
+                    or root.is_terminal()):
+                break
+
+        if len(root._children) == 0:
+            return None, MctsEngine._LOSS
+        for child in root._children:
+            if child.is_terminal():
+                return child._move, MctsEngine._WIN
+        best = max(root._children, key=MctsNode.get_visits)
+        return best._move, best.get_win_rate()
+
+    def run_iteration(self, game, root):
+        """Run one select, expand, playout and update iteration from the
+        root.
+
+        Returns
+        -------
+        None
+        """
+        node = root
+        depth = 0
+
+        # Select.
+        while len(node._untried) == 0 and len(node._children) > 0:
+            node = self.select_child(node)
+            game.push_move(*node._move, detect_game_over=False)
+            depth += 1
+
+        # Expand with the first untried move that turns out legal.
+        while len(node._untried) > 0:
+            move = node._untried.pop(self._rng.randrange(len(node._untried)))
+            try:
+                game.push_move(*move, detect_game_over=False)
+            except IllegalMoveError:
+                continue
+            child = MctsNode(move, node, game.get_inactive().get_color(),
+                             MctsEngine.find_pseudo_moves(game))
+            node._children.append(child)
+            node = child
+            depth += 1
+
+            # Mark mates straight away so select_child() can prefer them.
+            if not game.has_legal_move():
+                child._untried = []
+            break
+
+        # Play out. A node without children or untried moves is lost by
+        # its mover (mate, or no moves at all).
+        if node.is_terminal():
+            result = MctsEngine._WIN
+        elif depth > 0 and game.get_repetition_count() > 1:
+            result = MctsEngine._DRAW
+        elif self._batch is not None:
+            result = self.batch_playout(game)
+        else:
+            result = self.playout(game)
+
+        # Update, taking back the tree moves on the way up.
+        while node is not None:
+            node._visits += 1
+            node._wins += result
+            result = 1.0 - result
+            node = node._parent
+        for ply in range(depth):
+            game.pop_move()
+
+    def select_child(self, node):
+        """Pick the child of a fully expanded node with the best UCT value
+        (see class docstring). A child where the opponent has no legal moves
+        wins outright so it is always picked."""
+        for child in node._children:
+            if child.is_terminal():
+                return child
+        log_visits = math.log(node._visits)
+        exploration = self._exploration
+        return max(node._children,
+                   key=lambda child: (child._wins / child._visits
+                                      + exploration * math.sqrt(
+                                          log_visits / child._visits)))
+
+    def playout(self, game):
+        """Play random moves from the current position with
+        XiangqiGame.push_fast_move() until a player has no legal moves or
+        the ply limit is reached, then take them all back.
+
+        Each ply a pseudo legal move is drawn at random and dropped if it
+        leaves the mover's general attacked, until one is legal.
+
+        Returns
+        -------
+        float
+            Result for the player who made the last move before the
+            playout: MctsEngine._WIN, MctsEngine._DRAW or MctsEngine._LOSS.
+        """
+        rng = self._rng
+        first_color = game.get_inactive().get_color()
+        made = []   # (beg_pos, end_pos, taken) to take back.
+        loser = None
+
+        while len(made) < self._max_playout_plies:
+            moves = MctsEngine.find_pseudo_moves(game)
+            while len(moves) > 0:
+                i = rng.randrange(len(moves))
+                beg_pos, end_pos = moves[i]
+                try:
+                    taken = game.push_fast_move(beg_pos, end_pos)
+                except IllegalMoveError:
+                    moves[i] = moves[-1]
+                    moves.pop()
+                    continue
+                made.append((beg_pos, end_pos, taken))
+                break
+            else:
+                loser = game.get_mover().get_color()
+                break
+
+        if loser is None:
+            balance = self.find_material_balance(game, first_color)
+            if balance >= MctsEngine._ADJUDICATION_MARGIN:
+                result = MctsEngine._WIN
+            elif balance <= -MctsEngine._ADJUDICATION_MARGIN:
+                result = MctsEngine._LOSS
+            else:
+                result = MctsEngine._DRAW
+        else:
+            result = (MctsEngine._LOSS if loser == first_color
+                      else MctsEngine._WIN)
+
+        self._playout_plies += len(made)
+        for beg_pos, end_pos, taken in reversed(made):
+            game.pop_fast_move(beg_pos, end_pos, taken)
+        return result
+
+    def batch_playout(self, game):
+        """Play out the current position batch_size times at once with
+        BatchPlayouts.
+
+        Returns
+        -------
+        float
+            Mean result for the player who made the last move before the
+            playouts (see playout()).
+        """
+        results = self._batch.play_game(game, self._batch_size)
+        self._playout_plies += self._batch.get_ply_count()
+        return 1.0 - float(results.mean())
+
+    def find_material_balance(self, game, color):
+        """Find the material of a player less that of the opponent, in
+        Engine piece value points."""
+        balance = 0
+        for player in game.get_players().values():
+            sign = 1 if player.get_color() == color else -1
+            for piece in Player.get_all_pieces(player):
+                balance += sign * self._piece_values[player.find_key(piece)]
+        return balance
+
+    @staticmethod
+    def find_pseudo_moves(game):
+        """Find every pseudo legal move of the player to move, as generated
+        for XiangqiGame.push_fast_move() (see Piece.iter_fast_moves()).
+
+        Returns
+        -------
+        list of tuple
+            List of size 2 tuples (beg_pos, end_pos).
+        """
+        board = game.get_board()
+        mover = game.get_mover()
+        return [(piece.get_pos(), end_pos)
+                for piece in Player.get_all_pieces(mover)
+                for end_pos in piece.iter_fast_moves(board)]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Choose a move by Monte Carlo tree search.')
+    parser.add_argument('--fen', default=XiangqiGame.get_START_FEN(),
+                        help='position to search (default: start position)')
+    parser.add_argument('-n', '--playouts', type=int, default=None)
+    parser.add_argument('-t', '--movetime', type=float, default=None,
+                        help='seconds to search')
+    parser.add_argument('-c', '--exploration', type=float,
+                        default=MctsEngine._DEFAULT_EXPLORATION)
+    parser.add_argument('--max-playout-plies', type=int,
+                        default=MctsEngine._DEFAULT_MAX_PLAYOUT_PLIES)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('-b', '--batch-size', type=int, default=1,
+                        help='playouts per leaf, run together with NumPy')
+    args = parser.parse_args()
+
+    position = XiangqiGame()
+    position.set_fen(args.fen)
+    engine = MctsEngine(args.exploration,
+                        max_playout_plies=args.max_playout_plies,
+                        seed=args.seed, batch_size=args.batch_size)
+
+    start = time.monotonic()
+    best_move, win_rate = engine.search(position, args.playouts,
+                                        args.movetime)
+    seconds = time.monotonic() - start
+    if best_move is None:
+        print('no legal moves')
+    else:
+        print(f'bestmove {AlgNot.row_col_to_alg(best_move[0])}-'
+              f'{AlgNot.row_col_to_alg(best_move[1])} '
+              f'win rate {win_rate:.3f}')
+    print(f'{engine.get_playout_count()} playouts, '
+          f'{engine.get_playout_plies()} plies in {seconds:.2f}s '
+          f'({engine.get_playout_plies() / max(seconds, 1e-9):.0f} plies/s)')
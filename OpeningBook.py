@@ -0,0 +1,472 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a binary opening book for Xiangqi. A book file is
+#              a sorted array of fixed size (position hash, move, weight)
+#              records that is memory-mapped and binary searched, so a
+#              lookup neither loads the whole file nor parses any text.
+#              Books are built by replaying game collections through
+#              XiangqiGame.make_move().
+
+import mmap
+import random
+import struct
+
+from XiangqiGame import (XiangqiGame, AlgNot, Board, Error,
+                         AlgStrFormattingError)
+
+
+class OpeningBook:
+    """Class to look up book moves for a position in a memory-mapped book
+    file.
+
+    The file consists of a header followed by records sorted by position
+    hash (see OpeningBookBuilder.write()). Each record is:
+        - the canonical position hash (XiangqiGame.get_canonical_hash()),
+          unsigned 64 bit,
+        - the move encoded as start square * 90 + end square (see
+          Board.pos_to_sq()), unsigned 16 bit,
+        - the weight of the move, unsigned 16 bit.
+
+    A position and its left to right mirror image share one set of records.
+    Moves are stored as played in the position with the canonical hash and
+    are mirrored on lookup when the other one is on the board.
+
+    Can be used as a context manager to close the mapping when done.
+    """
+    # Class level constants
+    _MAGIC = b'XQOB'
+    _VERSION = 2  # 1 used plain position hashes.
+    _HEADER = struct.Struct('<4sHHI')  # magic, version, reserved, count
+    _RECORD = struct.Struct('<QHH')    # hash, move, weight
+
+    def __init__(self, path):
+        """Open and memory-map the book file at path.
+
+        Raises
+        ------
+        BookFormatError:
+            When the file is not an opening book or is truncated.
+
+        Parameters
+        ----------
+        path: str
+            Path of the book file to open.
+        """
+        self._file = open(path, 'rb')
+        self._mmap = None
+        self._count = 0
+
+        try:
+            header = self._file.read(OpeningBook._HEADER.size)
+            if len(header) < OpeningBook._HEADER.size:
+                raise BookFormatError(path, 'file too short for header')
+
+            magic, version, reserved, count = OpeningBook._HEADER.unpack(header)
+            if magic != OpeningBook._MAGIC:
+                raise BookFormatError(path, 'bad magic number')
+            if version != OpeningBook._VERSION:
+                raise BookFormatError(path, f'unsupported version {version}')
+
+            expected_size = (OpeningBook._HEADER.size
+                             + count * OpeningBook._RECORD.size)
+            self._file.seek(0, 2)
+            if self._file.tell() < expected_size:
+                raise BookFormatError(path, 'file truncated')
+
+            # Empty files can't be mapped so only map books with records.
+            if count > 0:
+                self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            self._count = count
+        except Exception:
+            self._file.close()
+            raise
+
+    def __enter__(self):
+        """Enter context. Return the book itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context. Close the book."""
+        self.close()
+
+    def __len__(self):
+        """Return the number of records in the book."""
+        return self._count
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def get_record(self, index):
+        """Read the record at the given index.
+
+        Parameters
+        ----------
+        index: int
+            Record index in [0..len(book) - 1].
+
+        Returns
+        -------
+        tuple of int
+            Size 3 tuple of (hash, move, weight).
+        """
+        offset = OpeningBook._HEADER.size + index * OpeningBook._RECORD.size
+        return OpeningBook._RECORD.unpack_from(self._mmap, offset)
+
+    def get_hash(self, index):
+        """Read only the hash of the record at the given index."""
+        offset = OpeningBook._HEADER.size + index * OpeningBook._RECORD.size
+        return struct.unpack_from('<Q', self._mmap, offset)[0]
+
+    def find_first(self, pos_hash):
+        """Binary search for the first record with the given hash.
+
+        Parameters
+        ----------
+        pos_hash: int
+            Position hash to search for.
+
+        Returns
+        -------
+        int
+            Index of the first record whose hash is not less than
+            pos_hash. Equal to len(book) if there is no such record.
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.get_hash(mid) < pos_hash:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def get_entries(self, pos_hash):
+        """Get all the book moves stored for a position hash.
+
+        Parameters
+        ----------
+        pos_hash: int
+            Canonical position hash to look up (see
+            XiangqiGame.get_canonical_hash()).
+
+        Returns
+        -------
+        list of tuple
+            List of size 3 tuples (beg_pos, end_pos, weight) where the
+            positions are in row/col notation, as played in the canonical
+            position. Empty if the position is not in the book.
+        """
+        entries = []
+        index = self.find_first(pos_hash)
+
+        # Records with the same hash are stored next to each other.
+        while index < self._count:
+            rec_hash, move, weight = self.get_record(index)
+            if rec_hash != pos_hash:
+                break
+            beg_pos, end_pos = OpeningBook.decode_move(move)
+            entries.append((beg_pos, end_pos, weight))
+            index += 1
+
+        return entries
+
+    def get_moves(self, game):
+        """Get the book moves for the current position of a game.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to look up the current position of.
+
+        Returns
+        -------
+        list of tuple
+            List of size 3 tuples (alg_start, alg_end, weight) in
+            algebraic notation, sorted by decreasing weight.
+        """
+        pos_hash, mirrored = game.get_canonical_hash()
+        entries = self.get_entries(pos_hash)
+        if mirrored:
+            entries = [(*Board.mirror_move((beg_pos, end_pos)), weight)
+                       for beg_pos, end_pos, weight in entries]
+
+        # Skip entries whose start square does not hold one of the mover's
+        # pieces. These can only come from a hash collision.
+        board = game.get_board()
+        mover = game.get_mover()
+        moves = [(AlgNot.row_col_to_alg(beg_pos),
+                  AlgNot.row_col_to_alg(end_pos),
+                  weight)
+                 for beg_pos, end_pos, weight in entries
+                 if board.get_piece(beg_pos) is not None
+                 and board.get_piece(beg_pos).get_player() is mover]
+
+        moves.sort(key=lambda move: move[2], reverse=True)
+        return moves
+
+    def choose_move(self, game, rng=None):
+        """Pick a book move for the current position of a game at random,
+        in proportion to the move weights.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to pick a move for.
+        rng: random.Random
+            Random number generator to use. If None uses the random module.
+
+        Returns
+        -------
+        tuple of str
+            Size 2 tuple (alg_start, alg_end). None if the position is not
+            in the book.
+        """
+        moves = self.get_moves(game)
+        if len(moves) == 0:
+            return None
+
+        rng = random if rng is None else rng
+        weights = [max(weight, 1) for alg_start, alg_end, weight in moves]
+        alg_start, alg_end, weight = rng.choices(moves, weights)[0]
+        return alg_start, alg_end
+
+    @staticmethod
+    def encode_move(beg_pos, end_pos):
+        """Pack a move into 16 bits as start square * 90 + end square."""
+        return (Board.pos_to_sq(beg_pos) * Board.get_SQUARE_COUNT()
+                + Board.pos_to_sq(end_pos))
+
+    @staticmethod
+    def decode_move(move):
+        """Unpack a move packed by OpeningBook.encode_move(). Returns a size 2
+        tuple (beg_pos, end_pos)."""
+        beg_sq, end_sq = divmod(move, Board.get_SQUARE_COUNT())
+        return Board.sq_to_pos(beg_sq), Board.sq_to_pos(end_sq)
+
+
+class OpeningBookBuilder:
+    """Class to collect moves from games and write them out as an opening
+    book file readable by OpeningBook.
+
+    Games are replayed with XiangqiGame.make_move() so only legal moves
+    make it into the book. Every time a move is played from a position its
+    weight in the book goes up by one. A move played in the mirror image of
+    a position counts towards the mirrored move.
+    """
+    # Class level constants
+    _DEFAULT_MAX_PLY = 15
+    _MAX_WEIGHT = 0xFFFF
+    _MOVE_SEPARATOR = '-'
+    _COMMENT = '#'
+
+    def __init__(self, max_ply=_DEFAULT_MAX_PLY):
+        """Create an empty builder.
+
+        Parameters
+        ----------
+        max_ply: int
+            Number of plies from the start of each game to add to the book.
+        """
+        self._max_ply = max_ply
+        self._weights = {}  # (canonical hash, move) -> weight
+        self._game_count = 0
+
+    def get_game_count(self):
+        """Getter. Return the number of games added so far."""
+        return self._game_count
+
+    def get_entry_count(self):
+        """Getter. Return the number of distinct (position, move) entries."""
+        return len(self._weights)
+
+    def add_game(self, moves):
+        """Replay a game and add its opening moves to the book.
+
+        Replay stops at the first illegal move. Plies played before it are
+        still added.
+
+        Parameters
+        ----------
+        moves: iterable of tuple of str
+            Size 2 tuples (alg_start, alg_end) in the order they were played.
+
+        Returns
+        -------
+        int
+            Number of plies added to the book.
+        """
+        game = XiangqiGame()
+        ply = 0
+
+        for alg_start, alg_end in moves:
+            if ply >= self._max_ply:
+                break
+
+            # Hash must be taken before the move is made.
+            pos_hash, mirrored = game.get_canonical_hash()
+            if not game.make_move(alg_start, alg_end):
+                break
+
+            move = (AlgNot.alg_to_row_col(alg_start),
+                    AlgNot.alg_to_row_col(alg_end))
+            if mirrored:
+                move = Board.mirror_move(move)
+            key = (pos_hash, OpeningBook.encode_move(*move))
+            self._weights[key] = min(self._weights.get(key, 0) + 1,
+                                     OpeningBookBuilder._MAX_WEIGHT)
+            ply += 1
+
+        self._game_count += 1
+        return ply
+
+    def add_game_file(self, path):
+        """Add all the games of a text game collection.
+
+        The collection has one game per line. Each game is a whitespace
+        separated list of moves written as <start>-<end>, for example
+        "h3-e3 h10-g8 h1-g3". Blank lines and lines starting with '#' are
+        skipped.
+
+        Raises
+        ------
+        GameFileFormatError:
+            When a line has a move that can't be read. Games on the lines
+            before it have already been added.
+
+        Parameters
+        ----------
+        path: str
+            Path to the game collection.
+
+        Returns
+        -------
+        int
+            Number of games read.
+        """
+        count = 0
+        with open(path) as infile:
+            for line_number, line in enumerate(infile, 1):
+                line = line.strip()
+                if len(line) == 0 or line.startswith(self._COMMENT):
+                    continue
+                try:
+                    moves = OpeningBookBuilder.parse_moves(line)
+                except MoveFormatError as err:
+                    raise GameFileFormatError(path, line_number, err)
+                self.add_game(moves)
+                count += 1
+        return count
+
+    def write(self, path):
+        """Write the collected entries to a book file sorted by hash.
+
+        Parameters
+        ----------
+        path: str
+            Path of the book file to write.
+
+        Returns
+        -------
+        None
+        """
+        with open(path, 'wb') as outfile:
+            outfile.write(OpeningBook._HEADER.pack(OpeningBook._MAGIC,
+                                                   OpeningBook._VERSION,
+                                                   0,
+                                                   len(self._weights)))
+            for (pos_hash, move), weight in sorted(self._weights.items()):
+                outfile.write(OpeningBook._RECORD.pack(pos_hash, move, weight))
+
+    @staticmethod
+    def parse_moves(line):
+        """Split a line of <start>-<end> moves into size 2 tuples of str.
+
+        Raises
+        ------
+        MoveFormatError:
+            When a move is not two algebraic notation positions joined by
+            '-'.
+        """
+        moves = []
+        for token in line.split():
+            move = tuple(token.split(OpeningBookBuilder._MOVE_SEPARATOR, 1))
+            if len(move) != 2:
+                raise MoveFormatError(token)
+            try:
+                for alg_str in move:
+                    AlgNot.alg_to_row_col(alg_str)
+            except AlgStrFormattingError:
+                raise MoveFormatError(token)
+            moves.append(move)
+        return moves
+
+
+class BookError(Error):
+    """Base exception class for opening book errors."""
+    pass
+
+
+class BookFormatError(BookError):
+    """Exception class for when a file is not a valid opening book."""
+    def __init__(self, path, reason):
+        """Create an instance of BookFormatError.
+
+        path should be the offending file and reason a short description
+        of what is wrong with it.
+        """
+        self._path = path
+        self._reason = reason
+        super().__init__(f'{path} is not a valid opening book: {reason}.')
+
+
+class MoveFormatError(BookError):
+    """Exception class for a game collection move that is not written as
+    <start>-<end>."""
+    def __init__(self, token):
+        """Create an instance of MoveFormatError."""
+        self._token = token
+        super().__init__(f'Expected <start>-<end> move but got "{token}".')
+
+
+class GameFileFormatError(BookError):
+    """Exception class for a game collection line that can't be read."""
+    def __init__(self, path, line_number, reason):
+        """Create an instance of GameFileFormatError.
+
+        path should be the game collection, line_number the offending line
+        and reason what is wrong with it.
+        """
+        self._path = path
+        self._line_number = line_number
+        self._reason = reason
+        super().__init__(f'{path} line {line_number}: {reason}')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Build an opening book from a game collection.')
+    parser.add_argument('games', nargs='+',
+                        help='game collection files (one game per line)')
+    parser.add_argument('-o', '--output', required=True,
+                        help='book file to write')
+    parser.add_argument('--max-ply', type=int,
+                        default=OpeningBookBuilder._DEFAULT_MAX_PLY,
+                        help='number of opening plies to keep per game')
+    args = parser.parse_args()
+
+    builder = OpeningBookBuilder(args.max_ply)
+    try:
+        for games_path in args.games:
+            builder.add_game_file(games_path)
+    except Error as err:
+        parser.error(str(err))
+    builder.write(args.output)
+    print(f'{builder.get_game_count()} games, '
+          f'{builder.get_entry_count()} entries written to {args.output}')
@@ -0,0 +1,387 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a position index for Xiangqi game collections. Games
+#              are replayed with XiangqiGame and every position they reach
+#              is stored in a local SQLite database keyed by its position
+#              hash, together with the move played from it and per move
+#              frequency and result statistics. Looking up a position is an
+#              index search instead of a scan of the whole archive.
+
+import sqlite3
+
+from GameRecord import GameRecord, GameRecordFile
+from XiangqiGame import XiangqiGame, Error
+
+
+class PositionIndex:
+    """Class to ingest games into a SQLite position database and answer
+    "which games reached this position, and what was played next".
+
+    The database has three tables:
+        - games: one row per game (id, result, start FEN, source).
+        - positions: one row per (position hash, game, ply) with the move
+          played from the position (NULL for a game's final position).
+        - moves: one row per (position hash, move) with the number of
+          times the move was played and how the games ended.
+
+    Position hashes are XiangqiGame.get_hash() values. They are unsigned
+    64 bit so they are stored shifted into SQLite's signed range (see
+    PositionIndex.to_key()). Moves are packed as start square * 90 + end
+    square (see GameRecord.encode_move()).
+
+    Games are inserted in batches, each batch in a single transaction.
+
+    Can be used as a context manager to close the database when done.
+    """
+    # Class level constants
+    _DEFAULT_BATCH_SIZE = 500  # Games per transaction.
+    _HASH_OFFSET = 1 << 63
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS games (
+            id INTEGER PRIMARY KEY,
+            result TEXT NOT NULL,
+            start_fen TEXT,
+            source TEXT);
+        CREATE TABLE IF NOT EXISTS positions (
+            hash INTEGER NOT NULL,
+            game_id INTEGER NOT NULL REFERENCES games(id),
+            ply INTEGER NOT NULL,
+            move INTEGER,
+            PRIMARY KEY (hash, game_id, ply)) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS positions_game
+            ON positions (game_id, ply);
+        CREATE TABLE IF NOT EXISTS moves (
+            hash INTEGER NOT NULL,
+            move INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            red_wins INTEGER NOT NULL,
+            black_wins INTEGER NOT NULL,
+            draws INTEGER NOT NULL,
+            PRIMARY KEY (hash, move)) WITHOUT ROWID;
+        '''
+    _UPSERT_MOVE = '''
+        INSERT INTO moves VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (hash, move) DO UPDATE SET
+            count = count + excluded.count,
+            red_wins = red_wins + excluded.red_wins,
+            black_wins = black_wins + excluded.black_wins,
+            draws = draws + excluded.draws
+        '''
+    # Index of the result in the (red_wins, black_wins, draws) counters.
+    _RESULT_COLUMNS = {GameRecord.get_RESULTS()[1]: 0,
+                       GameRecord.get_RESULTS()[2]: 1,
+                       GameRecord.get_RESULTS()[3]: 2}
+
+    def __init__(self, path, batch_size=_DEFAULT_BATCH_SIZE):
+        """Open (creating if needed) the position database at path.
+
+        Parameters
+        ----------
+        path: str
+            Path of the SQLite database. ':memory:' for a temporary one.
+        batch_size: int
+            Number of games inserted per transaction by add_records().
+        """
+        self._conn = sqlite3.connect(path)
+        self._batch_size = batch_size
+        with self._conn:
+            self._conn.executescript(PositionIndex._SCHEMA)
+
+    def __enter__(self):
+        """Enter context. Return the index itself."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit context. Close the database."""
+        self.close()
+
+    def close(self):
+        """Close the database."""
+        self._conn.close()
+
+    def get_game_count(self):
+        """Getter. Return the number of games in the database."""
+        return self._conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+    def get_position_count(self):
+        """Getter. Return the number of distinct positions in the database."""
+        return self._conn.execute(
+            'SELECT COUNT(DISTINCT hash) FROM positions').fetchone()[0]
+
+    def add_records(self, records, source=None):
+        """Replay and insert games. Every batch of games is inserted in a
+        single transaction.
+
+        Replay of a game stops at its first illegal move. Positions reached
+        before it are still inserted.
+
+        Parameters
+        ----------
+        records: iterable of GameRecord
+            Games to insert.
+        source: str
+            Optional name of where the games came from (e.g. a file name).
+
+        Returns
+        -------
+        int
+            Number of games inserted.
+        """
+        count = 0
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self._batch_size:
+                count += self.insert_batch(batch, source)
+                batch = []
+        if len(batch) > 0:
+            count += self.insert_batch(batch, source)
+        return count
+
+    def add_record_file(self, path):
+        """Insert all the games of a record file (see GameRecordFile).
+
+        Returns
+        -------
+        int
+            Number of games inserted.
+        """
+        with GameRecordFile(path) as records:
+            return self.add_records(records, path)
+
+    def add_game(self, game, result=None):
+        """Insert the moves played so far in a game.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to insert.
+        result: str
+            Result to record. If None it is worked out from the game state
+            (see GameRecord.from_game()).
+
+        Returns
+        -------
+        int
+            Number of games inserted (1).
+        """
+        return self.add_records([GameRecord.from_game(game, result)])
+
+    def insert_batch(self, records, source):
+        """Helper method for add_records(). Replay the games and insert them
+        in one transaction.
+
+        Returns
+        -------
+        int
+            Number of games inserted.
+        """
+        rows = []   # (hash key, game id, ply, move)
+        moves = {}  # (hash key, move) -> [count, red_wins, black_wins, draws]
+
+        with self._conn:
+            for record in records:
+                cursor = self._conn.execute(
+                    'INSERT INTO games (result, start_fen, source) '
+                    'VALUES (?, ?, ?)',
+                    (record.get_result(), record.get_start_fen(), source))
+                game_id = cursor.lastrowid
+                column = PositionIndex._RESULT_COLUMNS.get(record.get_result())
+
+                for ply, pos_hash, move in PositionIndex.replay(record):
+                    key = PositionIndex.to_key(pos_hash)
+                    rows.append((key, game_id, ply, move))
+                    if move is None:
+                        continue
+                    stats = moves.setdefault((key, move), [0, 0, 0, 0])
+                    stats[0] += 1
+                    if column is not None:
+                        stats[column + 1] += 1
+
+            self._conn.executemany(
+                'INSERT INTO positions VALUES (?, ?, ?, ?)', rows)
+            self._conn.executemany(
+                PositionIndex._UPSERT_MOVE,
+                [(key, move, *stats) for (key, move), stats in moves.items()])
+
+        return len(records)
+
+    @staticmethod
+    def replay(record):
+        """Replay a game record position by position.
+
+        Moves are made with XiangqiGame.push_move() without checking for the
+        end of the game (unlike GameRecord.to_game()). The replay stops at
+        the first illegal move.
+
+        Parameters
+        ----------
+        record: GameRecord
+            Game to replay.
+
+        Yields
+        ------
+        tuple
+            Size 3 tuples (ply, position hash, packed move) for each
+            position reached. The move is the one played from the position
+            or None for the last position.
+        """
+        game = XiangqiGame()
+        if record.get_start_fen() is not None:
+            game.set_fen(record.get_start_fen())
+
+        ply = 0
+        for move in record.get_packed_moves():
+            pos_hash = game.get_hash()
+            try:
+                game.push_move(*GameRecord.decode_move(move),
+                               detect_game_over=False)
+            except Error:
+                break
+            yield ply, pos_hash, move
+            ply += 1
+        yield ply, game.get_hash(), None
+
+    def find_games(self, position, limit=None):
+        """Find the games that reached a position.
+
+        Parameters
+        ----------
+        position: XiangqiGame or int
+            Game in the position to look up, or its XiangqiGame.get_hash().
+        limit: int
+            Maximum number of games to return. None for all.
+
+        Returns
+        -------
+        list of tuple
+            Size 3 tuples (game id, ply, result) ordered by game id. The ply
+            is the first one at which the game reached the position.
+        """
+        query = ('SELECT positions.game_id, MIN(positions.ply), games.result '
+                 'FROM positions JOIN games ON games.id = positions.game_id '
+                 'WHERE positions.hash = ? '
+                 'GROUP BY positions.game_id ORDER BY positions.game_id')
+        params = [PositionIndex.to_key(PositionIndex.find_hash(position))]
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return self._conn.execute(query, params).fetchall()
+
+    def find_next_moves(self, position):
+        """Find what was played next from a position.
+
+        Parameters
+        ----------
+        position: XiangqiGame or int
+            Game in the position to look up, or its XiangqiGame.get_hash().
+
+        Returns
+        -------
+        list of tuple
+            Size 6 tuples (beg_pos, end_pos, count, red_wins, black_wins,
+            draws), most played first.
+        """
+        rows = self._conn.execute(
+            'SELECT move, count, red_wins, black_wins, draws FROM moves '
+            'WHERE hash = ? ORDER BY count DESC, move',
+            (PositionIndex.to_key(PositionIndex.find_hash(position)),))
+        return [(*GameRecord.decode_move(move), *stats)
+                for move, *stats in rows]
+
+    def get_record(self, game_id):
+        """Rebuild the record of a game in the database.
+
+        Raises
+        ------
+        UnknownGameIdError:
+            When there is no game with the id.
+
+        Parameters
+        ----------
+        game_id: int
+            Id of the game (see find_games()).
+
+        Returns
+        -------
+        GameRecord
+            Record of the moves that were inserted for the game.
+        """
+        row = self._conn.execute(
+            'SELECT result, start_fen FROM games WHERE id = ?',
+            (game_id,)).fetchone()
+        if row is None:
+            raise UnknownGameIdError(game_id)
+        moves = [move for move, in self._conn.execute(
+            'SELECT move FROM positions WHERE game_id = ? '
+            'AND move IS NOT NULL ORDER BY ply', (game_id,))]
+        return GameRecord(moves, *row)
+
+    @staticmethod
+    def find_hash(position):
+        """Return the position hash of a game, or position itself if it is
+        already a hash."""
+        if isinstance(position, XiangqiGame):
+            return position.get_hash()
+        return position
+
+    @staticmethod
+    def to_key(pos_hash):
+        """Shift an unsigned 64 bit position hash into SQLite's signed 64 bit
+        integer range."""
+        return pos_hash - PositionIndex._HASH_OFFSET
+
+
+class PositionIndexError(Error):
+    """Base exception class for position index errors."""
+    pass
+
+
+class UnknownGameIdError(PositionIndexError):
+    """Exception class for looking up a game id not in the database."""
+    def __init__(self, game_id):
+        """Create an instance of UnknownGameIdError."""
+        self._game_id = game_id
+        super().__init__(f'No game with id {game_id} in the database.')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from XiangqiGame import AlgNot
+
+    parser = argparse.ArgumentParser(
+        description='Add games to a position database and look up what was '
+                    'played from a position.')
+    parser.add_argument('database', help='SQLite database file')
+    parser.add_argument('-a', '--add', nargs='+', default=[],
+                        help='record files to add (see GameRecord.py)')
+    parser.add_argument('--fen', default=None,
+                        help='position to look up (default: start position)')
+    parser.add_argument('--moves', nargs='*', default=None,
+                        help='moves <start>-<end> played from the position '
+                             'to look up, e.g. h3-e3 h10-g8')
+    args = parser.parse_args()
+
+    with PositionIndex(args.database) as index:
+        for record_path in args.add:
+            count = index.add_record_file(record_path)
+            print(f'{count} games added from {record_path}')
+
+        if args.fen is not None or args.moves is not None:
+            game = XiangqiGame()
+            if args.fen is not None:
+                game.set_fen(args.fen)
+            for move in args.moves or []:
+                if not game.make_move(*move.split('-', 1)):
+                    parser.error(f'illegal move {move}')
+
+            print(f'{len(index.find_games(game))} games reached the position')
+            next_moves = index.find_next_moves(game)
+            for beg_pos, end_pos, count, red, black, draws in next_moves:
+                print(f'{AlgNot.row_col_to_alg(beg_pos)}-'
+                      f'{AlgNot.row_col_to_alg(end_pos)} {count} '
+                      f'(+{red} ={draws} -{black})')
+        else:
+            print(f'{index.get_game_count()} games, '
+                  f'{index.get_position_count()} positions')
@@ -0,0 +1,307 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a batch checker for Xiangqi mate puzzles. A puzzle
+#              file lists positions with their expected solutions. Every
+#              solution line is replayed with XiangqiGame.make_move() to
+#              make sure it is legal and ends in mate, and the position is
+#              solved again by the MateSolver in a pool of worker
+#              processes. Results are streamed out as JSON lines while the
+#              rest of the file is still being worked on.
+
+import json
+import multiprocessing
+import time
+
+from MateSolver import MateSolver
+from XiangqiGame import XiangqiGame, AlgNot, Error
+
+
+class PuzzleRunner:
+    """Class to check a collection of mate puzzles in parallel.
+
+    A puzzle file has one puzzle per line: the FEN of the position, a ';',
+    then the expected solution as whitespace separated <start>-<end> moves
+    for both sides, ending with the mating move, for example
+
+        3a5/C3a4/4k2N1/9/9/9/9/3K5/3R5/9 w - - 0 1; d2-e2 e8-f8 h8-g10
+
+    Blank lines and lines starting with '#' are skipped. A puzzle is
+        - 'solved' if its solution is legal and mates, and the solver proves
+          a mate in at most as many moves,
+        - 'failed' if the line can't be read, the solution is illegal or
+          does not mate, or the solver proves there is no such mate (it
+          only tries checking moves for the attacker, see MateSolver),
+        - 'timeout' if the solver hits its node or time limit first.
+    """
+    # Class level constants
+    _DEFAULT_MAX_NODES = 200000
+    _DEFAULT_MAX_TIME = 10.0  # Seconds per puzzle.
+    _CHUNK_SIZE = 8           # Puzzles handed to a worker at a time.
+    _SEPARATOR = ';'
+    _MOVE_SEPARATOR = '-'
+    _COMMENT = '#'
+
+    # Puzzle statuses
+    _SOLVED = 'solved'
+    _FAILED = 'failed'
+    _TIMEOUT = 'timeout'
+
+    def __init__(self, processes=None, max_nodes=_DEFAULT_MAX_NODES,
+                 max_time=_DEFAULT_MAX_TIME):
+        """Create a runner.
+
+        Parameters
+        ----------
+        processes: int
+            Number of worker processes. If None uses the CPU count.
+        max_nodes: int
+            Most solver nodes per puzzle.
+        max_time: float
+            Most solver seconds per puzzle. None for no limit.
+        """
+        self._processes = (multiprocessing.cpu_count() if processes is None
+                           else processes)
+        self._max_nodes = max_nodes
+        self._max_time = max_time
+
+    def run(self, puzzles):
+        """Check puzzles, yielding each result as soon as it is ready.
+
+        Parameters
+        ----------
+        puzzles: iterable of tuple
+            Size 2 tuples (puzzle id, line) where line is a puzzle as
+            written in a puzzle file.
+
+        Yields
+        ------
+        dict
+            Result of a puzzle (see PuzzleRunner.check_puzzle()). Results
+            come in the order they finish, not the order of the puzzles.
+        """
+        with multiprocessing.Pool(self._processes, initializer=_init_worker,
+                                  initargs=(self._max_nodes, self._max_time)
+                                  ) as pool:
+            yield from pool.imap_unordered(_check_puzzle, puzzles,
+                                           PuzzleRunner._CHUNK_SIZE)
+
+    def run_file(self, path):
+        """Check every puzzle of a puzzle file. Puzzle ids are line numbers.
+        See run()."""
+        yield from self.run(PuzzleRunner.read_puzzles(path))
+
+    @staticmethod
+    def read_puzzles(path):
+        """Read a puzzle file lazily.
+
+        Yields
+        ------
+        tuple
+            Size 2 tuples (line number, line) of the lines holding puzzles.
+        """
+        with open(path) as infile:
+            for line_number, line in enumerate(infile, 1):
+                line = line.strip()
+                if len(line) == 0 or line.startswith(PuzzleRunner._COMMENT):
+                    continue
+                yield line_number, line
+
+    @staticmethod
+    def parse_puzzle(line):
+        """Split a puzzle line into its FEN and solution.
+
+        Raises
+        ------
+        PuzzleFormatError:
+            When the line has no solution.
+
+        Parameters
+        ----------
+        line: str
+            Puzzle as written in a puzzle file.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (fen, moves) where moves is a list of size 2
+            tuples (alg_start, alg_end).
+        """
+        fen, separator, solution = line.partition(PuzzleRunner._SEPARATOR)
+        tokens = solution.split()
+        if separator == '' or len(tokens) == 0:
+            raise PuzzleFormatError(line)
+        moves = [tuple(token.split(PuzzleRunner._MOVE_SEPARATOR, 1))
+                 for token in tokens]
+        if any(len(move) != 2 for move in moves):
+            raise PuzzleFormatError(line)
+        return fen.strip(), moves
+
+    @staticmethod
+    def check_solution(fen, moves):
+        """Replay a solution and make sure it mates.
+
+        Raises
+        ------
+        FenFormattingError, BoardError, PlayerError:
+            When the FEN is not a valid position (see XiangqiGame.set_fen()).
+        IllegalSolutionError:
+            When a move of the solution is illegal or the solution does not
+            end with the mover of the FEN winning.
+
+        Parameters
+        ----------
+        fen: str
+            Puzzle position.
+        moves: list of tuple of str
+            Size 2 tuples (alg_start, alg_end) of the solution.
+
+        Returns
+        -------
+        None
+        """
+        game = XiangqiGame()
+        game.set_fen(fen)
+        defender = game.get_inactive().get_color()
+
+        for ply, (alg_start, alg_end) in enumerate(moves):
+            if not game.make_move(alg_start, alg_end):
+                raise IllegalSolutionError(
+                    f'move {alg_start}-{alg_end} at ply {ply} is illegal')
+
+        if game.get_game_state() != XiangqiGame.get_LOSS()[defender]:
+            raise IllegalSolutionError('solution does not end in mate')
+
+    @staticmethod
+    def check_puzzle(solver, puzzle_id, line):
+        """Check one puzzle.
+
+        Parameters
+        ----------
+        solver: MateSolver
+            Solver to use.
+        puzzle_id: int
+            Id to report the puzzle under.
+        line: str
+            Puzzle as written in a puzzle file.
+
+        Returns
+        -------
+        dict
+            Dictionary with keys 'id', 'status' (one of 'solved', 'failed'
+            or 'timeout'), 'fen', 'expected' and 'found' (moves as
+            <start>-<end> strings, 'found' empty unless solved), 'mate_in'
+            (attacker moves of the mate found, None unless solved), 'nodes'
+            and 'seconds'. Failed puzzles also have a 'reason'.
+        """
+        result = {'id': puzzle_id, 'status': PuzzleRunner._FAILED,
+                  'fen': line, 'expected': [], 'found': [], 'mate_in': None,
+                  'nodes': 0, 'seconds': 0.0}
+        start = time.time()
+
+        try:
+            fen, moves = PuzzleRunner.parse_puzzle(line)
+            result['fen'] = fen
+            result['expected'] = [PuzzleRunner._MOVE_SEPARATOR.join(move)
+                                  for move in moves]
+            PuzzleRunner.check_solution(fen, moves)
+        except Error as err:
+            result['reason'] = str(err)
+            result['seconds'] = round(time.time() - start, 4)
+            return result
+
+        game = XiangqiGame()
+        game.set_fen(fen)
+        status, found = solver.find_mate(game, (len(moves) + 1) // 2)
+
+        result['nodes'] = solver.get_node_count()
+        result['seconds'] = round(time.time() - start, 4)
+        if status == MateSolver.get_PROVED():
+            result['status'] = PuzzleRunner._SOLVED
+            result['found'] = [AlgNot.row_col_to_alg(beg_pos)
+                               + PuzzleRunner._MOVE_SEPARATOR
+                               + AlgNot.row_col_to_alg(end_pos)
+                               for beg_pos, end_pos in found]
+            result['mate_in'] = (len(found) + 1) // 2
+        elif status == MateSolver.get_DISPROVED():
+            result['reason'] = 'solver found no mate by checks'
+        else:
+            result['status'] = PuzzleRunner._TIMEOUT
+        return result
+
+    @staticmethod
+    def get_STATUSES():
+        """Getter. Return the puzzle statuses ('solved', 'failed',
+        'timeout')."""
+        return (PuzzleRunner._SOLVED, PuzzleRunner._FAILED,
+                PuzzleRunner._TIMEOUT)
+
+
+# Per process state of the worker processes (see _init_worker()).
+_worker = {}
+
+
+def _init_worker(max_nodes, max_time):
+    """Worker initializer. Create the worker's solver."""
+    _worker['solver'] = MateSolver(max_nodes, max_time)
+
+
+def _check_puzzle(puzzle):
+    """Worker task. Check a size 2 tuple (puzzle id, line) with
+    PuzzleRunner.check_puzzle()."""
+    return PuzzleRunner.check_puzzle(_worker['solver'], *puzzle)
+
+
+class PuzzleError(Error):
+    """Base exception class for puzzle errors."""
+    pass
+
+
+class PuzzleFormatError(PuzzleError):
+    """Exception class for a puzzle line that can't be read."""
+    def __init__(self, line):
+        """Create an instance of PuzzleFormatError."""
+        self._line = line
+        super().__init__('Expected <fen>; <start>-<end> ... but got '
+                         + f'"{line}".')
+
+
+class IllegalSolutionError(PuzzleError):
+    """Exception class for a puzzle solution that is illegal or does not
+    mate."""
+    pass
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        description='Check a file of mate puzzles (<fen>; <solution> per '
+                    'line) and write the results as JSON lines.')
+    parser.add_argument('puzzles', help='puzzle file')
+    parser.add_argument('-o', '--output', default=None,
+                        help='file to write results to (default: stdout)')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--max-nodes', type=int,
+                        default=PuzzleRunner._DEFAULT_MAX_NODES,
+                        help='solver nodes per puzzle')
+    parser.add_argument('-t', '--max-time', type=float,
+                        default=PuzzleRunner._DEFAULT_MAX_TIME,
+                        help='solver seconds per puzzle')
+    args = parser.parse_args()
+
+    runner = PuzzleRunner(args.processes, args.max_nodes, args.max_time)
+    counts = dict.fromkeys(PuzzleRunner.get_STATUSES(), 0)
+    outfile = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        for puzzle_result in runner.run_file(args.puzzles):
+            counts[puzzle_result['status']] += 1
+            outfile.write(json.dumps(puzzle_result) + '\n')
+            outfile.flush()
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    print(', '.join(f'{count} {status}' for status, count in counts.items()),
+          file=sys.stderr)
@@ -0,0 +1,971 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines endgame tablebases for Xiangqi. For a small set
+#              of material (e.g. chariot vs. two advisors) every legal
+#              placement of the pieces is enumerated and solved by
+#              retrograde analysis using the piece move rules of
+#              XiangqiGame. The result for each position (win, draw or
+#              loss for the player to move, with the distance to mate
+#              in plies) is stored in one byte per position in a table
+#              file, which is memory-mapped when probed.
+
+import mmap
+import multiprocessing
+import os
+import struct
+from array import array
+
+from XiangqiGame import (XiangqiGame, Board, Player, Error,
+                         IllegalMoveError, BoardError)
+
+
+class TablebaseIndex:
+    """Class to map positions of one material set to table indices and back.
+
+    Every piece of the material set is given a slot. Slot 0 and 1 hold the
+    'red' and 'black' generals, followed by the other 'red' pieces then the
+    other 'black' pieces in Player._PIECE_DCTS order. Each slot has a domain:
+    the squares the piece can ever stand on, found by following the piece's
+    moves from its starting squares. The index of a position is
+
+        color + 2 * (sum over slots of domain index * slot stride)
+
+    where color is 0 if 'red' is to move and 1 if 'black' is to move. Two
+    pieces of the same kind get separate slots so a position where they are
+    swapped has its own (equal valued) index.
+    """
+    # Cache of domains by (color, key) shared by all indices in a process.
+    _DOMAINS = {}
+
+    # Kinds whose moves can reach every square.
+    _FULL_BOARD_KEYS = (Player.get_HORSE(), Player.get_CHARIOT(),
+                        Player.get_CANNON())
+
+    def __init__(self, red_keys, black_keys):
+        """Create an index for a material set.
+
+        Parameters
+        ----------
+        red_keys: iterable of str
+            Piece dictionary keys of the 'red' pieces besides the general.
+        black_keys: iterable of str
+            Piece dictionary keys of the 'black' pieces besides the general.
+        """
+        self._red_keys = TablebaseIndex.sort_keys(red_keys)
+        self._black_keys = TablebaseIndex.sort_keys(black_keys)
+
+        # (color, key) of the piece in each slot.
+        self._slots = ([(Player.get_RED(), Player.get_GENERAL()),
+                        (Player.get_BLACK(), Player.get_GENERAL())]
+                       + [(Player.get_RED(), key) for key in self._red_keys]
+                       + [(Player.get_BLACK(), key) for key in self._black_keys])
+
+        # Domain squares of each slot and the reverse lookup.
+        self._domains = [TablebaseIndex.get_domain(color, key)
+                         for color, key in self._slots]
+        self._domain_indices = [{pos: i for i, pos in enumerate(domain)}
+                                for domain in self._domains]
+
+        # Mixed radix strides, first slot varies fastest.
+        self._strides = []
+        stride = 2
+        for domain in self._domains:
+            self._strides.append(stride)
+            stride *= len(domain)
+        self._size = stride
+
+    def get_size(self):
+        """Getter. Return the number of indices (positions) in the table."""
+        return self._size
+
+    def get_slots(self):
+        """Getter. Return the list of (color, key) for each slot."""
+        return self._slots
+
+    def get_red_keys(self):
+        """Getter. Return the sorted keys of the 'red' non-general pieces."""
+        return self._red_keys
+
+    def get_black_keys(self):
+        """Getter. Return the sorted keys of the 'black' non-general pieces."""
+        return self._black_keys
+
+    def get_name(self):
+        """Getter. Return the material signature, e.g. 'KR-KAA'."""
+        return TablebaseIndex.make_name(self._red_keys, self._black_keys)
+
+    def decode(self, index):
+        """Find the position for an index.
+
+        Parameters
+        ----------
+        index: int
+            Index in [0..size - 1].
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (pieces, color) where pieces is a list of size 3
+            tuples (color, key, pos) in slot order (suitable for
+            XiangqiGame.set_position()) and color the color to move.
+        """
+        color = Player.get_COLORS()[index % 2]
+        index //= 2
+
+        pieces = []
+        for (piece_color, key), domain in zip(self._slots, self._domains):
+            index, domain_index = divmod(index, len(domain))
+            pieces.append((piece_color, key, domain[domain_index]))
+
+        return pieces, color
+
+    def encode(self, pieces, color):
+        """Find the index of a position.
+
+        Pieces may be given in any order. Pieces of the same kind and color
+        fill that kind's slots in the order they are given.
+
+        Parameters
+        ----------
+        pieces: iterable of tuple
+            Size 3 tuples (color, key, pos) covering exactly the material
+            set of the index.
+        color: str
+            Color to move.
+
+        Returns
+        -------
+        int
+            Index of the position. None if a piece is on a square outside
+            of its domain or the pieces do not match the material set.
+        """
+        # Hand out slots to the pieces in order.
+        free_slots = {}
+        for slot, slot_key in enumerate(self._slots):
+            free_slots.setdefault(slot_key, []).append(slot)
+
+        index = 0 if color == Player.get_RED() else 1
+        count = 0
+        for piece_color, key, pos in pieces:
+            slots = free_slots.get((piece_color, key))
+            if not slots:
+                return None
+            slot = slots.pop(0)
+            domain_index = self._domain_indices[slot].get(pos)
+            if domain_index is None:
+                return None
+            index += domain_index * self._strides[slot]
+            count += 1
+
+        if count != len(self._slots):
+            return None
+        return index
+
+    @staticmethod
+    def sort_keys(keys):
+        """Sort piece dictionary keys in Player._PIECE_DCTS order."""
+        order = Player.get_PIECE_KEYS()
+        return tuple(sorted(keys, key=order.index))
+
+    @staticmethod
+    def make_name(red_keys, black_keys):
+        """Make the material signature for a material set. The signature
+        lists the piece letters (see Player._PIECE_DCTS) of each side,
+        'red' first, for example 'KR-KAA' for chariot vs. two advisors."""
+        sides = []
+        for keys in (red_keys, black_keys):
+            sides.append(Player.get_piece_letter(Player.get_GENERAL())
+                         + ''.join(Player.get_piece_letter(key)
+                                   for key in TablebaseIndex.sort_keys(keys)))
+        return '-'.join(sides)
+
+    @staticmethod
+    def parse_name(name):
+        """Split a material signature (see make_name()) into the 'red' and
+        'black' keys besides the generals.
+
+        Raises
+        ------
+        MaterialSignatureError:
+            When the signature is malformed.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (red_keys, black_keys) of sorted tuples of str.
+        """
+        sides = name.upper().split('-')
+        general_letter = Player.get_piece_letter(Player.get_GENERAL())
+        if len(sides) != 2:
+            raise MaterialSignatureError(name)
+
+        keys_by_side = []
+        for side in sides:
+            if not side.startswith(general_letter):
+                raise MaterialSignatureError(name)
+            keys = [Player.get_piece_key(letter) for letter in side[1:]]
+            if None in keys or Player.get_GENERAL() in keys:
+                raise MaterialSignatureError(name)
+            keys_by_side.append(TablebaseIndex.sort_keys(keys))
+
+        return keys_by_side[0], keys_by_side[1]
+
+    @staticmethod
+    def get_domain(color, key):
+        """Find every square a piece kind of a player can stand on.
+
+        Generals are confined to their castle. Horses, chariots and cannons
+        can go anywhere. For the other kinds the squares are found by
+        following the piece's own moves from its starting squares.
+
+        Parameters
+        ----------
+        color: str
+            Color of the player owning the piece.
+        key: str
+            Piece dictionary key of the piece kind.
+
+        Returns
+        -------
+        tuple of tuple of int
+            Sorted tuple of positions.
+        """
+        if (color, key) in TablebaseIndex._DOMAINS:
+            return TablebaseIndex._DOMAINS[(color, key)]
+
+        game = XiangqiGame()
+        if key == Player.get_GENERAL():
+            domain = set(game.get_board().get_castle(color))
+        elif key in TablebaseIndex._FULL_BOARD_KEYS:
+            domain = {Board.sq_to_pos(sq)
+                      for sq in range(Board.get_SQUARE_COUNT())}
+        else:
+            player = game.get_players()[color]
+            starts = [piece.get_pos() for piece in player.get_pieces()[key]]
+            domain = TablebaseIndex.find_reachable(color, key, starts)
+
+        TablebaseIndex._DOMAINS[(color, key)] = tuple(sorted(domain))
+        return TablebaseIndex._DOMAINS[(color, key)]
+
+    @staticmethod
+    def find_reachable(color, key, starts):
+        """Flood fill the squares reachable by a piece kind from its starting
+        squares, following the Board step tables. Nothing is placed on a
+        board, so blocked elephant eyes and other pieces are ignored.
+
+        Parameters
+        ----------
+        color: str
+            Color of the player owning the piece kind.
+        key: str
+            Piece dictionary key of an advisor, elephant or soldier.
+        starts: list of tuple of int
+            Starting positions of the piece kind.
+
+        Returns
+        -------
+        set of tuple of int
+            Set of reachable positions.
+        """
+        if key == Player.get_ADVISOR():
+            find_steps = Board.get_advisor_steps
+        elif key == Player.get_ELEPHANT():
+            def find_steps(pos, color):
+                return [target for target, eye
+                        in Board.get_elephant_steps(pos, color)]
+        else:
+            find_steps = Board.get_soldier_steps
+
+        frontier = list(starts)
+        reached = set(frontier)
+        while len(frontier) > 0:
+            pos = frontier.pop()
+            for end_pos in find_steps(pos, color):
+                if end_pos not in reached:
+                    reached.add(end_pos)
+                    frontier.append(end_pos)
+
+        return reached
+
+
+class TablebaseFile:
+    """Class for one memory-mapped table holding the results of every
+    position of a single material set.
+
+    The file is a header followed by one byte per index (see TablebaseIndex)
+    with the value of the position for the player to move:
+        - 0: the index is not a legal position,
+        - 1: draw (neither player can force mate),
+        - 2 + n: mate in n plies with best play. Even n means the player to
+          move loses, odd n means they win. n == 0 means they are already
+          mated (or stalemated).
+    """
+    # Class level constants
+    _MAGIC = b'XQTB'
+    _VERSION = 1
+    _HEADER = struct.Struct('<4sHH16sQ')  # magic, version, reserved, name, size
+
+    _INVALID = 0
+    _DRAW = 1
+    _MATE_BASE = 2
+    _MAX_PLIES = 253
+
+    # Outcomes for the player to move.
+    _WIN = 'WIN'
+    _LOSS = 'LOSS'
+    _DRAWN = 'DRAW'
+
+    def __init__(self, path):
+        """Open and memory-map the table file at path.
+
+        Raises
+        ------
+        TablebaseFormatError:
+            When the file is not a table or is truncated.
+
+        Parameters
+        ----------
+        path: str
+            Path of the table file.
+        """
+        self._file = open(path, 'rb')
+        try:
+            header = self._file.read(TablebaseFile._HEADER.size)
+            if len(header) < TablebaseFile._HEADER.size:
+                raise TablebaseFormatError(path, 'file too short for header')
+
+            magic, version, reserved, name, size = \
+                TablebaseFile._HEADER.unpack(header)
+            if magic != TablebaseFile._MAGIC:
+                raise TablebaseFormatError(path, 'bad magic number')
+            if version != TablebaseFile._VERSION:
+                raise TablebaseFormatError(path,
+                                           f'unsupported version {version}')
+
+            name = name.rstrip(b'\0').decode('ascii')
+            self._index = TablebaseIndex(*TablebaseIndex.parse_name(name))
+            if self._index.get_size() != size:
+                raise TablebaseFormatError(path, 'size does not match material')
+
+            self._file.seek(0, 2)
+            if self._file.tell() < TablebaseFile._HEADER.size + size:
+                raise TablebaseFormatError(path, 'file truncated')
+
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+    def close(self):
+        """Release the memory map and the underlying file."""
+        self._mmap.close()
+        self._file.close()
+
+    def get_index(self):
+        """Getter. Return the TablebaseIndex of the table."""
+        return self._index
+
+    def get_value(self, index):
+        """Getter. Return the raw value byte stored for an index."""
+        return self._mmap[TablebaseFile._HEADER.size + index]
+
+    def probe(self, pieces, color):
+        """Look up a position.
+
+        Parameters
+        ----------
+        pieces: iterable of tuple
+            Size 3 tuples (color, key, pos) of every piece on the board.
+        color: str
+            Color to move.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (outcome, plies) for the player to move (see
+            TablebaseFile.decode_value()). None if the position can't be
+            indexed by this table.
+        """
+        index = self._index.encode(pieces, color)
+        if index is None:
+            return None
+        return TablebaseFile.decode_value(self.get_value(index))
+
+    @staticmethod
+    def decode_value(value):
+        """Turn a value byte into an outcome for the player to move.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (outcome, plies). outcome is 'WIN', 'LOSS' or
+            'DRAW' and plies the number of plies until mate (None for a
+            draw). None for an invalid position.
+        """
+        if value == TablebaseFile._INVALID:
+            return None
+        if value == TablebaseFile._DRAW:
+            return TablebaseFile._DRAWN, None
+
+        plies = value - TablebaseFile._MATE_BASE
+        outcome = TablebaseFile._WIN if plies % 2 == 1 else TablebaseFile._LOSS
+        return outcome, plies
+
+    @staticmethod
+    def write(path, index, values):
+        """Write a solved table to path.
+
+        Written to a temporary file first so a partially written table is
+        never picked up by a prober.
+
+        Parameters
+        ----------
+        path: str
+            Path of the table file.
+        index: TablebaseIndex
+            Index of the material set.
+        values: bytearray
+            One value byte per index.
+
+        Returns
+        -------
+        None
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as outfile:
+            outfile.write(TablebaseFile._HEADER.pack(
+                TablebaseFile._MAGIC, TablebaseFile._VERSION, 0,
+                index.get_name().encode('ascii'), index.get_size()))
+            outfile.write(values)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def get_WIN():
+        """Getter. Get the outcome string for a win for the player to move."""
+        return TablebaseFile._WIN
+
+    @staticmethod
+    def get_LOSS():
+        """Getter. Get the outcome string for a loss for the player to move."""
+        return TablebaseFile._LOSS
+
+    @staticmethod
+    def get_DRAW():
+        """Getter. Get the outcome string for a draw."""
+        return TablebaseFile._DRAWN
+
+
+class Tablebase:
+    """Class to probe a directory of table files. Tables are opened (and
+    memory-mapped) the first time their material set is probed.
+    """
+    _EXTENSION = '.xqtb'
+
+    def __init__(self, directory):
+        """Create a prober for the tables in directory.
+
+        Parameters
+        ----------
+        directory: str
+            Directory holding the table files.
+        """
+        self._directory = directory
+        self._tables = {}  # name -> TablebaseFile, or None if missing.
+
+    def close(self):
+        """Close all opened tables."""
+        for table in self._tables.values():
+            if table is not None:
+                table.close()
+        self._tables = {}
+
+    def get_table(self, name):
+        """Get the table for a material signature.
+
+        Parameters
+        ----------
+        name: str
+            Material signature (see TablebaseIndex.make_name()).
+
+        Returns
+        -------
+        TablebaseFile
+            The opened table. None if there is no table for the material.
+        """
+        if name not in self._tables:
+            path = Tablebase.make_path(self._directory, name)
+            self._tables[name] = (TablebaseFile(path) if os.path.exists(path)
+                                  else None)
+        return self._tables[name]
+
+    def probe_pieces(self, pieces, color):
+        """Look up a position given as a list of pieces.
+
+        Parameters
+        ----------
+        pieces: list of tuple
+            Size 3 tuples (color, key, pos) of every piece on the board.
+        color: str
+            Color to move.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (outcome, plies) for the player to move (see
+            TablebaseFile.decode_value()). None if the material is not
+            covered.
+        """
+        red_keys = [key for piece_color, key, pos in pieces
+                    if piece_color == Player.get_RED()
+                    and key != Player.get_GENERAL()]
+        black_keys = [key for piece_color, key, pos in pieces
+                      if piece_color == Player.get_BLACK()
+                      and key != Player.get_GENERAL()]
+
+        table = self.get_table(TablebaseIndex.make_name(red_keys, black_keys))
+        if table is None:
+            return None
+        return table.probe(pieces, color)
+
+    def probe(self, game):
+        """Look up the current position of a game.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to look up.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (outcome, plies) for the player to move, where
+            outcome is 'WIN', 'LOSS' or 'DRAW' and plies the number of plies
+            to mate with best play (None for a draw). None if the material
+            is not covered.
+        """
+        return self.probe_pieces(Tablebase.get_game_pieces(game),
+                                 game.get_mover().get_color())
+
+    def get_forced_state(self, game):
+        """Find the game state a game is bound to end in with best play.
+
+        Parameters
+        ----------
+        game: XiangqiGame
+            Game to look up.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (state, plies) with state either 'RED_WON' or
+            'BLACK_WON' (as returned by XiangqiGame.get_game_state()). None
+            if the position is drawn or not covered.
+        """
+        result = self.probe(game)
+        if result is None or result[0] == TablebaseFile.get_DRAW():
+            return None
+
+        outcome, plies = result
+        mover = game.get_mover()
+        loser = mover if outcome == TablebaseFile.get_LOSS() \
+            else mover.get_opponent()
+        return XiangqiGame.get_LOSS()[loser.get_color()], plies
+
+    @staticmethod
+    def get_game_pieces(game):
+        """List the pieces of a game as size 3 tuples (color, key, pos)."""
+        return [(player.get_color(), key, piece.get_pos())
+                for player in game.get_players().values()
+                for key, piece_list in player.get_pieces().items()
+                for piece in piece_list]
+
+    @staticmethod
+    def make_path(directory, name):
+        """Make the path of the table file for a material signature."""
+        return os.path.join(directory, name + Tablebase._EXTENSION)
+
+
+class TablebaseGenerator:
+    """Class to generate table files by retrograde analysis.
+
+    Generation of a material set happens in two steps:
+        1) Worker processes take chunks of indices, set up each position
+           with XiangqiGame.set_position() and list its legal moves. Moves
+           that stay in the material set are returned as successor indices.
+           Captures leave the material set and are looked up straight away
+           in the (already generated) smaller table.
+        2) The parent process inverts the successor lists into predecessor
+           lists and works back from the mated positions one ply at a time:
+           a position is won if some move leads to a lost position and lost
+           once every move leads to a won position. Whatever is left is a
+           draw.
+
+    Tables for every smaller material set reachable by captures are
+    generated first. Memory use is one byte per position for each of a few
+    flag arrays plus two 4 byte integers per legal move (successors, then
+    predecessors); workers only ever hold one chunk.
+    """
+    _DEFAULT_CHUNK_SIZE = 2048
+
+    def __init__(self, directory, processes=None,
+                 chunk_size=_DEFAULT_CHUNK_SIZE):
+        """Create a generator writing tables to directory.
+
+        Parameters
+        ----------
+        directory: str
+            Directory to write table files into. Created if missing.
+        processes: int
+            Number of worker processes. If None uses the CPU count.
+        chunk_size: int
+            Number of positions handed to a worker at a time.
+        """
+        self._directory = directory
+        self._processes = processes
+        self._chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+    def generate(self, red_keys, black_keys):
+        """Generate the table for a material set (and any smaller tables it
+        depends on) unless it already exists.
+
+        Parameters
+        ----------
+        red_keys: iterable of str
+            Piece dictionary keys of the 'red' pieces besides the general.
+        black_keys: iterable of str
+            Piece dictionary keys of the 'black' pieces besides the general.
+
+        Returns
+        -------
+        str
+            Path of the table file.
+        """
+        index = TablebaseIndex(red_keys, black_keys)
+        path = Tablebase.make_path(self._directory, index.get_name())
+        if os.path.exists(path):
+            return path
+
+        # Generate all the tables captures can lead to.
+        for sub_red, sub_black in TablebaseGenerator.get_sub_materials(
+                index.get_red_keys(), index.get_black_keys()):
+            self.generate(sub_red, sub_black)
+
+        values = self.solve(index)
+        TablebaseFile.write(path, index, values)
+        return path
+
+    def solve(self, index):
+        """Compute the value of every position of a material set.
+
+        Parameters
+        ----------
+        index: TablebaseIndex
+            Index of the material set.
+
+        Returns
+        -------
+        bytearray
+            One value byte per index (see TablebaseFile).
+        """
+        size = index.get_size()
+        chunks = [(start, min(start + self._chunk_size, size))
+                  for start in range(0, size, self._chunk_size)]
+
+        # Per position results gathered from the workers.
+        valid = bytearray()
+        cap_win = bytearray()   # Shortest win through a capture (0 if none).
+        cap_loss = bytearray()  # Longest loss through captures.
+        cap_draw = bytearray()  # Some capture leads to a draw.
+        counts = array('H')     # Successors inside the table.
+        successors = array('I')
+
+        with multiprocessing.Pool(self._processes,
+                                  initializer=_init_worker,
+                                  initargs=(self._directory,
+                                            index.get_red_keys(),
+                                            index.get_black_keys())) as pool:
+            for result in pool.imap(_solve_chunk, chunks):
+                valid += result[0]
+                cap_win += result[1]
+                cap_loss += result[2]
+                cap_draw += result[3]
+                counts += result[4]
+                successors += result[5]
+
+        predecessors, offsets = TablebaseGenerator.invert(counts, successors)
+        del successors
+
+        return TablebaseGenerator.propagate(valid, cap_win, cap_loss,
+                                            cap_draw, counts, predecessors,
+                                            offsets)
+
+    @staticmethod
+    def invert(counts, successors):
+        """Turn successor lists into predecessor lists.
+
+        Parameters
+        ----------
+        counts: array
+            Number of successors of each position.
+        successors: array
+            Successor indices of every position laid end to end.
+
+        Returns
+        -------
+        tuple of array
+            Size 2 tuple (predecessors, offsets) where the predecessors of
+            position i are predecessors[offsets[i]:offsets[i + 1]].
+        """
+        size = len(counts)
+
+        # Count the predecessors of each position then turn the counts
+        # into start offsets.
+        offsets = array('Q', bytes(8 * (size + 1)))
+        for target in successors:
+            offsets[target + 1] += 1
+        for i in range(size):
+            offsets[i + 1] += offsets[i]
+
+        predecessors = array('I', bytes(4 * len(successors)))
+        fill = array('Q', offsets)
+        pos = 0
+        for source in range(size):
+            for target in successors[pos:pos + counts[source]]:
+                predecessors[fill[target]] = source
+                fill[target] += 1
+            pos += counts[source]
+
+        return predecessors, offsets
+
+    @staticmethod
+    def propagate(valid, cap_win, cap_loss, cap_draw, counts,
+                  predecessors, offsets):
+        """Retrograde analysis. Resolve positions in order of distance to
+        mate, starting from the mated positions.
+
+        Parameters
+        ----------
+        valid: bytearray
+            0 for illegal positions, 1 for positions with legal moves and 2
+            for positions where the player to move has no legal moves.
+        cap_win, cap_loss, cap_draw: bytearray
+            Outcomes reachable through captures (see _solve_chunk()).
+        counts: array
+            Number of successors inside the table of each position.
+        predecessors, offsets: array
+            Predecessor lists (see TablebaseGenerator.invert()).
+
+        Returns
+        -------
+        bytearray
+            One value byte per index (see TablebaseFile).
+        """
+        size = len(valid)
+        values = bytearray(size)
+        remaining = array('H', counts)
+        loss_dist = bytearray(cap_loss)
+        buckets = [[] for plies in range(TablebaseFile._MAX_PLIES + 2)]
+
+        for i in range(size):
+            if valid[i] == 0:
+                continue
+            values[i] = TablebaseFile._DRAW
+            if valid[i] == 2:
+                buckets[0].append(i)        # Mated.
+            elif cap_win[i]:
+                buckets[cap_win[i]].append(i)
+            elif counts[i] == 0 and not cap_draw[i]:
+                buckets[cap_loss[i]].append(i)  # Every capture loses.
+
+        for plies, bucket in enumerate(buckets):
+            if plies > TablebaseFile._MAX_PLIES and len(bucket) > 0:
+                raise TablebaseDepthError(TablebaseFile._MAX_PLIES)
+
+            # Buckets only grow further ahead while this one is processed.
+            for i in bucket:
+                if values[i] != TablebaseFile._DRAW:
+                    continue  # Already resolved with a shorter win.
+                values[i] = TablebaseFile._MATE_BASE + plies
+
+                for j in predecessors[offsets[i]:offsets[i + 1]]:
+                    if values[j] != TablebaseFile._DRAW:
+                        continue
+                    if plies % 2 == 0:
+                        # Moving into a lost position wins.
+                        buckets[plies + 1].append(j)
+                    else:
+                        # One less escape, lost once none are left.
+                        remaining[j] -= 1
+                        loss_dist[j] = max(loss_dist[j], plies + 1)
+                        if (remaining[j] == 0 and not cap_win[j]
+                                and not cap_draw[j]):
+                            buckets[loss_dist[j]].append(j)
+
+        return values
+
+    @staticmethod
+    def get_sub_materials(red_keys, black_keys):
+        """List the material sets left after capturing one piece.
+
+        Returns
+        -------
+        list of tuple
+            Distinct size 2 tuples (red_keys, black_keys).
+        """
+        subs = []
+        for i in range(len(red_keys)):
+            sub = (red_keys[:i] + red_keys[i + 1:], black_keys)
+            if sub not in subs:
+                subs.append(sub)
+        for i in range(len(black_keys)):
+            sub = (red_keys, black_keys[:i] + black_keys[i + 1:])
+            if sub not in subs:
+                subs.append(sub)
+        return subs
+
+
+# Worker process state, set up once per process by _init_worker().
+_worker = {}
+
+
+def _init_worker(directory, red_keys, black_keys):
+    """Worker process initializer. Sets up the index, a scratch game and a
+    prober for the smaller tables."""
+    _worker['index'] = TablebaseIndex(red_keys, black_keys)
+    _worker['game'] = XiangqiGame()
+    _worker['tablebase'] = Tablebase(directory)
+
+
+def _solve_chunk(bounds):
+    """Worker task. List the successors of each position in a chunk.
+
+    Parameters
+    ----------
+    bounds: tuple of int
+        Size 2 tuple (start, stop) of the indices to handle.
+
+    Returns
+    -------
+    tuple
+        Size 6 tuple of per position results (valid, cap_win, cap_loss,
+        cap_draw, counts, successors) as described in
+        TablebaseGenerator.propagate(). cap_win and cap_loss hold plies to
+        mate (0 if none).
+    """
+    index = _worker['index']
+    game = _worker['game']
+    tablebase = _worker['tablebase']
+    board = game.get_board()
+
+    start, stop = bounds
+    valid = bytearray(stop - start)
+    cap_win = bytearray(stop - start)
+    cap_loss = bytearray(stop - start)
+    cap_draw = bytearray(stop - start)
+    counts = array('H', bytes(2 * (stop - start)))
+    successors = array('I')
+
+    for offset, i in enumerate(range(start, stop)):
+        pieces, color = index.decode(i)
+        other_color = Player.get_COLORS()[1 - i % 2]
+
+        # Skip illegal placements.
+        try:
+            game.set_position(pieces, color)
+        except BoardError:
+            continue
+
+        moves = game.get_legal_moves()
+        if len(moves) == 0:
+            valid[offset] = 2
+            continue
+        valid[offset] = 1
+
+        for beg_pos, end_pos in moves:
+            captured = board.get_piece(end_pos)
+
+            # Pieces after the move, the moved one now at end_pos.
+            after = [(piece_color, key,
+                      end_pos if pos == beg_pos else pos)
+                     for piece_color, key, pos in pieces
+                     if pos != end_pos]
+
+            if captured is None:
+                successors.append(index.encode(after, other_color))
+                counts[offset] += 1
+                continue
+
+            # Capture. The smaller table gives the result for the opponent.
+            result = tablebase.probe_pieces(after, other_color)
+            if result is None or result[0] == TablebaseFile.get_DRAW():
+                cap_draw[offset] = 1
+            elif result[0] == TablebaseFile.get_LOSS():
+                plies = result[1] + 1
+                if cap_win[offset] == 0 or plies < cap_win[offset]:
+                    cap_win[offset] = plies
+            else:
+                cap_loss[offset] = max(cap_loss[offset], result[1] + 1)
+
+    return valid, cap_win, cap_loss, cap_draw, counts, successors
+
+
+class TablebaseError(Error):
+    """Base exception class for tablebase errors."""
+    pass
+
+
+class TablebaseFormatError(TablebaseError):
+    """Exception class for when a file is not a valid table."""
+    def __init__(self, path, reason):
+        """Create an instance of TablebaseFormatError.
+
+        path should be the offending file and reason a short description
+        of what is wrong with it.
+        """
+        self._path = path
+        self._reason = reason
+        super().__init__(f'{path} is not a valid tablebase: {reason}.')
+
+
+class MaterialSignatureError(TablebaseError):
+    """Exception class for malformed material signatures."""
+    def __init__(self, name):
+        """Create an instance of MaterialSignatureError.
+
+        name should be the malformed signature.
+        """
+        self._name = name
+        super().__init__(f'Invalid material signature "{name}". Expected '
+                         + 'something like "KR-KAA".')
+
+
+class TablebaseDepthError(TablebaseError):
+    """Exception class for when a mate is too long to store."""
+    def __init__(self, max_plies):
+        """Create an instance of TablebaseDepthError.
+
+        max_plies should be the longest storable distance to mate.
+        """
+        self._max_plies = max_plies
+        super().__init__(f'Mate longer than {max_plies} plies can not be '
+                         + 'stored.')
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Generate endgame tablebases, e.g. KR-KAA KNP-K')
+    parser.add_argument('materials', nargs='+',
+                        help='material signatures, red first')
+    parser.add_argument('-d', '--directory', default='tablebases',
+                        help='directory to write the tables into')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    args = parser.parse_args()
+
+    generator = TablebaseGenerator(args.directory, args.processes)
+    for material in args.materials:
+        print(generator.generate(*TablebaseIndex.parse_name(material)))
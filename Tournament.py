@@ -0,0 +1,398 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines a self-play tournament runner for Xiangqi engines.
+#              Games between engine configurations are played in a pool
+#              of worker processes, each game refereed by XiangqiGame.
+#              Game records are streamed in a PGN-like text format as
+#              games finish, along with running score, Elo and
+#              throughput statistics.
+
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+from Engine import Engine
+from XiangqiGame import XiangqiGame, AlgNot, Player
+
+
+class Tournament:
+    """Class to run a round robin tournament between engine configurations.
+
+    Each pairing plays games in pairs from the same randomly chosen opening
+    with colors swapped, so neither engine profits from a lucky opening or
+    from moving first. Games that reach the ply limit are drawn, as are
+    repetitions not lost to perpetual check or chase.
+    """
+    # Class level constants
+    _DEFAULT_OPENING_PLIES = 4
+    _DEFAULT_MAX_PLIES = 300
+
+    # Results from 'red' point of view.
+    _RED_WIN = '1-0'
+    _BLACK_WIN = '0-1'
+    _DRAW = '1/2-1/2'
+    _RESULTS = {XiangqiGame.get_RED_WON(): _RED_WIN,
+                XiangqiGame.get_BLACK_WON(): _BLACK_WIN,
+                XiangqiGame.get_DRAW(): _DRAW}
+    _RED_SCORES = {_RED_WIN: 1.0, _BLACK_WIN: 0.0, _DRAW: 0.5}
+
+    def __init__(self, engines, rounds=1, processes=None,
+                 opening_plies=_DEFAULT_OPENING_PLIES,
+                 max_plies=_DEFAULT_MAX_PLIES, seed=None):
+        """Create a tournament.
+
+        Parameters
+        ----------
+        engines: dict
+            Keys are engine names and values dictionaries of keyword
+            arguments for Engine.__init__().
+        rounds: int
+            Number of game pairs (one game with each color) per pairing.
+        processes: int
+            Number of worker processes. If None uses the CPU count.
+        opening_plies: int
+            Number of random plies played before the engines take over.
+        max_plies: int
+            Games reaching this many plies are adjudicated a draw.
+        seed: int
+            Seed for the random openings. None for a random seed.
+        """
+        self._engines = dict(engines)
+        self._rounds = rounds
+        self._processes = processes
+        self._opening_plies = opening_plies
+        self._max_plies = max_plies
+        self._seed = random.randrange(2 ** 32) if seed is None else seed
+
+        # name -> [wins, draws, losses]
+        self._standings = {name: [0, 0, 0] for name in self._engines}
+        self._game_count = 0
+        self._ply_count = 0
+        self._start_time = None
+
+    def get_standings(self):
+        """Getter. Return dictionary of engine name to [wins, draws, losses]."""
+        return self._standings
+
+    def get_game_count(self):
+        """Getter. Return the number of games finished."""
+        return self._game_count
+
+    def make_tasks(self):
+        """List every game to play.
+
+        Returns
+        -------
+        list of tuple
+            Size 7 tuples (game_id, red_name, red_config, black_name,
+            black_config, opening, max_plies) for _play_game().
+        """
+        rng = random.Random(self._seed)
+        names = list(self._engines)
+        tasks = []
+        game_id = 1
+
+        for i, first in enumerate(names):
+            for second in names[i + 1:]:
+                for round_num in range(self._rounds):
+                    opening = Tournament.make_opening(rng, self._opening_plies)
+                    for red, black in ((first, second), (second, first)):
+                        tasks.append((game_id,
+                                      red, self._engines[red],
+                                      black, self._engines[black],
+                                      opening, self._max_plies))
+                        game_id += 1
+
+        return tasks
+
+    def run(self, outfile=None, progress=None):
+        """Play every game of the tournament.
+
+        Games are handed to worker processes one at a time and records
+        written out in the order games finish.
+
+        Parameters
+        ----------
+        outfile: file
+            Text file to stream game records to. None to not write them.
+        progress: file
+            Text file to write a summary line to after each game. None to
+            not write them.
+
+        Returns
+        -------
+        dict
+            Same as Tournament.get_standings().
+        """
+        tasks = self.make_tasks()
+        self._start_time = time.time()
+
+        with multiprocessing.Pool(self._processes) as pool:
+            for record in pool.imap_unordered(_play_game, tasks):
+                self.add_result(record)
+                if outfile is not None:
+                    outfile.write(Tournament.format_record(record))
+                    outfile.flush()
+                if progress is not None:
+                    progress.write(f'{self.format_progress(len(tasks))}\n')
+                    progress.flush()
+
+        return self._standings
+
+    def add_result(self, record):
+        """Update the standings with the record of a finished game."""
+        red_score = Tournament._RED_SCORES[record['result']]
+        for name, score in ((record['red'], red_score),
+                            (record['black'], 1.0 - red_score)):
+            if score == 1.0:
+                self._standings[name][0] += 1
+            elif score == 0.5:
+                self._standings[name][1] += 1
+            else:
+                self._standings[name][2] += 1
+        self._game_count += 1
+        self._ply_count += len(record['moves'])
+
+    def get_games_per_sec(self):
+        """Getter. Return the number of games finished per second so far."""
+        elapsed = time.time() - self._start_time
+        return self._game_count / elapsed if elapsed > 0 else 0.0
+
+    def format_progress(self, total):
+        """Make a one line summary of the tournament so far."""
+        return (f'{self._game_count}/{total} games, '
+                f'{self.get_games_per_sec():.2f} games/s, '
+                f'{self._ply_count} plies')
+
+    def format_summary(self):
+        """Make a table of each engine's results and Elo estimate against
+        the rest of the field."""
+        lines = [f'{"engine":<16}{"games":>7}{"W":>6}{"D":>6}{"L":>6}'
+                 f'{"score":>8}{"elo":>8}{"+/-":>7}']
+        for name, (wins, draws, losses) in self._standings.items():
+            games = wins + draws + losses
+            if games == 0:
+                continue
+            elo, margin = Tournament.estimate_elo(wins, draws, losses)
+            lines.append(f'{name:<16}{games:>7}{wins:>6}{draws:>6}{losses:>6}'
+                         f'{(wins + draws / 2) / games:>8.3f}'
+                         f'{elo:>8.0f}{margin:>7.0f}')
+        lines.append(f'{self._game_count} games in '
+                     f'{time.time() - self._start_time:.1f}s '
+                     f'({self.get_games_per_sec():.2f} games/s)')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def make_opening(rng, plies):
+        """Play random legal moves from the start position.
+
+        Parameters
+        ----------
+        rng: random.Random
+            Random number generator to pick moves with.
+        plies: int
+            Number of plies to play.
+
+        Returns
+        -------
+        list of tuple of str
+            Size 2 tuples (alg_start, alg_end).
+        """
+        game = XiangqiGame()
+        opening = []
+        for ply in range(plies):
+            moves = game.get_legal_moves()
+            if (len(moves) == 0
+                    or game.get_game_state() != XiangqiGame.get_UNFINISHED()):
+                break
+            beg_pos, end_pos = rng.choice(moves)
+            opening.append((AlgNot.row_col_to_alg(beg_pos),
+                            AlgNot.row_col_to_alg(end_pos)))
+            game.make_move(*opening[-1])
+        return opening
+
+    @staticmethod
+    def estimate_elo(wins, draws, losses):
+        """Estimate an Elo difference from a score.
+
+        Parameters
+        ----------
+        wins, draws, losses: int
+            Game results.
+
+        Returns
+        -------
+        tuple of float
+            Size 2 tuple (elo, margin) where margin is the half width of a
+            95% confidence interval. Infinite if the score is 0 or 1.
+        """
+        games = wins + draws + losses
+        score = (wins + draws / 2) / games
+        if score <= 0.0 or score >= 1.0:
+            return math.copysign(math.inf, score - 0.5), math.inf
+
+        elo = 400 * math.log10(score / (1 - score))
+
+        # Standard error of the score, pushed through the Elo curve's slope.
+        variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2
+                    + losses * score ** 2) / games
+        std_error = math.sqrt(variance / games)
+        slope = 400 / (math.log(10) * score * (1 - score))
+        return elo, 1.96 * std_error * slope
+
+    @staticmethod
+    def format_record(record):
+        """Format a finished game as a PGN-like text record.
+
+        Returns
+        -------
+        str
+            Tag pairs, then the move list numbered by full move, ending with
+            the result and a blank line.
+        """
+        tags = [('Event', 'Self-play tournament'),
+                ('Game', record['game_id']),
+                ('Red', record['red']),
+                ('Black', record['black']),
+                ('Result', record['result']),
+                ('Termination', record['termination']),
+                ('PlyCount', len(record['moves'])),
+                ('Time', f'{record["seconds"]:.2f}')]
+        lines = [f'[{tag} "{value}"]' for tag, value in tags]
+
+        tokens = []
+        for ply, (alg_start, alg_end) in enumerate(record['moves']):
+            if ply % 2 == 0:
+                tokens.append(f'{ply // 2 + 1}.')
+            tokens.append(f'{alg_start}-{alg_end}')
+        tokens.append(record['result'])
+
+        # Wrap the move text at 80 columns.
+        text_lines, line = [], ''
+        for token in tokens:
+            if len(line) + len(token) + 1 > 80:
+                text_lines.append(line)
+                line = token
+            else:
+                line = token if line == '' else f'{line} {token}'
+        text_lines.append(line)
+
+        return '\n'.join(lines + [''] + text_lines) + '\n\n'
+
+
+def _play_game(task):
+    """Worker task. Play one tournament game.
+
+    Parameters
+    ----------
+    task: tuple
+        See Tournament.make_tasks().
+
+    Returns
+    -------
+    dict
+        Game record with keys 'game_id', 'red', 'black', 'result',
+        'termination', 'moves' and 'seconds'.
+    """
+    game_id, red, red_config, black, black_config, opening, max_plies = task
+    start = time.time()
+    game = XiangqiGame()
+    engines = {Player.get_RED(): Engine(**red_config),
+               Player.get_BLACK(): Engine(**black_config)}
+    moves = []
+    termination = 'mate'
+
+    for alg_start, alg_end in opening:
+        game.make_move(alg_start, alg_end)
+        moves.append((alg_start, alg_end))
+
+    while game.get_game_state() == XiangqiGame.get_UNFINISHED():
+        if len(moves) >= max_plies:
+            termination = 'ply limit'
+            break
+
+        move = engines[game.get_mover().get_color()].choose_move(game)
+
+        # An engine that can't produce a legal move forfeits.
+        if move is None or not game.make_move(*move):
+            termination = 'illegal move'
+            break
+        moves.append(move)
+
+    state = game.get_game_state()
+    if (termination == 'mate' and game.get_repetition_count()
+            >= XiangqiGame.get_REPETITION_LIMIT()):
+        termination = 'repetition'
+
+    if termination == 'illegal move':
+        result = (Tournament._BLACK_WIN
+                  if game.get_mover().get_color() == Player.get_RED()
+                  else Tournament._RED_WIN)
+    else:
+        result = Tournament._RESULTS.get(state, Tournament._DRAW)
+
+    return {'game_id': game_id, 'red': red, 'black': black, 'result': result,
+            'termination': termination, 'moves': moves,
+            'seconds': time.time() - start}
+
+
+def parse_engine(text):
+    """Parse an engine given on the command line as
+    name:key=value,key=value where values are Python literals, e.g.
+    'deep:depth=3' or 'greedy:depth=1,crossed_soldier_bonus=0'.
+
+    Returns
+    -------
+    tuple
+        Size 2 tuple (name, config).
+    """
+    import ast
+
+    name, _, options = text.partition(':')
+    config = {}
+    for option in options.split(','):
+        if option.strip() == '':
+            continue
+        key, _, value = option.partition('=')
+        try:
+            config[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            config[key.strip()] = value.strip()
+    return name, config
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Run a self-play tournament between engine configurations.')
+    parser.add_argument('engines', nargs='+',
+                        help='engines as name:key=value,... '
+                             '(e.g. d1:depth=1 d2:depth=2)')
+    parser.add_argument('-r', '--rounds', type=int, default=1,
+                        help='game pairs per pairing')
+    parser.add_argument('-p', '--processes', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('-o', '--output', default=None,
+                        help='file to write game records to (default stdout)')
+    parser.add_argument('--opening-plies', type=int,
+                        default=Tournament._DEFAULT_OPENING_PLIES)
+    parser.add_argument('--max-plies', type=int,
+                        default=Tournament._DEFAULT_MAX_PLIES)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    tournament = Tournament(dict(parse_engine(text) for text in args.engines),
+                            rounds=args.rounds, processes=args.processes,
+                            opening_plies=args.opening_plies,
+                            max_plies=args.max_plies, seed=args.seed)
+
+    outfile = sys.stdout if args.output is None else open(args.output, 'w')
+    try:
+        tournament.run(outfile, sys.stderr)
+    finally:
+        if outfile is not sys.stdout:
+            outfile.close()
+    print(tournament.format_summary(), file=sys.stderr)
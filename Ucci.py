@@ -0,0 +1,333 @@
+# Author: Jeremy Tsang
+# Date: 10/18/2026
+# Description: Defines an engine protocol server speaking UCCI (the
+#              Universal Chinese Chess Protocol) and its UCI flavour over
+#              stdin/stdout, so the Engine can be driven by standard
+#              Xiangqi GUIs and match managers. Searches run on a
+#              background thread so "stop" and "isready" are answered
+#              while the engine is thinking.
+
+import sys
+import threading
+
+from Engine import Engine
+from XiangqiGame import (XiangqiGame, AlgNot, Player, Error,
+                         AlgStrFormattingError, IllegalMoveError)
+
+
+class UcciServer:
+    """Class to read protocol commands line by line and answer them.
+
+    Supported commands are:
+        ucci / uci              identify and list options
+        isready                 answer readyok
+        setoption ...           set engine options (depth)
+        ucinewgame / newgame    forget previous searches
+        position {fen <fen> | startpos} [moves <m1> <m2> ...]
+        go [ponder] [depth d] [nodes n] [movetime ms] [infinite]
+           [time ms | wtime ms btime ms] [movestogo n]
+           [increment ms | winc ms binc ms]
+        ponderhit               the expected move was played, the ponder
+                                search goes on with the limits of 'go'
+        stop                    end the search and answer bestmove
+        quit                    end the session
+
+    Squares are in UCCI notation (files a-i, rows 0-9 with 'red' on row 0)
+    and converted with AlgNot.ucci_move_to_row_col().
+    """
+    # Class level constants
+    _NAME = 'XiangqiGame'
+    _AUTHOR = 'Jeremy Tsang'
+    _UCCI = 'ucci'
+    _UCI = 'uci'
+
+    _MS_PER_SEC = 1000
+    _PONDER_POLL = 0.01  # Seconds between checks of the search thread.
+
+    def __init__(self, engine=None, infile=None, outfile=None):
+        """Create a server.
+
+        Parameters
+        ----------
+        engine: Engine
+            Engine to search with. If None a default Engine is created.
+        infile: file
+            Text file to read commands from. If None uses stdin.
+        outfile: file
+            Text file to write answers to. If None uses stdout.
+        """
+        self._engine = Engine() if engine is None else engine
+        self._infile = sys.stdin if infile is None else infile
+        self._outfile = sys.stdout if outfile is None else outfile
+        self._protocol = UcciServer._UCCI
+        self._game = XiangqiGame()
+
+        # Search thread state.
+        self._thread = None
+        self._stop_event = None
+        self._started = None        # Set once the search set its limits.
+        self._release = None        # Set once bestmove may be written.
+        self._infinite = False      # 'go infinite', ponderhit won't release.
+        self._write_lock = threading.Lock()
+        self._ponder_limits = None  # Limits of 'go ponder' for ponderhit.
+
+        self._commands = {'ucci': self.do_ucci,
+                          'uci': self.do_uci,
+                          'isready': self.do_isready,
+                          'setoption': self.do_setoption,
+                          'ucinewgame': self.do_newgame,
+                          'newgame': self.do_newgame,
+                          'position': self.do_position,
+                          'go': self.do_go,
+                          'ponderhit': self.do_ponderhit,
+                          'stop': self.do_stop}
+
+    def run(self):
+        """Answer commands until 'quit' or the end of the input."""
+        for line in self._infile:
+            if not self.handle(line):
+                break
+        self.do_stop([])
+
+    def handle(self, line):
+        """Answer one command line.
+
+        Parameters
+        ----------
+        line: str
+            Command line. Unknown commands are ignored.
+
+        Returns
+        -------
+        bool
+            False if the session should end. Otherwise True.
+        """
+        tokens = line.split()
+        if len(tokens) == 0:
+            return True
+        if tokens[0] == 'quit':
+            return False
+
+        command = self._commands.get(tokens[0])
+        if command is not None:
+            command(tokens[1:])
+        return True
+
+    def write(self, line):
+        """Write an answer line. Safe to call from the search thread."""
+        with self._write_lock:
+            self._outfile.write(line + '\n')
+            self._outfile.flush()
+
+    def do_ucci(self, args):
+        """Identify the engine for UCCI."""
+        self._protocol = UcciServer._UCCI
+        self.write_id()
+        self.write('ucciok')
+
+    def do_uci(self, args):
+        """Identify the engine for UCI."""
+        self._protocol = UcciServer._UCI
+        self.write_id()
+        self.write('uciok')
+
+    def write_id(self):
+        """Write the engine's name, author and options."""
+        self.write(f'id name {UcciServer._NAME}')
+        self.write(f'id author {UcciServer._AUTHOR}')
+        self.write('option name depth type spin default '
+                   f'{Engine.get_DEFAULT_DEPTH()} min 1 '
+                   f'max {Engine.get_MAX_DEPTH()}')
+
+    def do_isready(self, args):
+        """Answer readyok, even while searching."""
+        self.write('readyok')
+
+    def do_setoption(self, args):
+        """Set an option given as 'name <name> value <value>' (UCI) or
+        '<name> <value>' (UCCI). Only the search depth is supported."""
+        if len(args) >= 4 and args[0] == 'name' and args[2] == 'value':
+            name, value = args[1], args[3]
+        elif len(args) >= 2:
+            name, value = args[0], args[1]
+        else:
+            return
+
+        if name.lower() == 'depth' and value.isdigit():
+            self.do_stop([])
+            self._engine.set_depth(int(value))
+
+    def do_newgame(self, args):
+        """Forget everything learned about the previous game."""
+        self.do_stop([])
+        self._engine.clear()
+        self._game = XiangqiGame()
+
+    def do_position(self, args):
+        """Set up the position to search.
+
+        An invalid FEN is reported with an 'info string' line and replaced
+        by the starting position. An invalid move is reported the same way
+        and leaves the position set up to the last valid move.
+        """
+        self.do_stop([])
+
+        if 'moves' in args:
+            split = args.index('moves')
+            setup, moves = args[:split], args[split + 1:]
+        else:
+            setup, moves = args, []
+
+        game = XiangqiGame()
+        if len(setup) > 0 and setup[0] == 'fen':
+            try:
+                game.set_fen(' '.join(setup[1:]))
+            except Error as err:
+                self.write(f'info string {err}')
+                game = XiangqiGame()
+
+        try:
+            for move in moves:
+                game.push_move(*AlgNot.ucci_move_to_row_col(move))
+        except (AlgStrFormattingError, IllegalMoveError) as err:
+            self.write(f'info string {err}')
+
+        self._game = game
+
+    def do_go(self, args):
+        """Start searching the current position on a background thread. The
+        best move is written when the search ends, but for 'go infinite'
+        not before 'stop' and for 'go ponder' not before 'ponderhit' or
+        'stop', even if the search ends sooner (e.g. on finding a mate)."""
+        self.do_stop([])
+
+        limits = self.parse_go(args)
+        self._infinite = 'infinite' in args
+        self._release = threading.Event()
+
+        # Ponder without limits until ponderhit or stop.
+        if 'ponder' in args:
+            self._ponder_limits = limits
+            limits = {'depth': Engine.get_MAX_DEPTH()}
+        elif not self._infinite:
+            self._release.set()
+
+        self._stop_event = threading.Event()
+        self._started = threading.Event()
+        self._thread = threading.Thread(target=self.search,
+                                        args=(self._game, self._stop_event,
+                                              self._started, self._release,
+                                              limits),
+                                        daemon=True)
+        self._thread.start()
+
+    def do_ponderhit(self, args):
+        """The opponent played the expected move. Give the running ponder
+        search the limits it was started with, counted from now.
+
+        Waits for the search to set its own limits first, or they would
+        overwrite the ones given here."""
+        if self._thread is None or self._ponder_limits is None:
+            return
+        while (not self._started.wait(UcciServer._PONDER_POLL)
+               and self._thread.is_alive()):
+            pass
+        if self._started.is_set():
+            self._engine.set_limits(**self._ponder_limits)
+        self._ponder_limits = None
+        if not self._infinite:
+            self._release.set()
+
+    def do_stop(self, args):
+        """Stop the search (if any) and wait for its best move to be
+        written."""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._release.set()
+        self._thread.join()
+        self._thread = None
+        self._stop_event = None
+        self._started = None
+        self._release = None
+        self._ponder_limits = None
+
+    def parse_go(self, args):
+        """Turn the arguments of 'go' into keyword arguments for
+        Engine.search().
+
+        Returns
+        -------
+        dict
+            Keyword arguments with keys among 'depth', 'nodes', 'movetime',
+            'clock', 'increment' (all times in seconds) and 'moves_to_go'.
+            Empty to search to the engine's default depth.
+        """
+        if 'infinite' in args:
+            return {'depth': Engine.get_MAX_DEPTH()}
+
+        values = {}
+        for i, arg in enumerate(args[:-1]):
+            if args[i + 1].lstrip('-').isdigit():
+                values[arg] = int(args[i + 1])
+
+        limits = {}
+        if 'depth' in values:
+            limits['depth'] = values['depth']
+        if 'nodes' in values:
+            limits['nodes'] = values['nodes']
+        if 'movetime' in values:
+            limits['movetime'] = values['movetime'] / UcciServer._MS_PER_SEC
+
+        # Clock based limits. UCCI gives the mover's clock as 'time', UCI
+        # gives both clocks.
+        red = self._game.get_mover().get_color() == Player.get_RED()
+        clock = values.get('time', values.get('wtime' if red else 'btime'))
+        increment = values.get('increment',
+                               values.get('winc' if red else 'binc', 0))
+        if clock is not None and 'movetime' not in limits:
+            # The engine splits the clock into soft and hard limits.
+            limits['clock'] = clock / UcciServer._MS_PER_SEC
+            limits['increment'] = increment / UcciServer._MS_PER_SEC
+            if 'movestogo' in values:
+                limits['moves_to_go'] = values['movestogo']
+
+        return limits
+
+    def search(self, game, stop_event, started, release, limits):
+        """Search thread body. Search, wait for release to be set (see
+        do_go()) and write the best move."""
+        move, score = self._engine.search(game, stop_event=stop_event,
+                                          info=self.write_info,
+                                          started=started, **limits)
+        release.wait()
+        if move is None:
+            self.write('nobestmove' if self._protocol == UcciServer._UCCI
+                       else 'bestmove (none)')
+        else:
+            line = f'bestmove {AlgNot.row_col_to_ucci_move(*move)}'
+            reply = self._engine.get_ponder_move(game, move)
+            if reply is not None:
+                line += f' ponder {AlgNot.row_col_to_ucci_move(*reply)}'
+            self.write(line)
+
+    def write_info(self, depth, score, nodes, seconds, pv):
+        """Write the result of a search iteration as an info line."""
+        if self._protocol == UcciServer._UCI:
+            plies = Engine.get_mate_plies(score)
+            if plies is None:
+                score_text = f'cp {score}'
+            else:
+                # UCI counts mates in moves rather than plies.
+                moves = (abs(plies) + 1) // 2
+                score_text = f'mate {moves if plies > 0 else -moves}'
+        else:
+            score_text = str(score)
+
+        pv_text = ' '.join(AlgNot.row_col_to_ucci_move(*move) for move in pv)
+        self.write(f'info depth {depth} score {score_text} nodes {nodes} '
+                   f'time {int(seconds * UcciServer._MS_PER_SEC)} pv {pv_text}')
+
+
+if __name__ == '__main__':
+    UcciServer().run()
@@ -8,8 +8,12 @@
 #              notation to specify locations on the board (a1 being
 #              the lower left location and i10 being the upper
 #              right). The game ends when either player has been mated
-#              or a stalemate has been forced. In this implementation
-#              perpetual check or chasing has not been enforced.
+#              or a stalemate has been forced, or when a position
+#              occurs for the third time, in which case perpetual check
+#              and perpetual chasing lose under Asian rules and any
+#              other repetition is a draw.
+
+import random
 
 
 class XiangqiGame:
@@ -31,8 +35,18 @@ class XiangqiGame:
     _UNFINISHED = 'UNFINISHED'
     _RED_WON = 'RED_WON'
     _BLACK_WON = 'BLACK_WON'
+    _DRAW = 'DRAW'
     _LOSS = {'red': _BLACK_WON, 'black': _RED_WON}
 
+    # Number of times a position has to occur for repetition to end the game.
+    _REPETITION_LIMIT = 3
+
+    # FEN (Forsyth-Edwards Notation) constants.
+    _START_FEN = ('rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR'
+                  + ' w - - 0 1')
+    _FEN_COLORS = {'w': 'red', 'r': 'red', 'b': 'black'}
+    _FEN_ALIASES = {'E': 'B', 'H': 'N'}  # Alternate elephant/horse letters.
+
     def __init__(self):
         """Creates an instance of a Xiangqi game where the first player to
         move is player 'red'. Play alternates between valid turns
@@ -60,17 +74,49 @@ class XiangqiGame:
         self._mover = self._players[Player.get_RED()]
         self._inactive = self._players[Player.get_BLACK()]
 
+        # Record of every move made with push_move() so it can be reversed
+        # with pop_move(). Kept as an immutable linked list of
+        # (record, previous history) pairs (None when empty) so snapshots
+        # can share it with the game instead of copying it.
+        self._history = None
+        self._ply = 0
+
+        # Number of times each position hash has occurred in the history
+        # (including the current position) for spotting repetitions.
+        self._hash_counts = {self.get_hash(): 1}
+
+        # Moves taken back with undo(), most recent last, each with the
+        # check statuses and game state after it so redo() needn't work
+        # them out again.
+        self._redo = []
+
     def get_game_state(self):
         """Getter. Return the game state.
 
-        Returns a string with one of three values depending current
+        Returns a string with one of four values depending current
         state of board:
         1) 'UNFINISHED'
         2) 'RED_WON'
         3) 'BLACK_WON'
+        4) 'DRAW' (by repetition)
         """
         return self._game_state
 
+    def set_game_state(self, game_state):
+        """Setter. Set the game state, e.g. once it has been worked out
+        elsewhere for a move made with push_move(..., detect_game_over=False).
+
+        Parameters
+        ----------
+        game_state: str
+            One of the game state strings (see get_game_state()).
+
+        Returns
+        -------
+        None
+        """
+        self._game_state = game_state
+
     def is_in_check(self, color):
         """Checks if specified player is in check.
 
@@ -141,20 +187,493 @@ class XiangqiGame:
 
         # Attempt the mover's move.
         try:
-            self.move_mover(pos_start, pos_end, self._mover, self._inactive)
+            self.push_move(pos_start, pos_end)
         except IllegalMoveError:
             return False
 
+        # A new move replaces any moves that could have been redone.
+        self._redo = []
+        return True
+
+    def push_move(self, beg_pos, end_pos, detect_game_over=True):
+        """Make the current player's move given in row/col notation and
+        record it so it can be taken back with pop_move().
+
+        Same as make_move() except that positions are not in algebraic
+        notation, illegal moves raise instead of returning False and the
+        game is not checked for being over beforehand.
+
+        Raises
+        ------
+        IllegalMoveError:
+            When the move is illegal (see XiangqiGame.move_mover()). The
+            position is left unchanged.
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position of the mover's piece.
+        end_pos: tuple of int
+            Position to move the mover's piece to.
+        detect_game_over: bool
+            If False skip counting the opponent's legal moves afterwards
+            and judging repetitions (the game state stays 'UNFINISHED').
+            For callers such as move searches that find the legal moves
+            themselves.
+
+        Returns
+        -------
+        None
+        """
+        # Flags to restore when the move is taken back, and the hash of the
+        # position the move is made from.
+        flags = (self._mover.get_in_check(), self._inactive.get_in_check(),
+                 self._game_state, self.get_hash())
+
+        taken = self.move_mover(beg_pos, end_pos, self._mover, self._inactive)
+        self._board.commit_move()
+
         # Update check status of inactive player
         self._inactive.set_in_check(self._inactive.is_in_check(self._board))
 
         # Check if the game is over
-        self.update_game_state()
+        if detect_game_over:
+            self.update_game_state()
+
+        # Only the kind of the captured piece is recorded so the history
+        # does not refer to this game's Piece objects.
+        taken_key = None if taken is None else self._inactive.find_key(taken)
+        self._history = ((beg_pos, end_pos, taken_key) + flags, self._history)
+        self._ply += 1
 
         # alternate mover
         self.switch_mover(self._mover)
 
-        return True
+        pos_hash = self.get_hash()
+        self._hash_counts[pos_hash] = self._hash_counts.get(pos_hash, 0) + 1
+        if (detect_game_over
+                and self._game_state == XiangqiGame._UNFINISHED
+                and self._hash_counts[pos_hash]
+                >= XiangqiGame._REPETITION_LIMIT):
+            self._game_state = self.judge_repetition()
+
+    def pop_move(self):
+        """Take back the last move made with push_move() (or make_move()),
+        restoring the check statuses and game state from before it.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (beg_pos, end_pos) of the move taken back. None if
+            there are no moves to take back.
+        """
+        if self._history is None:
+            return None
+        pos_hash = self.get_hash()
+        self._hash_counts[pos_hash] -= 1
+        if self._hash_counts[pos_hash] == 0:
+            del self._hash_counts[pos_hash]
+
+        record, self._history = self._history
+        self._ply -= 1
+        (beg_pos, end_pos, taken_key,
+         mover_check, inactive_check, state, prev_hash) = record
+
+        # The player who made the move becomes the mover again.
+        self.switch_mover(self._mover)
+        taken = (None if taken_key is None
+                 else self._inactive.revive_piece(taken_key, end_pos))
+        self._board.unmake_move(beg_pos, end_pos, taken)
+
+        self._mover.set_in_check(mover_check)
+        self._inactive.set_in_check(inactive_check)
+        self._game_state = state
+
+        return beg_pos, end_pos
+
+    def push_fast_move(self, beg_pos, end_pos):
+        """Make a pseudo legal move of the current player with as little
+        work as possible, for random playouts.
+
+        The only test made is that the mover's general is not left facing
+        the other general or attacked (see Player.find_checkers()), which
+        is much cheaper than building a threat map. Check statuses, the
+        game state, the move history and the repetition counts are not
+        updated. Take the move back with pop_fast_move(), in reverse order
+        of fast moves made, before using the game any other way.
+
+        Raises
+        ------
+        MoverMoveResultedInOwnCheckError:
+            When the move leaves the mover's general attacked. The position
+            is left unchanged.
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position of the mover's piece. The move must be one of the
+            piece's Piece.iter_fast_moves(), which is not checked.
+        end_pos: tuple of int
+            Position to move the mover's piece to.
+
+        Returns
+        -------
+        Piece
+            Piece that was captured if end_pos was occupied. Otherwise None.
+            Needed by pop_fast_move().
+        """
+        mover = self._mover
+        inactive = self._inactive
+        taken = self._board.remake_move(beg_pos, end_pos)
+        if taken is not None:
+            inactive.remove_piece(taken)
+
+        if (self._board.is_flying_general(mover.get_general().get_pos(),
+                                          inactive.get_general().get_pos())
+                or len(mover.find_checkers(self._board)) > 0):
+            moved = self._board.unmake_move(beg_pos, end_pos, taken)
+            if taken is not None:
+                inactive.add_piece(taken)
+            raise MoverMoveResultedInOwnCheckError(end_pos, moved, mover)
+
+        self.switch_mover(mover)
+        return taken
+
+    def pop_fast_move(self, beg_pos, end_pos, taken):
+        """Take back a move made with push_fast_move().
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position the piece moved from.
+        end_pos: tuple of int
+            Position the piece moved to.
+        taken: Piece
+            Piece returned by push_fast_move().
+
+        Returns
+        -------
+        None
+        """
+        self.switch_mover(self._mover)
+        self._board.unmake_move(beg_pos, end_pos, taken)
+        if taken is not None:
+            self._inactive.add_piece(taken)
+
+    def undo(self):
+        """Take back the last move so that it can be made again with redo().
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (beg_pos, end_pos) of the move taken back. None if
+            there are no moves to take back.
+        """
+        if self._history is None:
+            return None
+        record = self._history[0]
+        after = (self._mover.get_in_check(), self._inactive.get_in_check(),
+                 self._game_state)
+        move = self.pop_move()
+        self._redo.append((record, after))
+        return move
+
+    def redo(self):
+        """Make again the last move taken back with undo().
+
+        The move is not checked again, nor is the game checked for being
+        over, as both were done when the move was first made. Moves to redo
+        are forgotten when a new move is made with make_move(), or if the
+        position no longer matches the one they were taken back from.
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (beg_pos, end_pos) of the move made. None if there
+            are no moves to redo.
+        """
+        if len(self._redo) == 0:
+            return None
+        record, after = self._redo[-1]
+        if record[-1] != self.get_hash():
+            self._redo = []
+            return None
+        self._redo.pop()
+
+        beg_pos, end_pos = record[:2]
+        taken = self._board.remake_move(beg_pos, end_pos)
+        if taken is not None:
+            self._inactive.remove_piece(taken)
+
+        self._history = (record, self._history)
+        self._ply += 1
+        self.switch_mover(self._mover)
+
+        mover_check, inactive_check, self._game_state = after
+        self._mover.set_in_check(mover_check)
+        self._inactive.set_in_check(inactive_check)
+
+        pos_hash = self.get_hash()
+        self._hash_counts[pos_hash] = self._hash_counts.get(pos_hash, 0) + 1
+
+        return beg_pos, end_pos
+
+    def goto_ply(self, ply):
+        """Step through the game with undo() and redo() until ply moves have
+        been made.
+
+        Raises
+        ------
+        PlyOutOfRangeError:
+            When ply is negative or more than the moves made plus the moves
+            that can be redone. The game is left unchanged.
+
+        Parameters
+        ----------
+        ply: int
+            Number of moves to have made.
+
+        Returns
+        -------
+        None
+        """
+        if not 0 <= ply <= self._ply + len(self._redo):
+            raise PlyOutOfRangeError(ply, self._ply + len(self._redo))
+
+        while self._ply > ply:
+            self.undo()
+        while self._ply < ply:
+            if self.redo() is None:
+                break
+
+    def get_redo_count(self):
+        """Getter. Return the number of moves that can be made again with
+        redo()."""
+        return len(self._redo)
+
+    def get_ply(self):
+        """Getter. Return the number of moves made (and not taken back)."""
+        return self._ply
+
+    def get_moves(self):
+        """Getter. Return the moves made (and not taken back).
+
+        Returns
+        -------
+        list of tuple
+            Size 2 tuples (beg_pos, end_pos) of row/col positions, in the
+            order they were played.
+        """
+        moves = []
+        history = self._history
+        while history is not None:
+            record, history = history
+            moves.append(record[:2])
+        moves.reverse()
+        return moves
+
+    def get_start_fen(self):
+        """Getter. Return the FEN of the position before the first move made
+        (and not taken back)."""
+        start = self.clone()
+        while start.pop_move() is not None:
+            pass
+        return start.get_fen()
+
+    def snapshot(self):
+        """Capture the current state of the game, including its move
+        history, so it can be brought back with restore().
+
+        Only the piece positions are copied. The move history is shared
+        with the game as it can't be changed in place, so taking a
+        snapshot costs the same however long the game has gone on.
+
+        Returns
+        -------
+        GameSnapshot
+            Immutable copy of the game state.
+        """
+        positions = {color: player.get_table_positions()
+                     for color, player in self._players.items()}
+        in_check = {color: player.get_in_check()
+                    for color, player in self._players.items()}
+        return GameSnapshot(positions, self._mover.get_color(), in_check,
+                            self._game_state, self._history, self._ply)
+
+    def restore(self, snapshot, hash_counts=None):
+        """Replace the current state of the game with a snapshot taken with
+        snapshot(), from this game or any other. Moves made since can be
+        taken back with pop_move() as usual, as can those made before the
+        snapshot was taken.
+
+        Parameters
+        ----------
+        snapshot: GameSnapshot
+            State to go back to.
+        hash_counts: dict
+            Repetition counts of the snapshot's position and history, if
+            already known (see clone()). Copied instead of counted again
+            from the history.
+
+        Returns
+        -------
+        None
+        """
+        for color, player in self._players.items():
+            player.set_table_positions(snapshot.get_positions(color))
+            player.set_in_check(snapshot.get_in_check(color))
+        self._board.reset(self._players.values())
+
+        self._mover = self._players[snapshot.get_mover_color()]
+        self._inactive = self._mover.get_opponent()
+        self._game_state = snapshot.get_game_state()
+        self._history = snapshot.get_history()
+        self._ply = snapshot.get_ply()
+        self._redo = []
+
+        if hash_counts is not None:
+            self._hash_counts = dict(hash_counts)
+            return
+
+        # Count the hashes recorded in the history.
+        self._hash_counts = {self.get_hash(): 1}
+        history = self._history
+        while history is not None:
+            record, history = history
+            self._hash_counts[record[-1]] = (
+                self._hash_counts.get(record[-1], 0) + 1)
+
+    def clone(self):
+        """Make an independent copy of the game. Moves made on the copy do
+        not affect the original and vice versa.
+
+        __init__() is skipped as it sets up the starting position only for
+        restore() to replace it. The copy starts from fresh players and an
+        empty board, and takes the repetition counts as they are rather than
+        counting them from the history again.
+
+        Returns
+        -------
+        XiangqiGame
+            New game in the same state.
+        """
+        game = XiangqiGame.__new__(XiangqiGame)
+        game._players = {color: Player(color)
+                         for color in Player.get_COLORS()}
+        game.set_opponents()
+        game._board = Board(())  # Pieces are placed by restore().
+        game.restore(self.snapshot(), self._hash_counts)
+        return game
+
+    def get_repetition_count(self):
+        """Getter. Return the number of times the current position (pieces
+        and player to move) has occurred in the game, counting now."""
+        return self._hash_counts.get(self.get_hash(), 0)
+
+    def judge_repetition(self):
+        """Judge a repeated position under Asian rules.
+
+        The moves since the first of the repeated occurrences are examined.
+        A player all of whose moves gave check is checking perpetually and
+        one all of whose moves gave check or chased a piece (see
+        find_chased()), but not only checks, is chasing perpetually. A
+        perpetual check loses against anything else, then a perpetual chase
+        loses against anything else. Otherwise the game is drawn.
+
+        Returns
+        -------
+        str
+            Game state the repetition results in.
+        """
+        # Gather the moves back to the first occurrence of the position.
+        pos_hash = self.get_hash()
+        cycle_length = 0
+        seen = 1
+        history = self._history
+        while history is not None and seen < self._hash_counts[pos_hash]:
+            record, history = history
+            cycle_length += 1
+            if record[-1] == pos_hash:
+                seen += 1
+
+        # Step back through the cycle on a copy, classifying each move as
+        # checking, chasing or neither. Index 0 is the most recent move.
+        game = self.clone()
+        forcing = {color: [] for color in self._players}
+        for ply in range(cycle_length):
+            gave_check = game.get_mover().get_in_check()
+            mover = game.get_inactive()
+            beg_pos, end_pos = game._history[0][:2]
+            chased_after = game.find_chased(game.get_board().get_piece(end_pos))
+            game.pop_move()
+            chased_before = game.find_chased(game.get_board().get_piece(beg_pos))
+            if gave_check:
+                forcing[mover.get_color()].append('check')
+            elif len(chased_after - chased_before) > 0:
+                forcing[mover.get_color()].append('chase')
+            else:
+                forcing[mover.get_color()].append(None)
+
+        checking = {color for color, kinds in forcing.items()
+                    if len(kinds) > 0 and all(kind == 'check' for kind in kinds)}
+        chasing = {color for color, kinds in forcing.items()
+                   if len(kinds) > 0 and None not in kinds} - checking
+
+        for culprits in (checking, chasing):
+            if len(culprits) == 1:
+                return XiangqiGame._LOSS[culprits.pop()]
+            if len(culprits) > 1:
+                return XiangqiGame._DRAW
+        return XiangqiGame._DRAW
+
+    def find_chased(self, piece):
+        """Find the enemy pieces a piece chases, i.e. could legally capture
+        without being recaptured, or could capture while being worth less
+        (a horse or cannon attacking a chariot).
+
+        Generals and soldiers are allowed to attack so they chase nothing.
+        Soldiers that have not crossed the river can't be chased, nor can
+        the general (that is check).
+
+        Parameters
+        ----------
+        piece: Piece
+            Attacking piece.
+
+        Returns
+        -------
+        set of tuple of int
+            Positions of the chased pieces.
+        """
+        player = piece.get_player()
+        if isinstance(piece, (General, Soldier)):
+            return set()
+        opponent = player.get_opponent()
+        beg_pos = piece.get_pos()
+
+        chased = set()
+        for end_pos in piece.get_moves(self._board):
+            target = self._board.get_piece(end_pos)
+            if (not piece.is_hostile(target)
+                    or isinstance(target, General)
+                    or (isinstance(target, Soldier)
+                        and not Board.is_across_river(end_pos, opponent))):
+                continue
+
+            # Make the capture to see if it is legal and if it can be
+            # answered by a recapture.
+            taken = self._board.make_move(beg_pos, end_pos, player)
+            opponent.remove_piece(taken)
+            legal = not player.is_in_check(self._board)
+            protected = end_pos in opponent.get_threat(self._board)
+            self.undo_move(taken, opponent)
+
+            if legal and (not protected
+                          or (isinstance(target, Chariot)
+                              and isinstance(piece, (Horse, Cannon)))):
+                chased.add(end_pos)
+
+        return chased
 
     def move_mover(self, beg_pos, end_pos, mover, inactive):
         """Update the mover's Piece's location on the board.
@@ -187,7 +706,8 @@ class XiangqiGame:
 
         Returns
         -------
-        None
+        Piece
+            Piece that was captured if end_pos was occupied. Otherwise None.
         """
 
         # Make the move. Board is updated accordingly if there was a
@@ -210,39 +730,317 @@ class XiangqiGame:
         if mover.get_in_check():
             mover.set_in_check(False)
 
+        return taken
+
     def update_game_state(self):
         """Updates the current player's (mover player) opponent (inactive
         player) check state after. Assumed to be called after the
         mover has relocated their piece on the Board.
 
-        Finally computes whether the game has ended by counting all
-        valid moves of the inactive player. If said player has no
+        Finally computes whether the game has ended by looking for a
+        valid move of the inactive player. If said player has no
         valid moves then the game has been won by the mover.
         """
-        pieces = self._inactive.get_all_pieces(self._inactive)
-        valid_move_count = 0  # if no valid moves, then game is over.
+        # Stops at the first valid move (see has_legal_move()).
+        if not self.has_legal_move(self._inactive):
+            self._game_state = self._LOSS[self._inactive.get_color()]
+
+    def get_legal_moves(self, player=None):
+        """Get every legal move of a player in the current position.
+
+        Parameters
+        ----------
+        player: Player
+            Player whose moves to find. If None uses the current mover.
+
+        Returns
+        -------
+        list of tuple
+            List of size 2 tuples (beg_pos, end_pos) of row/col positions.
+        """
+        player = self._mover if player is None else player
+        opponent = player.get_opponent()
+        legal_moves = []
+
+        for beg_pos, end_pos in self.iter_candidate_moves(player):
+            try:
+                self.validate_virual_move(beg_pos, end_pos, player, opponent)
+                legal_moves.append((beg_pos, end_pos))
+            except IllegalMoveError:
+                pass
+
+        return legal_moves
+
+    def has_legal_move(self, player=None):
+        """Predicate. Same as get_legal_moves() but stops at the first legal
+        move found.
+
+        Parameters
+        ----------
+        player: Player
+            Player whose moves to check. If None uses the current mover.
+
+        Returns
+        -------
+        bool
+            True if the player has at least one legal move. Otherwise False.
+        """
+        player = self._mover if player is None else player
+        opponent = player.get_opponent()
+
+        for beg_pos, end_pos in self.iter_candidate_moves(player):
+            try:
+                self.validate_virual_move(beg_pos, end_pos, player, opponent)
+                return True
+            except IllegalMoveError:
+                pass
+
+        return False
+
+    def iter_candidate_moves(self, player):
+        """Generate the pseudo legal moves of a player that still have to be
+        validated (see validate_virual_move()) to find the legal ones.
+
+        When the player is in check only the moves that could answer the
+        check are generated (see iter_evasions()). Otherwise every pseudo
+        legal move is.
+
+        Parameters
+        ----------
+        player: Player
+            Player whose moves to generate.
+
+        Yields
+        ------
+        tuple
+            Size 2 tuples (beg_pos, end_pos) of row/col positions.
+        """
+        checkers = (player.find_checkers(self._board)
+                    if player.get_in_check() else [])
+        if len(checkers) > 0:
+            yield from self.iter_evasions(player, checkers)
+            return
 
-        # Check each each of the inactives pieces to see if it has any valid
-        # moves.
-        for piece in pieces:
-            # Piece's current position.
+        for piece in player.get_all_pieces(player):
             beg_pos = piece.get_pos()
+            for end_pos in piece.iter_moves(self._board):
+                yield beg_pos, end_pos
 
-            # Get all possible moves for the given piece.
-            end_positions = piece.get_moves(self._board)
+    def iter_evasions(self, player, checkers):
+        """Generate the pseudo legal moves of a player in check that could
+        answer every check: general moves, captures of a checker, blocks on
+        a checking line or horse leg (adding a second cannon screen
+        included) and moves of a piece screening a checking cannon. Moves
+        of other pieces can't answer a check so they are never generated.
 
-            for end_pos in end_positions:
-                try:
-                    # If the move succeeds, add count it towards the total.
-                    self.validate_virual_move(beg_pos, end_pos,
-                                              self._inactive, self._mover)
-                    valid_move_count += 1
-                except IllegalMoveError:
-                    # Do not count failed moves towards the total.
-                    pass
+        Parameters
+        ----------
+        player: Player
+            Player in check.
+        checkers: list of Piece
+            Opponent's pieces giving check (see Player.find_checkers()).
 
-        if valid_move_count == 0:
-            self._game_state = self._LOSS[self._inactive.get_color()]
+        Yields
+        ------
+        tuple
+            Size 2 tuples (beg_pos, end_pos) of row/col positions.
+        """
+        board = self._board
+        general = player.get_general()
+        answers = [player.find_check_answers(board, checker)
+                   for checker in checkers]
+
+        # Squares every check can be answered on.
+        common_ends = sorted(set.intersection(*(ends for ends, screens
+                                                in answers)))
+
+        for piece in player.get_all_pieces(player):
+            beg_pos = piece.get_pos()
+            if piece is general:
+                for end_pos in piece.iter_moves(board):
+                    yield beg_pos, end_pos
+            elif any(beg_pos in screens for ends, screens in answers):
+                # A screen may answer its cannon's check from anywhere.
+                for end_pos in piece.iter_moves(board):
+                    if all(end_pos in ends or beg_pos in screens
+                           for ends, screens in answers):
+                        yield beg_pos, end_pos
+            else:
+                for end_pos in common_ends:
+                    if piece.is_pseudo_legal(board, end_pos):
+                        yield beg_pos, end_pos
+
+    def set_position(self, pieces, color=None):
+        """Replace the current position with an arbitrary one.
+
+        Clears the move history. Check statuses are recomputed and the game
+        is over straight away if the player to move has no legal moves.
+        Piece counts may not exceed those of a new game and each player
+        must have exactly one general.
+
+        Raises
+        ------
+        TooManyPiecesError:
+            When a player is given more pieces of a kind than a new game has
+            (or no general).
+        DuplicatePositionError:
+            When two pieces are placed on the same position.
+        OutOfBoundsError:
+            When a piece is placed off the board.
+        InactiveInCheckError:
+            When the player not to move is in check. The position is still
+            set up but the game should not be used further.
+
+        Parameters
+        ----------
+        pieces: iterable of tuple
+            Size 3 tuples (color, key, pos) where color is the owning
+            player's color, key one of the piece dictionary keys (e.g.
+            Player.get_CHARIOT()) and pos a row/col position.
+        color: str
+            Color of the player to move. If None 'red' moves.
+
+        Returns
+        -------
+        None
+        """
+        color = Player.get_RED() if color is None else color
+
+        # Validate everything before touching the current position.
+        positions = {player_color: {} for player_color in self._players}
+        occupied = set()
+        for piece_color, key, pos in pieces:
+            Board.validate_bounds(pos)
+            if pos in occupied:
+                raise DuplicatePositionError(pos)
+            occupied.add(pos)
+            positions[piece_color].setdefault(key, []).append(pos)
+
+        for player_color, key_positions in positions.items():
+            Player.validate_piece_counts(key_positions, player_color)
+
+        # Rebuild the players' pieces then the board around them.
+        for player_color, player in self._players.items():
+            player.place_pieces(positions[player_color])
+            player.set_in_check(False)
+        self._board.reset(self._players.values())
+
+        self._mover = self._players[color]
+        self._inactive = self._mover.get_opponent()
+        self._history = None
+        self._ply = 0
+        self._hash_counts = {self.get_hash(): 1}
+        self._redo = []
+
+        if self._inactive.is_in_check(self._board):
+            raise InactiveInCheckError(self._inactive)
+        self._mover.set_in_check(self._mover.is_in_check(self._board))
+
+        # Player to move loses straight away if they have no moves.
+        if self.has_legal_move():
+            self._game_state = XiangqiGame._UNFINISHED
+        else:
+            self._game_state = self._LOSS[self._mover.get_color()]
+
+    def set_fen(self, fen):
+        """Replace the current position with one given in FEN.
+
+        The piece placement lists the rows from row 10 ('black' side) down
+        to row 1 with upper case letters for 'red' pieces, lower case for
+        'black' pieces and digits for runs of empty positions. Letters are
+        K (general), A (advisor), B or E (elephant), N or H (horse), R
+        (chariot), C (cannon) and P (soldier). The second field is the
+        color to move ('w' or 'r' for 'red', 'b' for 'black'). Any other
+        fields are ignored.
+
+        Raises
+        ------
+        FenFormattingError:
+            When the FEN can't be parsed.
+        BoardError, PlayerError:
+            When the position is not valid (see set_position()).
+
+        Parameters
+        ----------
+        fen: str
+            Position in FEN.
+
+        Returns
+        -------
+        None
+        """
+        fields = fen.split()
+        if len(fields) == 0:
+            raise FenFormattingError(fen, 'it is empty')
+
+        rows = fields[0].split('/')
+        if len(rows) != Board.get_ROW_COUNT():
+            raise FenFormattingError(fen, f'it does not have '
+                                     + f'{Board.get_ROW_COUNT()} rows')
+
+        pieces = []
+        for row, row_text in enumerate(rows):
+            col = 0
+            for char in row_text:
+                if char.isdigit():
+                    col += int(char)
+                    continue
+
+                key = Player.get_piece_key(
+                    XiangqiGame._FEN_ALIASES.get(char.upper(), char))
+                if key is None:
+                    raise FenFormattingError(fen, f'"{char}" is not a piece')
+                if col < Board.get_COL_COUNT():
+                    color = (Player.get_RED() if char.isupper()
+                             else Player.get_BLACK())
+                    pieces.append((color, key, (row, col)))
+                col += 1
+
+            if col != Board.get_COL_COUNT():
+                raise FenFormattingError(fen, f'row "{row_text}" does not '
+                                         + f'have {Board.get_COL_COUNT()} '
+                                         + 'columns')
+
+        side = fields[1].lower() if len(fields) > 1 else 'w'
+        if side not in XiangqiGame._FEN_COLORS:
+            raise FenFormattingError(fen, f'"{side}" is not a color')
+
+        self.set_position(pieces, XiangqiGame._FEN_COLORS[side])
+
+    def get_fen(self):
+        """Getter. Return the current position in FEN (see set_fen()).
+
+        Returns
+        -------
+        str
+            Position in FEN.
+        """
+        rows = []
+        for row in range(Board.get_ROW_COUNT()):
+            row_text, empty = '', 0
+            for col in range(Board.get_COL_COUNT()):
+                piece = self._board.get_piece((row, col))
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty > 0:
+                    row_text += str(empty)
+                    empty = 0
+                player = piece.get_player()
+                letter = Player.get_piece_letter(player.find_key(piece))
+                row_text += (letter if player.get_color() == Player.get_RED()
+                             else letter.lower())
+            if empty > 0:
+                row_text += str(empty)
+            rows.append(row_text)
+
+        side = 'w' if self._mover.get_color() == Player.get_RED() else 'b'
+        return f'{"/".join(rows)} {side} - - 0 {self.get_ply() // 2 + 1}'
+
+    @staticmethod
+    def get_START_FEN():
+        """Getter. Get the FEN of the starting position."""
+        return XiangqiGame._START_FEN
 
     def validate_virual_move(self, beg_pos, end_pos,
                              vir_mover, vir_inactive):
@@ -342,6 +1140,38 @@ class XiangqiGame:
 
         return moved
 
+    @staticmethod
+    def get_UNFINISHED():
+        """Getter. Get the game state string of a game still in progress."""
+        return XiangqiGame._UNFINISHED
+
+    @staticmethod
+    def get_RED_WON():
+        """Getter. Get the game state string of a game won by 'red'."""
+        return XiangqiGame._RED_WON
+
+    @staticmethod
+    def get_BLACK_WON():
+        """Getter. Get the game state string of a game won by 'black'."""
+        return XiangqiGame._BLACK_WON
+
+    @staticmethod
+    def get_REPETITION_LIMIT():
+        """Getter. Get the number of times a position has to occur for the
+        repetition to end the game."""
+        return XiangqiGame._REPETITION_LIMIT
+
+    @staticmethod
+    def get_DRAW():
+        """Getter. Get the game state string of a drawn game."""
+        return XiangqiGame._DRAW
+
+    @staticmethod
+    def get_LOSS():
+        """Getter. Get the dictionary mapping a color to the game state where
+        that player has lost."""
+        return XiangqiGame._LOSS
+
     def get_players(self):
         """Getter. Return dictionary of the two players.
 
@@ -354,6 +1184,61 @@ class XiangqiGame:
         """Getter. Return the object of type Board."""
         return self._board
 
+    def get_mover(self):
+        """Getter. Return the Player whose turn it is."""
+        return self._mover
+
+    def get_inactive(self):
+        """Getter. Return the Player waiting for their turn."""
+        return self._inactive
+
+    def get_hash(self):
+        """Getter. Return the Zobrist hash of the current position.
+
+        The hash covers every piece on the Board as well as the player
+        whose turn it is, so the same arrangement of pieces with a
+        different mover hashes differently.
+
+        Returns
+        -------
+        int
+            Unsigned 64 bit position hash.
+        """
+        side_key = (Zobrist.get_side_key()
+                    if self._mover.get_color() == Player.get_BLACK() else 0)
+        return self._board.get_hash() ^ side_key
+
+    def get_mirror_hash(self):
+        """Getter. Return the Zobrist hash the current position would have
+        if it were mirrored left to right (see Board.mirror_pos()).
+        """
+        side_key = (Zobrist.get_side_key()
+                    if self._mover.get_color() == Player.get_BLACK() else 0)
+        return self._board.get_mirror_hash() ^ side_key
+
+    def get_canonical_hash(self):
+        """Getter. Return a hash shared by the current position and its left
+        to right mirror image.
+
+        The rules are the same for a position and its mirror image so
+        anything learned about one (book moves, search results) holds for
+        the other once its moves are mirrored. The canonical hash is the
+        smaller of get_hash() and get_mirror_hash().
+
+        Returns
+        -------
+        tuple
+            Size 2 tuple (canonical hash, mirrored) where mirrored is True
+            if the canonical hash is the one of the mirror image. Moves
+            stored under the canonical hash must then be mirrored with
+            Board.mirror_move() going in and coming out.
+        """
+        pos_hash = self.get_hash()
+        mirror_hash = self.get_mirror_hash()
+        if mirror_hash < pos_hash:
+            return mirror_hash, True
+        return pos_hash, False
+
     def set_opponents(self):
         """Helper method to call during init. Allows Players to keep track of
         the other Player. This is not done in Player.__init__() due to
@@ -373,16 +1258,77 @@ class XiangqiGame:
         current_mover: Player
             Player to be made into the inactive player.
 
-        Returns
-        -------
-        None
-        """
-        if current_mover.get_color() == current_mover.get_RED():
-            self._mover = self._players['black']
-            self._inactive = self._players['red']
-        else:
-            self._mover = self._players['red']
-            self._inactive = self._players['black']
+        Returns
+        -------
+        None
+        """
+        if current_mover.get_color() == current_mover.get_RED():
+            self._mover = self._players['black']
+            self._inactive = self._players['red']
+        else:
+            self._mover = self._players['red']
+            self._inactive = self._players['black']
+
+
+class GameSnapshot:
+    """Class holding the state of a XiangqiGame captured by
+    XiangqiGame.snapshot(). Should not be changed once created.
+
+    The move history is the game's own immutable linked list of
+    (record, previous history) pairs, shared rather than copied.
+    """
+    def __init__(self, positions, mover_color, in_check, game_state,
+                 history, ply):
+        """Create a snapshot.
+
+        Parameters
+        ----------
+        positions: dict
+            Keys are player colors and values tuples of the positions of
+            the pieces in each player's piece table, None for captured
+            pieces (see Player.get_table_positions()).
+        mover_color: str
+            Color of the player to move.
+        in_check: dict
+            Keys are player colors and values their check statuses.
+        game_state: str
+            Game state (see XiangqiGame.get_game_state()).
+        history: tuple
+            Move history (see XiangqiGame.push_move()).
+        ply: int
+            Number of moves in the history.
+        """
+        self._positions = positions
+        self._mover_color = mover_color
+        self._in_check = in_check
+        self._game_state = game_state
+        self._history = history
+        self._ply = ply
+
+    def get_positions(self, color):
+        """Getter. Get the positions of the pieces in the piece table of the
+        player of the given color."""
+        return self._positions[color]
+
+    def get_mover_color(self):
+        """Getter. Get the color of the player to move."""
+        return self._mover_color
+
+    def get_in_check(self, color):
+        """Getter. Get the check status of the player of the given color."""
+        return self._in_check[color]
+
+    def get_game_state(self):
+        """Getter. Get the game state."""
+        return self._game_state
+
+    def get_history(self):
+        """Getter. Get the move history linked list."""
+        return self._history
+
+    def get_ply(self):
+        """Getter. Get the number of moves in the history."""
+        return self._ply
 
 
 class Board:
@@ -429,6 +1375,7 @@ class Board:
     _ROW_COUNT = 10
     _COL_COUNT = 9
     _AXES_COUNTS = (_ROW_COUNT, _COL_COUNT)
+    _SQUARE_COUNT = _ROW_COUNT * _COL_COUNT
     _RIVER_DIST = 5
 
     # Axes constants
@@ -445,6 +1392,33 @@ class Board:
                          (_REV, 0): ((_REV, _FWD), (_REV, _REV)),
                          (_FWD, 0): ((_FWD, _FWD), (_FWD, _REV))}
 
+    # Per square tables built once by Board.make_tables() when the module is
+    # loaded. Each is a dictionary keyed by player color whose values are
+    # tuples indexed by square (see Board.pos_to_sq()).
+    _CASTLES = {}        # Castle positions (not indexed by square).
+    _IN_CASTLE = {}      # bool. Square is inside the castle.
+    _ACROSS_RIVER = {}   # bool. Square is across the river.
+    _GENERAL_STEPS = {}  # Orthogonal steps staying inside the castle.
+    _ADVISOR_STEPS = {}  # Diagonal steps staying inside the castle.
+    _ELEPHANT_STEPS = {}  # (target, eye) pairs staying on the own side.
+    _SOLDIER_STEPS = {}  # Forward step and sideways steps once across.
+
+    # (target, leg) pairs of a Horse jump indexed by square. The same for
+    # both colors so not keyed by color. Built by Board.make_tables().
+    _HORSE_STEPS = ()
+
+    # Ray tables for Chariots and Cannons built by Board.make_ray_tables().
+    # Keyed by line length (_COL_COUNT for ranks, _ROW_COUNT for files) and
+    # indexed by [index on the line][occupancy mask of the line]. Values are
+    # tuples of indices on the line.
+    _RAY_QUIETS = {}    # Empty squares up to the first piece each way.
+    _RAY_BLOCKERS = {}  # First piece each way.
+    _RAY_TARGETS = {}   # First piece behind the first piece each way.
+
+    # Masks of the indices strictly between two indices on a line, indexed
+    # by [index][index]. Built by Board.make_ray_tables().
+    _BETWEEN_MASKS = []
+
     def __init__(self, players):
         """Create a board represenation (nested list) with all pieces at their
         starting positions. Players should be the size 2 list of
@@ -455,20 +1429,57 @@ class Board:
         self._board = [[None for j in range(Board._COL_COUNT)]
                        for i in range(Board._ROW_COUNT)]
 
+        # Zobrist hash of the pieces on the board and of its mirror image.
+        # Kept up to date by set_board_list() so every write to a square is
+        # accounted for.
+        self._hash = 0
+        self._mirror_hash = 0
+
+        # Occupancy masks of every rank (bit col set in _ranks[row]) and
+        # every file (bit row set in _files[col]). Also kept up to date by
+        # set_board_list().
+        self._ranks = [0] * Board._ROW_COUNT
+        self._files = [0] * Board._COL_COUNT
+
         # Place all the Pieces belonging to the players on the Board.
         for piece in Player.get_all_pieces(*players):
-            row, col = piece.get_pos()
-            self._board[row][col] = piece
+            self.set_board_list(piece.get_pos(), piece)
 
         # Designate castle regions by player color strings Player._RED and
         # Player._BLACK.
-        self._castles = {player.get_color(): self.make_castle(player)
-                         for player in players}
+        self._castles = Board._CASTLES
 
         # Store the move history in a stack for allowing easier history
         # rollback.
         self._last_pos = Stack()
 
+    def reset(self, players):
+        """Clear the board and place the players' pieces at their current
+        positions. Used after the players' pieces have been set up
+        elsewhere (see XiangqiGame.set_position()). Castles are kept as is
+        and the move history is cleared.
+
+        Parameters
+        ----------
+        players: iterable of Player
+            The two players.
+
+        Returns
+        -------
+        None
+        """
+        self._board = [[None for j in range(Board._COL_COUNT)]
+                       for i in range(Board._ROW_COUNT)]
+        self._hash = 0
+        self._mirror_hash = 0
+        self._ranks = [0] * Board._ROW_COUNT
+        self._files = [0] * Board._COL_COUNT
+
+        for piece in Player.get_all_pieces(*players):
+            self.set_board_list(piece.get_pos(), piece)
+
+        self._last_pos = Stack()
+
     def __repr__(self):
         """Debugging method. Print a text visualization of the board. Assumes
         each piece has __repr__ implemented such that its string
@@ -588,7 +1599,46 @@ class Board:
         -------
         None
         """
-        self._board[pos[self._ROW]][pos[self._COL]] = elt
+        row, col = pos
+        sq = row * Board._COL_COUNT + col
+
+        # Hash out whatever occupied the square and hash in its replacement.
+        old = self._board[row][col]
+        if old is not None:
+            self._hash ^= old.get_zobrist_keys()[sq]
+            self._mirror_hash ^= old.get_mirror_zobrist_keys()[sq]
+        if elt is not None:
+            self._hash ^= elt.get_zobrist_keys()[sq]
+            self._mirror_hash ^= elt.get_mirror_zobrist_keys()[sq]
+
+        # Flip the occupancy bits if the square is filled or emptied.
+        if (old is None) != (elt is None):
+            self._ranks[row] ^= 1 << col
+            self._files[col] ^= 1 << row
+
+        self._board[row][col] = elt
+
+    def get_rank_occupancy(self, row):
+        """Getter. Get the occupancy mask of a rank (bit col is set if
+        (row, col) is occupied)."""
+        return self._ranks[row]
+
+    def get_file_occupancy(self, col):
+        """Getter. Get the occupancy mask of a file (bit row is set if
+        (row, col) is occupied)."""
+        return self._files[col]
+
+    def get_hash(self):
+        """Getter. Return the Zobrist hash of the pieces on the board (does
+        not include whose turn it is, see XiangqiGame.get_hash()).
+        """
+        return self._hash
+
+    def get_mirror_hash(self):
+        """Getter. Return the Zobrist hash of the pieces on the board mirrored
+        left to right (see XiangqiGame.get_mirror_hash()).
+        """
+        return self._mirror_hash
 
     def make_move(self, beg_pos, end_pos, moving_player):
         """Moves pieces on the board. Updates the moved piece location.
@@ -626,17 +1676,38 @@ class Board:
         if beg_piece.get_player() != moving_player:
             raise WrongPieceOwner(moving_player, beg_pos)
 
-        # Get piece move list.
-        moves = beg_piece.get_moves(self)
-
-        # Check if in move list.
-        if end_pos not in moves:
-            raise NotInMoveListError(beg_piece, moves, end_pos)
+        # Check if in move list. The full list is only built for the error.
+        if not beg_piece.is_pseudo_legal(self, end_pos):
+            raise NotInMoveListError(beg_piece, beg_piece.get_moves(self),
+                                     end_pos)
 
         self.place_piece(end_pos, beg_piece)  # Move the piece.
         self._last_pos.push(end_pos)          # Save the location.
         return end_piece
 
+    def is_pseudo_legal(self, beg_pos, end_pos):
+        """Predicate. Checks if the piece at beg_pos can move to end_pos
+        according to how it moves (see Piece.is_pseudo_legal()). Whether
+        the move leaves the mover in check is not considered.
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position of the piece to move.
+        end_pos: tuple of int
+            Position of where to move the piece.
+
+        Returns
+        -------
+        bool
+            True if there is a piece at beg_pos that can move to end_pos.
+            Otherwise False.
+        """
+        if not (Board.is_in_bounds(beg_pos) and Board.is_in_bounds(end_pos)):
+            return False
+        piece = self.get_piece(beg_pos)
+        return piece is not None and piece.is_pseudo_legal(self, end_pos)
+
     def undo_move(self, taken_piece):
         """Reverses changes to the Board in the previous move. If taken_piece
         was captured in the previous move it is placed back on the board
@@ -674,14 +1745,75 @@ class Board:
 
         return moved_piece
 
-    def make_castle(self, player):
-        """Helper method to create record of each player's castle positions.
+    def commit_move(self):
+        """Forget how to undo the previous move with undo_move(), keeping
+        the move. Used once a move is known to be legal so that the
+        Board's and the moved Piece's histories don't grow with every move
+        played (see XiangqiGame.push_move()).
+
+        Returns
+        -------
+        None
+        """
+        end_pos = self._last_pos.pop()
+        self.get_piece(end_pos).reset_pos(end_pos)
+
+    def unmake_move(self, beg_pos, end_pos, taken_piece):
+        """Reverse a committed move (see commit_move()).
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position the piece moved from.
+        end_pos: tuple of int
+            Position the piece moved to.
+        taken_piece: Piece
+            The Piece captured by the move, already positioned at end_pos.
+            None if nothing was captured.
+
+        Returns
+        -------
+        Piece
+            The piece that was moved.
+        """
+        moved_piece = self.get_piece(end_pos)
+        self.set_board_list(end_pos, taken_piece)
+        self.set_board_list(beg_pos, moved_piece)
+        moved_piece.reset_pos(beg_pos)
+        return moved_piece
+
+    def remake_move(self, beg_pos, end_pos):
+        """Make a committed move again after unmake_move(). The move is not
+        checked.
+
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position of the piece to move.
+        end_pos: tuple of int
+            Position of where to move the piece.
+
+        Returns
+        -------
+        Piece
+            Piece that was captured if end_pos was occupied. Otherwise None.
+        """
+        moved_piece = self.get_piece(beg_pos)
+        taken_piece = self.get_piece(end_pos)
+        self.set_board_list(end_pos, moved_piece)
+        self.set_board_list(beg_pos, None)
+        moved_piece.reset_pos(end_pos)
+        return taken_piece
+
+    @staticmethod
+    def make_castle(color):
+        """Helper method to create record of a player's castle positions.
 
-        Should only be called upon board creation.
+        Should only be called by Board.make_tables().
 
         Parameters
         ----------
-        player: str
+        color: str
             Color string for given player. Can either be
             Player.get_RED() or Player.get_BLACK().
 
@@ -693,12 +1825,12 @@ class Board:
         """
         # Center row of the castle is one row twoards river from
         # player's home row.
-        center_row = player.get_home_row() + player.get_fwd_dir()
+        center_row = (Player.get_HOME_ROWS()[color]
+                      + Player.get_FWD_DIRS()[color])
 
         # Center column of the castle is the same column as the
         # player's general.
-        general = player.get_pieces()[Player.get_GENERAL()][Board._ROW]
-        center_col = general.get_pos()[self._COL]
+        center_col = General.get_INIT_COLS()[0]
 
         # Add the displacements (-1, 0, 1) go the castle's center
         # location to get all 9 positions in the castle.
@@ -710,6 +1842,105 @@ class Board:
                                   for j in displacements])
         return castle_positions
 
+    @staticmethod
+    def make_tables():
+        """Build the per square tables (castles, river sides and the steps of
+        the General, Advisor, Elephant and Soldier) for both colors, and the
+        Horse jumps.
+
+        Called once when the module is loaded so that move generation only
+        looks up squares instead of recomputing bounds, castle membership
+        and river crossings on every call.
+        """
+        squares = [Board.sq_to_pos(sq) for sq in range(Board._SQUARE_COUNT)]
+
+        for color in Player.get_COLORS():
+            home_row = Player.get_HOME_ROWS()[color]
+            fwd_dir = Player.get_FWD_DIRS()[color]
+            castle = Board.make_castle(color)
+            across = tuple(abs(row - home_row) >= Board._RIVER_DIST
+                           for row, col in squares)
+
+            Board._CASTLES[color] = castle
+            Board._IN_CASTLE[color] = tuple(pos in castle for pos in squares)
+            Board._ACROSS_RIVER[color] = across
+
+            general_steps = []
+            advisor_steps = []
+            elephant_steps = []
+            soldier_steps = []
+            for pos in squares:
+                general_steps.append(tuple(
+                    step for step in (Board.make_step(pos, direc)
+                                      for direc in Board._DIRECTIONS_ORTHO)
+                    if step in castle))
+                advisor_steps.append(tuple(
+                    step for step in (Board.make_step(pos, direc)
+                                      for direc in Board._DIRECTIONS_DIAG)
+                    if step in castle))
+
+                # The eye is the square an Elephant can be blocked on.
+                pairs = []
+                for direc in Board._DIRECTIONS_DIAG:
+                    target = Board.make_step(pos, direc, 2)
+                    if (target is not None
+                            and not across[Board.pos_to_sq(target)]):
+                        pairs.append((target, Board.make_step(pos, direc)))
+                elephant_steps.append(tuple(pairs))
+
+                # Sideways steps only once across the river.
+                direcs = [(fwd_dir, 0)]
+                if across[Board.pos_to_sq(pos)]:
+                    direcs += [(0, Board._REV), (0, Board._FWD)]
+                soldier_steps.append(tuple(
+                    step for step in (Board.make_step(pos, direc)
+                                      for direc in direcs)
+                    if step is not None))
+
+            Board._GENERAL_STEPS[color] = tuple(general_steps)
+            Board._ADVISOR_STEPS[color] = tuple(advisor_steps)
+            Board._ELEPHANT_STEPS[color] = tuple(elephant_steps)
+            Board._SOLDIER_STEPS[color] = tuple(soldier_steps)
+
+        # The leg is the orthogonal neighbour a Horse can be blocked on.
+        horse_steps = []
+        for pos in squares:
+            pairs = []
+            for ortho_dir in Board._DIRECTIONS_ORTHO:
+                leg = Board.make_step(pos, ortho_dir)
+                if leg is None:
+                    continue
+                for diag_dir in Board._DIRECTIONS_HORSE[ortho_dir]:
+                    target = Board.make_step(leg, diag_dir)
+                    if target is not None:
+                        pairs.append((target, leg))
+            horse_steps.append(tuple(pairs))
+        Board._HORSE_STEPS = tuple(horse_steps)
+
+    @staticmethod
+    def make_step(pos, direc, dist=1):
+        """Helper method for Board.make_tables(). Step from a position.
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Starting position.
+        direc: tuple of int
+            Size 2 direction tuple.
+        dist: int
+            Number of steps to take in the direction.
+
+        Returns
+        -------
+        tuple of int or None
+            The position reached or None if it is off the board.
+        """
+        row = pos[Board._ROW] + direc[Board._ROW] * dist
+        col = pos[Board._COL] + direc[Board._COL] * dist
+        if 0 <= row < Board._ROW_COUNT and 0 <= col < Board._COL_COUNT:
+            return (row, col)
+        return None
+
     def get_castle(self, color):
         """Getter.
 
@@ -744,7 +1975,45 @@ class Board:
         bool
             True if pos is located in player's castle. Otherwise False.
         """
-        return pos in self._castles[player.get_color()]
+        return (pos is not None
+                and Board._IN_CASTLE[player.get_color()][
+                    pos[0] * Board._COL_COUNT + pos[1]])
+
+    @staticmethod
+    def get_general_steps(pos, color):
+        """Getter. Get the positions a General of the given color can step
+        to from pos without leaving its castle (occupancy not considered).
+        """
+        return Board._GENERAL_STEPS[color][pos[0] * Board._COL_COUNT + pos[1]]
+
+    @staticmethod
+    def get_advisor_steps(pos, color):
+        """Getter. Get the positions an Advisor of the given color can step
+        to from pos without leaving its castle (occupancy not considered).
+        """
+        return Board._ADVISOR_STEPS[color][pos[0] * Board._COL_COUNT + pos[1]]
+
+    @staticmethod
+    def get_elephant_steps(pos, color):
+        """Getter. Get the (target, eye) position pairs of an Elephant of the
+        given color at pos. The target is only reachable if the eye is
+        empty.
+        """
+        return Board._ELEPHANT_STEPS[color][pos[0] * Board._COL_COUNT + pos[1]]
+
+    @staticmethod
+    def get_soldier_steps(pos, color):
+        """Getter. Get the positions a Soldier of the given color can step to
+        from pos (occupancy not considered).
+        """
+        return Board._SOLDIER_STEPS[color][pos[0] * Board._COL_COUNT + pos[1]]
+
+    @staticmethod
+    def get_horse_steps(pos):
+        """Getter. Get the (target, leg) position pairs of a Horse at pos. The
+        target is only reachable if the leg is empty.
+        """
+        return Board._HORSE_STEPS[pos[0] * Board._COL_COUNT + pos[1]]
 
     def find_diag(self, beg_pos, dir_diag, dist=1):
         """Compute positions in a diagonal direction from the beginning position.
@@ -852,92 +2121,192 @@ class Board:
                 return path
         return path
 
-    def find_intervening_ortho(self, beg_pos, end_pos):
-        """Check if there is at least one piece between two positions.
+    def iter_ray_quiets(self, pos):
+        """Generator. Yield the empty positions up to the first piece in each
+        orthogonal direction from pos by looking up the occupancy masks of
+        its rank and file. Used for the moves of Chariots and Cannons.
 
-        Raises
+        Parameters
+        ----------
+        pos: tuple of int
+            Position to cast the rays from.
+
+        Yields
+        ------
+        tuple of int
+            Empty positions, along the rank first.
+        """
+        row, col = pos
+        for j in Board._RAY_QUIETS[Board._COL_COUNT][col][self._ranks[row]]:
+            yield row, j
+        for i in Board._RAY_QUIETS[Board._ROW_COUNT][row][self._files[col]]:
+            yield i, col
+
+    def iter_ray_blockers(self, pos):
+        """Generator. Yield the positions of the first piece in each
+        orthogonal direction from pos (the pieces a Chariot at pos could
+        capture if they are enemies).
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Position to cast the rays from.
+
+        Yields
         ------
-        SamePositionError:
-            When both positions refer the same location.
+        tuple of int
+            Positions of the first pieces, along the rank first.
+        """
+        row, col = pos
+        for j in Board._RAY_BLOCKERS[Board._COL_COUNT][col][self._ranks[row]]:
+            yield row, j
+        for i in Board._RAY_BLOCKERS[Board._ROW_COUNT][row][self._files[col]]:
+            yield i, col
+
+    def iter_cannon_targets(self, pos):
+        """Generator. Yield the positions a Cannon at pos could capture on if
+        they hold an enemy piece: the first piece behind the first piece
+        (the platform) in each orthogonal direction.
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Position of the Cannon.
+
+        Yields
+        ------
+        tuple of int
+            Positions of the pieces behind the platforms, along the rank
+            first.
+        """
+        row, col = pos
+        for j in Board._RAY_TARGETS[Board._COL_COUNT][col][self._ranks[row]]:
+            yield row, j
+        for i in Board._RAY_TARGETS[Board._ROW_COUNT][row][self._files[col]]:
+            yield i, col
+
+    @staticmethod
+    def make_ray_tables():
+        """Build the ray tables used by Board.iter_ray_quiets(),
+        Board.iter_ray_blockers() and Board.iter_cannon_targets() for ranks
+        and files.
+
+        Called once when the module is loaded.
+        """
+        for length in (Board._COL_COUNT, Board._ROW_COUNT):
+            quiets = []
+            blockers = []
+            targets = []
+            for index in range(length):
+                index_quiets = []
+                index_blockers = []
+                index_targets = []
+                for occ in range(1 << length):
+                    quiet = []
+                    blocker = []
+                    target = []
+                    for direction in (Board._REV, Board._FWD):
+                        pieces = 0  # Pieces seen so far in this direction.
+                        i = index + direction
+                        while 0 <= i < length and pieces < 2:
+                            if occ >> i & 1:
+                                (blocker if pieces == 0 else target).append(i)
+                                pieces += 1
+                            elif pieces == 0:
+                                quiet.append(i)
+                            i += direction
+                    index_quiets.append(tuple(quiet))
+                    index_blockers.append(tuple(blocker))
+                    index_targets.append(tuple(target))
+                quiets.append(index_quiets)
+                blockers.append(index_blockers)
+                targets.append(index_targets)
+            Board._RAY_QUIETS[length] = quiets
+            Board._RAY_BLOCKERS[length] = blockers
+            Board._RAY_TARGETS[length] = targets
+
+        # Files are the longer lines so their masks cover ranks as well.
+        Board._BETWEEN_MASKS = [[((1 << max(i, j)) - (1 << min(i, j) + 1))
+                                 if abs(i - j) > 1 else 0
+                                 for j in range(Board._ROW_COUNT)]
+                                for i in range(Board._ROW_COUNT)]
+
+    def count_between(self, beg_pos, end_pos):
+        """Count the pieces strictly between two positions on the same rank
+        or file by looking up the occupancy masks.
 
         Parameters
         ----------
         beg_pos: tuple of int
             Starting position.
-
         end_pos: tuple of int
-            Ending position
+            Ending position. Must share a row or a column with beg_pos.
 
         Returns
         -------
-        Piece
-            None if there are no pieces on a orthogonal axis between the two
-            positions. Otherwise returns the first piece that is encountered
-            from traversing from beginining position to end position.
+        int
+            Number of pieces between the two positions.
         """
-        # Find which if the two positions are on the same row or same col.
-        common_axis = Board.find_common_axis(beg_pos, end_pos)
-
-        # No intervening Piece if two positions share neither a row or col.
-        if common_axis == -1:
-            return None
+        beg_row, beg_col = beg_pos
+        end_row, end_col = end_pos
+        if beg_row == end_row:
+            occ = self._ranks[beg_row] & Board._BETWEEN_MASKS[beg_col][end_col]
+        else:
+            occ = self._files[beg_col] & Board._BETWEEN_MASKS[beg_row][end_row]
+        return bin(occ).count('1')
 
-        # The axis that the two positions do not share.
-        # Takes advantage of ***size 2*** tuple (see class Board docstring).
-        delta_axis = common_axis - 1
-        # Find the direction from the beginning element to the end element.
-        direction = Board.get_dir_one_dim(beg_pos[delta_axis],
-                                          end_pos[delta_axis])
+    def is_flying_general(self, beg_pos, end_pos):
+        """Predicate. Checks if two generals at the given positions face each
+        other on the same file with no pieces in between (which is not
+        allowed).
 
-        pos = list(beg_pos)  # Make copy of beginning position.
+        Parameters
+        ----------
+        beg_pos: tuple of int
+            Position of one general.
+        end_pos: tuple of int
+            Position of the other general.
 
-        # Traverse from beginning position to end position and if any
-        # piece is found in between return it.
-        for delta_elt in range(beg_pos[delta_axis] + direction,  # Exclude beg.
-                               end_pos[delta_axis],              # Exclude end.
-                               direction):  # Travel from beg to end.
-            pos[delta_axis] = delta_elt
-            intervening_piece = self.get_piece(pos)  # Check current position.
-            if intervening_piece is not None:
-                # Return intervening piece if there is indeed one.
-                return intervening_piece
-
-        # No intervening pieces found.
-        return None
+        Returns
+        -------
+        bool
+            True if the generals face each other. Otherwise False.
+        """
+        col = beg_pos[Board._COL]
+        return (col == end_pos[Board._COL]
+                and self._files[col] & Board._BETWEEN_MASKS[
+                    beg_pos[Board._ROW]][end_pos[Board._ROW]] == 0)
 
     @staticmethod
-    def find_common_axis(beg_pos, end_pos):
-        """Check if two positions share a row or column.
-
-        Raises:
-        SamePositionError:
-            When the two positions are identical.
+    def find_between(beg_pos, end_pos):
+        """Find the positions strictly between two positions on the same
+        rank or file.
 
         Parameters
         ----------
         beg_pos: tuple of int
-            First position to compare to.
+            Starting position.
         end_pos: tuple of int
-            Second position to compare with.
+            Ending position.
 
         Returns
         -------
-        int
-            Board._ROW if both positions share the same row.
-            Board._COL if both positions share the same col.
-            -1 if the two positions do not have a common axis.
+        list of tuple
+            Positions in order from beg_pos to end_pos. Empty if the two
+            positions are next to each other or share neither a row nor a
+            column.
         """
         beg_row, beg_col = beg_pos
         end_row, end_col = end_pos
-
-        if (beg_row, beg_col) == (end_row, end_col):  # Refer to same pos.
-            raise SamePositionError((beg_row, beg_col))
-        elif beg_row != end_row and beg_col != end_col:  # Do not share.
-            return -1
-        elif beg_row == end_row:
-            return Board._ROW  # Share row.
-        else:
-            return Board._COL  # Share col.
+        if beg_row == end_row:
+            step = 1 if end_col > beg_col else -1
+            return [(beg_row, col)
+                    for col in range(beg_col + step, end_col, step)]
+        if beg_col == end_col:
+            step = 1 if end_row > beg_row else -1
+            return [(row, beg_col)
+                    for row in range(beg_row + step, end_row, step)]
+        return []
 
     @staticmethod
     def validate_bounds(pos):
@@ -962,30 +2331,21 @@ class Board:
             raise OutOfBoundsError(pos, Board._COL, Board._COL_COUNT)
 
     @staticmethod
-    def get_dir_one_dim(beg, end):
-        """Find the one-dimensional direction between two pieces.
-
-        Raises
-        ------
-        SamePositionError:
-            When the positions both refer to the same position.
+    def is_in_bounds(pos):
+        """Predicate. Same as Board.validate_bounds() without raising.
 
         Parameters
         ----------
-        beg: int
-            Starting element.
-        end: int
-            Ending element.
+        pos: tuple of int
+            Size 2 tuple representing position to check.
 
         Returns
         -------
-        int
-            One-dimensional direction is either 1 or -1. 1 if end is more than
-            beginning and -1 if less.
+        bool
+            True if the position lies on the Board. Otherwise False.
         """
-        if beg == end:
-            raise SamePositionError(f'ELEMENT {beg}')
-        return 1 if beg < end else -1
+        return (0 <= pos[Board._ROW] < Board._ROW_COUNT
+                and 0 <= pos[Board._COL] < Board._COL_COUNT)
 
     @staticmethod
     def is_across_river(pos, player):
@@ -1003,9 +2363,65 @@ class Board:
             True if the position is across the river from the side of
             the Player's home row. False if on the same side.
         """
-        row = pos[Board._ROW]
-        home_row = player.get_home_row()
-        return abs(row - home_row) >= Board._RIVER_DIST
+        return Board._ACROSS_RIVER[player.get_color()][
+            pos[0] * Board._COL_COUNT + pos[1]]
+
+    @staticmethod
+    def pos_to_sq(pos):
+        """Convert a position to its square index.
+
+        Squares are numbered 0 through 89 in row major order so that
+        (0, 0) is square 0 and (9, 8) is square 89.
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Size 2 tuple representing position to convert.
+
+        Returns
+        -------
+        int
+            Square index of the position.
+        """
+        return pos[Board._ROW] * Board._COL_COUNT + pos[Board._COL]
+
+    @staticmethod
+    def sq_to_pos(sq):
+        """Convert a square index (see Board.pos_to_sq()) back to a position.
+
+        Parameters
+        ----------
+        sq: int
+            Square index in [0..89].
+
+        Returns
+        -------
+        tuple of int
+            Size 2 tuple representing the position.
+        """
+        return divmod(sq, Board._COL_COUNT)
+
+    @staticmethod
+    def mirror_pos(pos):
+        """Reflect a position left to right, e.g. (2, 1) becomes (2, 7).
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Size 2 tuple representing position to reflect.
+
+        Returns
+        -------
+        tuple of int
+            Size 2 tuple of the reflected position.
+        """
+        return pos[0], Board._COL_COUNT - 1 - pos[1]
+
+    @staticmethod
+    def mirror_move(move):
+        """Reflect both positions of a size 2 tuple (beg_pos, end_pos) left
+        to right (see Board.mirror_pos())."""
+        return Board.mirror_pos(move[0]), Board.mirror_pos(move[1])
 
     @staticmethod
     def get_ROW_COUNT():
@@ -1017,6 +2433,11 @@ class Board:
         """Getter. Gets the total number of columns on the board."""
         return Board._COL_COUNT
 
+    @staticmethod
+    def get_SQUARE_COUNT():
+        """Getter. Gets the total number of squares on the board."""
+        return Board._SQUARE_COUNT
+
     @staticmethod
     def get_diag_dirs():
         """Getter. Returns all diagonal directions."""
@@ -1072,6 +2493,13 @@ class Piece:
         self._player = player
         self._positions = Stack()
         self._positions.push(start_pos)
+        self._alive = True  # False once captured.
+
+        # Hash keys (indexed by square) for this kind of piece and color,
+        # and the keys of the mirrored squares for the mirror hash.
+        self._zobrist_keys = Zobrist.get_piece_keys(player.get_color(), abbrev)
+        self._mirror_zobrist_keys = Zobrist.get_mirror_piece_keys(
+            player.get_color(), abbrev)
 
         # For printing use only. Names will have the form
         # <abbrev>-<player-first-letter>-<id_num>
@@ -1093,10 +2521,32 @@ class Piece:
         """Getter. Get the position of the piece."""
         return self._positions.peek()
 
+    def get_zobrist_keys(self):
+        """Getter. Get the tuple of the piece's hash keys indexed by square."""
+        return self._zobrist_keys
+
+    def get_mirror_zobrist_keys(self):
+        """Getter. Get the tuple of the piece's hash keys of the mirrored
+        squares indexed by square (see Zobrist.get_mirror_piece_keys())."""
+        return self._mirror_zobrist_keys
+
+    def is_alive(self):
+        """Predicate. True if the piece has not been captured."""
+        return self._alive
+
+    def set_alive(self, alive):
+        """Setter. Mark the piece as captured (False) or not (True)."""
+        self._alive = alive
+
     def push(self, pos):
         """Setter. Update the position of the piece."""
         self._positions.push(pos)
 
+    def reset_pos(self, pos):
+        """Setter. Discard the piece's position history and place it at pos."""
+        self._positions = Stack()
+        self._positions.push(pos)
+
     def pop(self):
         """Clear the most recent position from the piece's history."""
         return self._positions.pop()
@@ -1156,17 +2606,70 @@ class Piece:
 
         Returns
         -------
-        None
+        None
+        """
+        # Stop if path is empty.
+        if len(path) < 1:
+            return
+        piece = board.get_piece(path[-1])  # Examine pos at end of path.
+
+        # Shorten the path by one position if there is any piece
+        # at the end.
+        if (piece is not None):
+            path.pop()
+
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time so that
+        callers stopping at the first legal move can skip the rest.
+
+        Parameters
+        ----------
+        board: Board
+            Board the piece is placed on.
+
+        Yields
+        ------
+        tuple of int
+            Positions the piece can move to.
+        """
+        yield from self.get_moves(board)
+
+    def iter_fast_moves(self, board):
+        """Generator. Same as iter_moves() except that moves only have to be
+        legal once checked by XiangqiGame.push_fast_move(), which tests
+        whether the mover's general is left attacked. Only differs for the
+        general, whose moves then skip building the enemy threat map.
+
+        Parameters
+        ----------
+        board: Board
+            Board the piece is placed on.
+
+        Yields
+        ------
+        tuple of int
+            Positions the piece may move to.
+        """
+        yield from self.iter_moves(board)
+
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if the piece can move to end_pos according to how
+        it moves, without checking whether the move leaves its own general
+        in check. Subclasses test the single position directly.
+
+        Parameters
+        ----------
+        board: Board
+            Board the piece is placed on.
+        end_pos: tuple of int
+            Position to move to.
+
+        Returns
+        -------
+        bool
+            True if end_pos is in the piece's move list. Otherwise False.
         """
-        # Stop if path is empty.
-        if len(path) < 1:
-            return
-        piece = board.get_piece(path[-1])  # Examine pos at end of path.
-
-        # Shorten the path by one position if there is any piece
-        # at the end.
-        if (piece is not None):
-            path.pop()
+        return end_pos in self.get_moves(board)
 
 
 class General(Piece):
@@ -1176,7 +2679,6 @@ class General(Piece):
     """
     _ABBREV = 'g'
     _INIT_COLS = (4,)
-    _ORTHO_DIST = 1
 
     def __init__(self, player, id_num):
         """Create an object of type General with location based on player."""
@@ -1192,6 +2694,11 @@ class General(Piece):
         """Inherit __str__ of base class."""
         return super().__str__()
 
+    @staticmethod
+    def get_INIT_COLS():
+        """Getter. Get the starting columns of the General."""
+        return General._INIT_COLS
+
     def get_moves(self, board):
         """Get all the moves where a the general can move to. Moves are
         restricted to Castle and do not include positions that can be
@@ -1207,26 +2714,39 @@ class General(Piece):
         list of tuple of int
             List of positions.
         """
-        pos = self._positions.peek()
+        return list(self.iter_moves(board))
 
-        moves = list()
-
-        # Grab all non-friendly orthogonal positions _ORTHO_DIST
-        # positions away.
-        for path_dir in board.get_ortho_dirs():
-            path = board.find_ortho_path(pos, path_dir, self._ORTHO_DIST)
-            super().remove_friendly(path, board)
-            # Restrict to castle
-            path = [tmp_pos for tmp_pos in path
-                    if board.is_in_castle(tmp_pos, self._player)]
-            moves += path
-
-        # Get enemy threat.
-        opponent = self._player.get_opponent()
-        threat = opponent.get_threat(board)
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time. The
+        enemy threat is only computed once a position inside the castle is
+        found free of friendly pieces."""
+        pos = self._positions.peek()
+        threat = None
+
+        for step in board.get_general_steps(pos, self._player.get_color()):
+            if not self.is_friendly(board.get_piece(step)):
+                if threat is None:
+                    threat = self._player.get_opponent().get_threat(board)
+                if step not in threat:
+                    yield step
+
+    def iter_fast_moves(self, board):
+        """Generator. Steps inside the castle free of friendly pieces. Enemy
+        threats are left to XiangqiGame.push_fast_move() (see
+        Piece.iter_fast_moves())."""
+        pos = self._positions.peek()
+        for step in board.get_general_steps(pos, self._player.get_color()):
+            if not self.is_friendly(board.get_piece(step)):
+                yield step
 
-        # Prevent general from moving in to enemy threat area.
-        return list(set(moves) - threat.keys())
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos is one step away inside the castle,
+        free of friendly pieces and not under enemy threat."""
+        pos = self._positions.peek()
+        return (end_pos in board.get_general_steps(pos,
+                                                   self._player.get_color())
+                and not self.is_friendly(board.get_piece(end_pos))
+                and end_pos not in self._player.get_opponent().get_threat(board))
 
     def get_enemy_castle_sight(self, board):
         """Find all positions in the enemy's castle directly visible by the calling
@@ -1243,39 +2763,36 @@ class General(Piece):
             List of positions.
         """
         opponent = self._player.get_opponent()
-        enemy_gen = opponent.get_pieces()[Player.get_GENERAL()][0]
-        castle = board.get_castle(self._player.get_opponent().get_color())
+        enemy_gen = opponent.get_general()
+        castle = board.get_castle(opponent.get_color())
         castle_sight = []  # List of positions the calling general threatens
         current_pos = self._positions.peek()
         col = current_pos[board.get_COL()]
 
+        # Pieces allowed in between. Becomes 1 once the enemy general is
+        # passed which allows calling general to threaten empty positions
+        # behind enemy general (because if enemy general moved vertically
+        # they would still be in line of sight of calling general).
+        allowed = 0
+
         # Traverse enemy castle column from outter most row to enemy home rome.
         for pos in [castle_pos
                     for castle_pos in castle[::self._player.get_fwd_dir()]
                     if castle_pos[board.get_COL()] == col]:
 
             piece = board.get_piece(pos)
-            intervening = None
-
-            if piece is None or piece is enemy_gen:
-                # Note that find_intervening_ortho() will not raise
-                # SamePositionError as the General's will never visit the enemy
-                # castle.
-                intervening = board.find_intervening_ortho(current_pos, pos)
-                if intervening is None or intervening is enemy_gen:
-                    # Inetervening is enemy general allows calling general to
-                    # threaten empty columns behind enemy general (because if
-                    # enemy general moved vertically they would still be in
-                    # line of sight of calling gneral.
-                    castle_sight.append(pos)
-                else:
-                    # Encountered General
-                    break
-            else:
-                # Encountered non-general Piece in castle. All columns behind
-                # it are not visible to calling general.
+
+            # Encountered non-general Piece in castle or a piece in between.
+            # All positions behind it are not visible to calling general.
+            if piece is not None and piece is not enemy_gen:
+                break
+            if board.count_between(current_pos, pos) > allowed:
                 break
 
+            castle_sight.append(pos)
+            if piece is enemy_gen:
+                allowed = 1
+
         return castle_sight
 
 
@@ -1284,7 +2801,6 @@ class Advisor(Piece):
     diagonally by 1 space. Attacks by contact."""
     _ABBREV = 'a'
     _INIT_COLS = (3, 5)  # Index with _id_num.
-    _DIAG_DIST = 1
 
     def __init__(self, player, id_num):
         """Create an object of type Adivsor with location based on player and
@@ -1315,20 +2831,25 @@ class Advisor(Piece):
         list of tuple of int
             List of positions.
         """
-        current_pos = self._positions.peek()
+        return list(self.iter_moves(board))
 
-        moves = list()
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
+        current_pos = self._positions.peek()
 
-        # Inspect each of the diagonal directions.
-        for diag_dir in board.get_diag_dirs():
-            pos = board.find_diag(current_pos, diag_dir, self._DIAG_DIST)
+        # Diagonal steps are restricted to the castle by the table.
+        for pos in board.get_advisor_steps(current_pos,
+                                           self._player.get_color()):
+            if not self.is_friendly(board.get_piece(pos)):
+                yield pos
 
-            # Restrict to castle.
-            if board.is_in_castle(pos, self._player):
-                piece = board.get_piece(pos)
-                if not self.is_friendly(piece):
-                    moves.append(pos)
-        return moves
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos is one diagonal away inside the castle
+        and free of friendly pieces."""
+        pos = self._positions.peek()
+        return (end_pos in board.get_advisor_steps(pos,
+                                                   self._player.get_color())
+                and not self.is_friendly(board.get_piece(end_pos)))
 
 
 class Elephant(Piece):
@@ -1336,8 +2857,6 @@ class Elephant(Piece):
     but can be blocked and cannot cross river. Attacks by contact."""
     _ABBREV = 'e'
     _INIT_COLS = (2, 6)  # Index with _id_num.
-    _ATTAC_DIST = 2
-    _BLOCK_DIST = 1
 
     def __init__(self, player, id_num):
         """Create an object of type Elephant with location based on player and
@@ -1370,30 +2889,30 @@ class Elephant(Piece):
         list of tuple of int
             List of positions.
         """
-        current_pos = self._positions.peek()
-
-        moves = list()
-
-        # Inspect each diagonal direction.
-        for diag_dir in board.get_diag_dirs():
+        return list(self.iter_moves(board))
 
-            adj_pos = board.find_diag(current_pos, diag_dir, dist=self._BLOCK_DIST)
-            pos = board.find_diag(current_pos, diag_dir, dist=self._ATTAC_DIST)
-            in_bounds = pos is not None
-
-            # If pos is in bounds, then adj is definitely in bounds as well so
-            # don't need to check adj OOB
-
-            # Make sure not jumping off board.
-            if in_bounds:
-                is_unblocked = board.get_piece(adj_pos) is None
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
+        current_pos = self._positions.peek()
 
-                # Only valid if not blocked nor across river.
-                if is_unblocked and not board.is_across_river(pos, self._player):
-                    piece = board.get_piece(pos)
-                    if not self.is_friendly(piece):
-                        moves.append(pos)
-        return moves
+        # Targets off the board or across the river are already left out of
+        # the table. Only valid if the eye is not blocked.
+        for pos, adj_pos in board.get_elephant_steps(
+                current_pos, self._player.get_color()):
+            if (board.get_piece(adj_pos) is None
+                    and not self.is_friendly(board.get_piece(pos))):
+                yield pos
+
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos is two diagonals away on the player's
+        side of the river with an empty eye and free of friendly pieces."""
+        current_pos = self._positions.peek()
+        for pos, adj_pos in board.get_elephant_steps(
+                current_pos, self._player.get_color()):
+            if pos == end_pos:
+                return (board.get_piece(adj_pos) is None
+                        and not self.is_friendly(board.get_piece(pos)))
+        return False
 
 
 class Horse(Piece):
@@ -1401,8 +2920,6 @@ class Horse(Piece):
     diagonal) but can be blocked orthogonally. Attacks by contact."""
     _ABBREV = 'h'
     _INIT_COLS = (1, 7)  # Index with _id_num.
-    _ORTHO_DIST = 1
-    _DIAG_DIST = 1
 
     def __init__(self, player, id_num):
         """Create an object of type Horse with location based on player and
@@ -1437,69 +2954,55 @@ class Horse(Piece):
             List of positions.
 
         """
-        pos = self._positions.peek()
-
-        # Find paths in each of the 4 ortho directions.
-        moves = list()
-        for ortho_dir in board.get_ortho_dirs():
-            # First move orthogonally one position.
-            ortho_path = board.find_ortho_path(pos, ortho_dir, self._ORTHO_DIST)
-
-            # Validate the ortho move.
-            empty = len(ortho_path) == 0
-            ortho_blocked = (board.get_piece(ortho_path[0])
-                             is not None if not empty else False)
-
-            # Choose next ortho direction if invalid.
-            if empty or ortho_blocked:
-                continue
-
-            # Get the first (and only position) from orthogonal path.
-            ortho_pos = ortho_path[0]
-
-            # Compute the diagonals (up to two valid ones) for the
-            # ortho position.
-            diag_positions = self.get_diag_positions(ortho_pos, ortho_dir,
-                                                     board)
-
-            # Add the valid diagonals to the move list.
-            moves += diag_positions
+        return list(self.iter_moves(board))
+
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
+        # Jumps off the board are already left out of the table. Only valid
+        # if the leg is not blocked.
+        for pos, leg in board.get_horse_steps(self._positions.peek()):
+            if (board.get_piece(leg) is None
+                    and not self.is_friendly(board.get_piece(pos))):
+                yield pos
+
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos is a horse jump away with the
+        orthogonal position in between (the leg) empty and end_pos free of
+        friendly pieces."""
+        leg = Horse.find_leg(self._positions.peek(), end_pos)
+        if leg is None:
+            return False
 
-        return moves
+        return (board.is_in_bounds(end_pos)
+                and board.get_piece(leg) is None
+                and not self.is_friendly(board.get_piece(end_pos)))
 
-    def get_diag_positions(self, ortho_pos, ortho_dir, board):
-        """Compute valid diagonal positions after computing the orthogonal
-        position.
+    @staticmethod
+    def find_leg(beg_pos, end_pos):
+        """Find the leg of a horse jump: the orthogonal neighbour of beg_pos
+        in the direction of the long side of the jump.
 
         Parameters
         ----------
-        ortho_pos: tuple of int
-            Position to jump from.
-        ortho_dir: tuple of int
-            Orthogonal direction from horse.
-        board: Board
-            Board the Horse is located on.
+        beg_pos: tuple of int
+            Position jumped from.
+        end_pos: tuple of int
+            Position jumped to.
 
         Returns
         -------
-        list of tuple of int
-            List of diagonal positions.
+        tuple of int
+            Position of the leg. None if end_pos is not a horse jump away.
         """
-        horse_dirs = board.get_horse_dirs()
-        diag_positions = list()  # at most size 2
-        diag_dirs = horse_dirs[ortho_dir]
-
-        # Look in the two horse diagonal directions.
-        for diag_dir in diag_dirs:
-            diag_pos = board.find_diag(ortho_pos, diag_dir, self._DIAG_DIST)
-
-            if diag_pos is not None:               # Make sure not jumping off board.
-                piece = board.get_piece(diag_pos)  # Get diagonal.
-                if not self.is_friendly(piece):    # Don't kill friendlies.
-                    diag_positions.append(diag_pos)
-
-        return diag_positions
-
+        row, col = beg_pos
+        delta_row = end_pos[Board.get_ROW()] - row
+        delta_col = end_pos[Board.get_COL()] - col
+
+        if abs(delta_row) == 2 and abs(delta_col) == 1:
+            return row + delta_row // 2, col
+        if abs(delta_row) == 1 and abs(delta_col) == 2:
+            return row, col + delta_col // 2
+        return None
 
 class Chariot(Piece):
     """Class to represent chariot piece. Can move until obstruction in
@@ -1539,16 +3042,28 @@ class Chariot(Piece):
             List of positions.
 
         """
+        return list(self.iter_moves(board))
+
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
         pos = self._positions.peek()
 
-        # Find paths in each of the 4 ortho directions.
-        moves = list()
-        for path_dir in board.get_ortho_dirs():
-            path = board.find_ortho_path(pos, path_dir)
-            super().remove_friendly(path, board)  # Don't capture own.
-            moves += path
+        # Slide to every empty position and capture the first piece in each
+        # of the 4 ortho directions unless it is our own.
+        yield from board.iter_ray_quiets(pos)
+        for end_pos in board.iter_ray_blockers(pos):
+            if not self.is_friendly(board.get_piece(end_pos)):
+                yield end_pos
 
-        return moves
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos shares a rank or file with no pieces
+        in between and is free of friendly pieces."""
+        pos = self._positions.peek()
+        return (pos != end_pos
+                and (pos[0] == end_pos[0] or pos[1] == end_pos[1])
+                and board.is_in_bounds(end_pos)
+                and board.count_between(pos, end_pos) == 0
+                and not self.is_friendly(board.get_piece(end_pos)))
 
 
 class Cannon(Piece):
@@ -1593,17 +3108,34 @@ class Cannon(Piece):
         list of tuple of int
             List of positions.
         """
+        return list(self.iter_moves(board))
+
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
         pos = self._positions.peek()
-        moves = list()
 
-        # Find paths and targets in each of the 4 ortho directions.
-        for path_dir in board.get_ortho_dirs():
-            path = board.find_ortho_path(pos, path_dir)
-            targets = self.get_targets_from_path(path, path_dir, board)
-            super().remove_last_piece(path, board)  # Can't attack directly.
-            moves += path + targets
+        # Slide to every empty position (the first piece each way can't be
+        # attacked directly) and add the targets behind the platforms.
+        yield from board.iter_ray_quiets(pos)
+        for end_pos in board.iter_cannon_targets(pos):
+            if self.is_hostile(board.get_piece(end_pos)):
+                yield end_pos
+
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos shares a rank or file and is either
+        empty with no pieces in between or an enemy piece with exactly one
+        piece (the platform) in between."""
+        pos = self._positions.peek()
+        if (pos == end_pos
+                or (pos[0] != end_pos[0] and pos[1] != end_pos[1])
+                or not board.is_in_bounds(end_pos)):
+            return False
 
-        return moves
+        target = board.get_piece(end_pos)
+        if target is None:
+            return board.count_between(pos, end_pos) == 0
+        return (self.is_hostile(target)
+                and board.count_between(pos, end_pos) == 1)
 
     def get_targets(self, board):
         """Get only the targets (not the paths). Used for determining check.
@@ -1618,51 +3150,10 @@ class Cannon(Piece):
         list of tuple of int
             List of positions.
         """
+        # Target will be first enemy item behind the platform.
         pos = self._positions.peek()
-
-        # Look for targets in each of the 4 ortho directions.
-        moves = list()
-        for path_dir in board.get_ortho_dirs():
-            path = board.find_ortho_path(pos, path_dir)
-            targets = self.get_targets_from_path(path, path_dir, board)
-            moves += targets
-
-        return moves
-
-    def get_targets_from_path(self, path, path_dir, board):
-        """Find target along a single path.
-
-
-
-        Parameters
-        ----------
-        path: list of tuple of int
-            Path along which cannon can move.
-        path_dir: tuple of int
-            Direction of the path from the canon.
-        board: Board
-            Board cannon is placed on
-
-        Returns
-        -------
-        return type
-            return description
-        """
-        targets = []
-        # Look for cannon's firing platform if path nonempty.
-        if len(path) > 0:
-            platform = board.get_piece(path[-1])
-            if platform is not None:
-                # Look for the target in the path in the same
-                # direction behind the platform.
-                attack_path = board.find_ortho_path(platform.get_pos(),
-                                                    path_dir)
-                if len(attack_path) > 0:
-                    # Target will be first enemy item behind the platform.
-                    target = board.get_piece(attack_path[-1])
-                    if self.is_hostile(target):
-                        targets.append(target.get_pos())
-        return targets
+        return [end_pos for end_pos in board.iter_cannon_targets(pos)
+                if self.is_hostile(board.get_piece(end_pos))]
 
 
 class Soldier(Piece):
@@ -1706,27 +3197,25 @@ class Soldier(Piece):
         list of tuple of int
             List of positions.
         """
-        pos = self._positions.peek()
-
-        # Allow column direction away from home row.
-        row_directions = [self._player.get_fwd_dir()]  # [_fwd_dir]
+        return list(self.iter_moves(board))
 
-        # Allow left and right movement if across river.
-        if board.is_across_river(pos, self._player):
-            row_directions.append(0)  # [_fwd_dir, 0]
-
-        # List of size two tuple directions. [(_fwd_dir, 0), (0, -1), (0, 1)]
-        path_dirs = [direc for direc in board.get_ortho_dirs()
-                     if direc[board.get_ROW()] in row_directions]
+    def iter_moves(self, board):
+        """Generator. Yield the positions of get_moves() one at a time."""
+        pos = self._positions.peek()
 
-        # Find orthogonal pieces with distance 1 in the above directions.
-        moves = list()
-        for path_dir in path_dirs:
-            path = board.find_ortho_path(pos, path_dir, 1)
-            super().remove_friendly(path, board)
-            moves += path
+        # The table holds the forward step and, across the river, the left
+        # and right steps.
+        for step in board.get_soldier_steps(pos, self._player.get_color()):
+            if not self.is_friendly(board.get_piece(step)):
+                yield step
 
-        return moves
+    def is_pseudo_legal(self, board, end_pos):
+        """Predicate. Checks if end_pos is one of the soldier's steps and free
+        of friendly pieces."""
+        pos = self._positions.peek()
+        return (end_pos in board.get_soldier_steps(pos,
+                                                   self._player.get_color())
+                and not self.is_friendly(board.get_piece(end_pos)))
 
 
 class Player:
@@ -1756,16 +3245,20 @@ class Player:
     # Dictionary for helping creating pieces. For 'class' value iterate
     # across different derived classes __init__ methods to create the
     # specific pieces for the player.
+    # 'letter' is the upper case letter used for the piece kind in text
+    # notations such as material signatures.
     _PIECE_DCTS = [
-        {'key': _GENERAL, 'class': General, 'count': 1},
-        {'key': _ADVISOR, 'class': Advisor, 'count': 2},
-        {'key': _ELEPHANT, 'class': Elephant, 'count': 2},
-        {'key': _HORSE, 'class': Horse, 'count': 2},
-        {'key': _CHARIOT, 'class': Chariot, 'count': 2},
-        {'key': _CANNON, 'class': Cannon, 'count': 2},
-        {'key': _SOLDIER, 'class': Soldier, 'count': 5},
+        {'key': _GENERAL, 'class': General, 'count': 1, 'letter': 'K'},
+        {'key': _ADVISOR, 'class': Advisor, 'count': 2, 'letter': 'A'},
+        {'key': _ELEPHANT, 'class': Elephant, 'count': 2, 'letter': 'B'},
+        {'key': _HORSE, 'class': Horse, 'count': 2, 'letter': 'N'},
+        {'key': _CHARIOT, 'class': Chariot, 'count': 2, 'letter': 'R'},
+        {'key': _CANNON, 'class': Cannon, 'count': 2, 'letter': 'C'},
+        {'key': _SOLDIER, 'class': Soldier, 'count': 5, 'letter': 'P'},
     ]
 
+    _CLASS_KEYS = {dct['class']: dct['key'] for dct in _PIECE_DCTS}
+
     # Player specific locations.
     _HOME_ROWS = {_BLACK: 0, _RED: 9}
     _FWD_DIRS = {_BLACK: 1, _RED: -1}
@@ -1782,11 +3275,19 @@ class Player:
         self._color = color
 
         # CREATE ALL THE PLAYER'S PIECES.
-        # Create as a dictionary of lists indexed by the above class
-        # level constant keys.
-        self._pieces = {dct['key']:
-                        [dct['class'](self, i) for i in range(dct['count'])]
-                        for dct in Player._PIECE_DCTS}
+        # Create as a fixed table holding every piece the player can ever
+        # have, in the order of _PIECE_DCTS. Captured pieces stay in the
+        # table and are marked as not alive. _slots gives the table
+        # indices of each kind of piece by the above class level constant
+        # keys.
+        self._table = []
+        self._slots = {}
+        for dct in Player._PIECE_DCTS:
+            start = len(self._table)
+            self._table += [dct['class'](self, i) for i in range(dct['count'])]
+            self._slots[dct['key']] = range(start, len(self._table))
+        self._general = self._table[self._slots[Player._GENERAL][0]]
+
         self._opponent = None  # Wait to assign, not yet created.
         self._home_row = Player._HOME_ROWS[self._color]
         self._fwd_dir = Player._FWD_DIRS[self._color]
@@ -1822,8 +3323,14 @@ class Player:
         if opponent.get_in_check():
             return False
 
+        general = self._general
+
+        # Facing the enemy general is answered by the occupancy masks alone.
+        if board.is_flying_general(general.get_pos(),
+                                   opponent.get_general().get_pos()):
+            return True
+
         threat = opponent.get_threat(board)
-        general = self._pieces[self.get_GENERAL()][0]
 
         # If general under attack, then the Player is currently in check.
         if general.get_pos() in threat:
@@ -1866,6 +3373,61 @@ class Player:
 
         return threat
 
+    def find_checkers(self, board):
+        """Find the opponent's pieces attacking the player's general.
+
+        Parameters
+        ----------
+        board: Board
+            Current play board.
+
+        Returns
+        -------
+        list of Piece
+            Pieces giving check. Empty if the player is not in check.
+        """
+        general_pos = self._general.get_pos()
+        return [piece for piece in Player.get_all_pieces(self._opponent)
+                if not isinstance(piece, General)
+                and piece.is_pseudo_legal(board, general_pos)]
+
+    def find_check_answers(self, board, checker):
+        """Find where a move has to end, or which square it has to leave,
+        to answer the check of one checker with a piece other than the
+        general.
+
+        Parameters
+        ----------
+        board: Board
+            Current play board.
+        checker: Piece
+            Opponent's piece giving check (see find_checkers()).
+
+        Returns
+        -------
+        tuple of set
+            Size 2 tuple (ends, screens). ends holds the checker's position
+            (capture) and the positions blocking the check: the horse leg
+            or the empty squares between a chariot or cannon and the
+            general. screens holds the position of a cannon's screen, which
+            answers the check by moving away.
+        """
+        general_pos = self._general.get_pos()
+        checker_pos = checker.get_pos()
+        ends = {checker_pos}
+        screens = set()
+
+        if isinstance(checker, Horse):
+            ends.add(Horse.find_leg(checker_pos, general_pos))
+        elif isinstance(checker, (Chariot, Cannon)):
+            for pos in Board.find_between(checker_pos, general_pos):
+                if board.get_piece(pos) is None:
+                    ends.add(pos)
+                else:
+                    screens.add(pos)
+
+        return ends, screens
+
     def find_key(self, piece):
         """Lookup the string key for the given Piece.
 
@@ -1879,9 +3441,7 @@ class Player:
         str
             Dictionary key for the piece.
         """
-        for dct in self._PIECE_DCTS:
-            if isinstance(piece, dct['class']):
-                return dct['key']
+        return Player._CLASS_KEYS[type(piece)]
 
     def belongs_to(self, piece):
         """Predicate.
@@ -1894,13 +3454,13 @@ class Player:
         Returns
         -------
         bool
-            True if owned by player otherwise False.
+            True if owned by player (and not captured) otherwise False.
         """
-        key = self.find_key(piece)
-        return piece in self._pieces[key]
+        return piece.get_player() is self and piece.is_alive()
 
     def remove_piece(self, piece):
-        """Remove a piece from the player's ownership.
+        """Remove a piece from the player's ownership by marking it as not
+        alive. The piece keeps its place in the piece table.
 
         Mostly used to update player after one if its pieces has been
         captured.
@@ -1915,8 +3475,7 @@ class Player:
         None
 
         """
-        key = self.find_key(piece)
-        self._pieces[key].remove(piece)
+        piece.set_alive(False)
 
     def add_piece(self, piece):
         """(Re)Add a piece to the player's ownership.
@@ -1932,13 +3491,69 @@ class Player:
         -------
         None
         """
-        key = self.find_key(piece)
-
         # Avoid re-adding Pieces that already belong to the player.
-        if piece in self._pieces[key]:
+        if piece.is_alive():
             raise AlreadyInPieceList(piece, self)
 
-        self._pieces[key].append(piece)
+        piece.set_alive(True)
+
+    def revive_piece(self, key, pos):
+        """Bring back a captured piece of the given kind at pos. Used when
+        taking back moves, where only the kind of the captured piece is
+        recorded.
+
+        Raises
+        ------
+        TooManyPiecesError:
+            When none of the player's pieces of the kind are captured.
+
+        Parameters
+        ----------
+        key: str
+            Piece dictionary key (e.g. Player.get_CHARIOT()).
+        pos: tuple of int
+            Position of the piece.
+
+        Returns
+        -------
+        Piece
+            The revived piece.
+        """
+        for i in self._slots[key]:
+            piece = self._table[i]
+            if not piece.is_alive():
+                piece.reset_pos(pos)
+                piece.set_alive(True)
+                return piece
+        raise TooManyPiecesError(key, len(self._slots[key]) + 1, self._color)
+
+    def place_pieces(self, positions):
+        """Replace all of the player's pieces with ones at the given
+        positions. Counts are assumed already checked with
+        Player.validate_piece_counts(). The pieces in the player's piece
+        table are reused, so any outside references to them should be
+        dropped.
+
+        Parameters
+        ----------
+        positions: dict
+            Keys are piece dictionary keys (e.g. Player.get_CHARIOT()) and
+            values lists of positions for the pieces of that kind. Missing
+            keys mean the player has none of that kind.
+
+        Returns
+        -------
+        None
+        """
+        for key, slots in self._slots.items():
+            key_positions = positions.get(key, [])
+            for n, i in enumerate(slots):
+                piece = self._table[i]
+                if n < len(key_positions):
+                    piece.reset_pos(key_positions[n])
+                    piece.set_alive(True)
+                else:
+                    piece.set_alive(False)
 
     def set_opponent(self, opponent):
         """Setter. `opponent` must be object of type Player."""
@@ -1964,9 +3579,38 @@ class Player:
             _CANNON
             _SOLDIER
         Each value is a list of the Player's remaining pieces of each key's
-        specified type.
+        specified type. The dictionary is built from the piece table on
+        each call.
         """
-        return self._pieces
+        return {key: [self._table[i] for i in slots
+                      if self._table[i].is_alive()]
+                for key, slots in self._slots.items()}
+
+    def get_table_positions(self):
+        """Getter. Get a tuple of the positions of the pieces in the piece
+        table, None for captured pieces."""
+        return tuple(piece.get_pos() if piece.is_alive() else None
+                     for piece in self._table)
+
+    def set_table_positions(self, positions):
+        """Setter. Place the pieces in the piece table at the positions
+        given by Player.get_table_positions(), capturing those at None.
+        The Board must be reset afterwards (see Board.reset())."""
+        for piece, pos in zip(self._table, positions):
+            if pos is None:
+                piece.set_alive(False)
+            else:
+                piece.reset_pos(pos)
+                piece.set_alive(True)
+
+    def get_piece_table(self):
+        """Getter. Get the list of every piece the player can have, captured
+        or not, in the order of _PIECE_DCTS."""
+        return self._table
+
+    def get_general(self):
+        """Getter. Get the player's general."""
+        return self._general
 
     def get_home_row(self):
         """Getter. Get the home row (initial row where general starts) of the
@@ -1993,16 +3637,60 @@ class Player:
             List of all the pieces of the specified players.
 
         """
-        pieces = []  # List to add player pieces to.
+        # For each player, take their remaining pieces from the table.
+        return [piece for player in args for piece in player.get_piece_table()
+                if piece.is_alive()]
+
+    @staticmethod
+    def validate_piece_counts(positions, color):
+        """Validate the number of pieces of each kind for one player.
+
+        Raises
+        ------
+        TooManyPiecesError:
+            When there are more pieces of a kind than in a new game, when
+            there is no general or when a key is not a piece kind.
+
+        Parameters
+        ----------
+        positions: dict
+            Keys are piece dictionary keys and values lists of positions.
+        color: str
+            Color of the player the pieces are for.
+
+        Returns
+        -------
+        None
+        """
+        counts = {dct['key']: dct['count'] for dct in Player._PIECE_DCTS}
+        for key, key_positions in positions.items():
+            if len(key_positions) > counts.get(key, 0):
+                raise TooManyPiecesError(key, len(key_positions), color)
+        if len(positions.get(Player._GENERAL, [])) != 1:
+            raise TooManyPiecesError(Player._GENERAL,
+                                     len(positions.get(Player._GENERAL, [])),
+                                     color)
 
-        # For each player, add their remaining pieces to the list.
-        for player in args:
-            piece_dct = player.get_pieces()
+    @staticmethod
+    def get_PIECE_KEYS():
+        """Getter. Get the tuple of all piece dictionary keys."""
+        return tuple(dct['key'] for dct in Player._PIECE_DCTS)
 
-            for class_key, piece_sublist in piece_dct.items():
-                pieces += piece_sublist
+    @staticmethod
+    def get_piece_letter(key):
+        """Get the upper case letter for a piece dictionary key."""
+        for dct in Player._PIECE_DCTS:
+            if dct['key'] == key:
+                return dct['letter']
 
-        return pieces
+    @staticmethod
+    def get_piece_key(letter):
+        """Get the piece dictionary key for a letter (either case). Returns
+        None if the letter is not used for any piece kind."""
+        for dct in Player._PIECE_DCTS:
+            if dct['letter'] == letter.upper():
+                return dct['key']
+        return None
 
     @staticmethod
     def get_RED():
@@ -2019,6 +3707,12 @@ class Player:
         """Getter. Return tuple of all color strings."""
         return Player._COLORS
 
+    @staticmethod
+    def get_FWD_DIRS():
+        """Getter. Get _FWD_DIRS dictionary of row directions away from each
+        color's home row."""
+        return Player._FWD_DIRS
+
     @staticmethod
     def get_GENERAL():
         """Getter. Get dictionary key for General."""
@@ -2098,6 +3792,79 @@ class Stack:
         return val
 
 
+class Zobrist:
+    """Class holding the random keys used to hash board positions.
+
+    Every (color, piece kind, square) combination is assigned a random 64 bit
+    key and a position's hash is the XOR of the keys of all pieces on the
+    board (plus the side key when 'black' is to move). The keys come from a
+    fixed seed so that hashes are stable between processes and runs, which
+    allows them to be stored on disk (e.g. in an opening book).
+
+    The mirror keys of a square are the keys of the square reflected left to
+    right, so hashing a position with them gives the hash of its mirror
+    image (see XiangqiGame.get_canonical_hash()).
+    """
+    _SEED = 20200301
+    _BITS = 64
+
+    # Filled in by Zobrist.make_keys() once all piece classes exist.
+    _PIECE_KEYS = {}
+    _MIRROR_PIECE_KEYS = {}
+    _SIDE_KEY = 0
+
+    @staticmethod
+    def make_keys():
+        """Generate the key tables. Called once when the module is loaded."""
+        rng = random.Random(Zobrist._SEED)
+        for color in Player.get_COLORS():
+            for dct in Player._PIECE_DCTS:
+                abbrev = dct['class']._ABBREV
+                keys = tuple(rng.getrandbits(Zobrist._BITS)
+                             for sq in range(Board.get_SQUARE_COUNT()))
+                Zobrist._PIECE_KEYS[(color, abbrev)] = keys
+                Zobrist._MIRROR_PIECE_KEYS[(color, abbrev)] = tuple(
+                    keys[Board.pos_to_sq(Board.mirror_pos(pos))]
+                    for pos in map(Board.sq_to_pos,
+                                   range(Board.get_SQUARE_COUNT())))
+        Zobrist._SIDE_KEY = rng.getrandbits(Zobrist._BITS)
+
+    @staticmethod
+    def get_piece_keys(color, abbrev):
+        """Getter. Get the keys for a piece kind indexed by square.
+
+        Parameters
+        ----------
+        color: str
+            Color of the player owning the piece.
+        abbrev: str
+            Abbreviation of the piece kind (e.g. General._ABBREV).
+
+        Returns
+        -------
+        tuple of int
+            Tuple of 90 keys, one for each square.
+        """
+        return Zobrist._PIECE_KEYS[(color, abbrev)]
+
+    @staticmethod
+    def get_mirror_piece_keys(color, abbrev):
+        """Getter. Get the keys for a piece kind indexed by square, where the
+        key of a square is the key of its mirror image (see
+        Board.mirror_pos()). Parameters as Zobrist.get_piece_keys()."""
+        return Zobrist._MIRROR_PIECE_KEYS[(color, abbrev)]
+
+    @staticmethod
+    def get_side_key():
+        """Getter. Get the key hashed in when 'black' is to move."""
+        return Zobrist._SIDE_KEY
+
+
+Zobrist.make_keys()
+Board.make_tables()
+Board.make_ray_tables()
+
+
 class AlgNot:
     """Class to handle the board's Algebraic notation positional reference."""
     _ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
@@ -2176,6 +3943,77 @@ class AlgNot:
         # Return the row and column indices.
         return (Board._ROW_COUNT - alg_num, AlgNot._ALPHABET_DCT[alg_letter])
 
+    @staticmethod
+    def row_col_to_alg(pos):
+        """Converts a row and column indices tuple to algebraic notation.
+        Inverse of AlgNot.alg_to_row_col().
+
+        Parameters
+        ----------
+        pos: tuple of int
+            Size 2 tuple of integers indicating row and column indices.
+
+        Returns
+        -------
+        str
+            Location on board in algebraic notation.
+        """
+        row, col = pos
+        return f'{AlgNot._ALPHABET[col]}{Board._ROW_COUNT - row}'
+
+    @staticmethod
+    def ucci_to_row_col(ucci_str):
+        """Converts a UCCI (engine protocol) square to row and column indices.
+
+        UCCI squares are the same as algebraic notation except that rows
+        are numbered from 0 rather than 1, so UCCI 'h2' is algebraic 'h3'.
+
+        Raises
+        ------
+        AlgStrFormattingError:
+            When the square is not valid.
+
+        Parameters
+        ----------
+        ucci_str: str
+            Square in UCCI notation, e.g. 'e0'.
+
+        Returns
+        -------
+        tuple of int
+            Size 2 tuple of integers indicating row and column indices.
+        """
+        if len(ucci_str) != 2 or not ucci_str[1].isdigit():
+            raise UcciStrFormattingError(ucci_str)
+        return AlgNot.alg_to_row_col(ucci_str[0] + str(int(ucci_str[1]) + 1))
+
+    @staticmethod
+    def row_col_to_ucci(pos):
+        """Converts row and column indices to a UCCI square. Inverse of
+        AlgNot.ucci_to_row_col()."""
+        row, col = pos
+        return f'{AlgNot._ALPHABET[col]}{Board._ROW_COUNT - 1 - row}'
+
+    @staticmethod
+    def ucci_move_to_row_col(move_str):
+        """Converts a UCCI move such as 'h2e2' to a size 2 tuple of positions
+        (beg_pos, end_pos).
+
+        Raises
+        ------
+        AlgStrFormattingError:
+            When the move is not valid.
+        """
+        if len(move_str) != 4:
+            raise UcciStrFormattingError(move_str)
+        return (AlgNot.ucci_to_row_col(move_str[:2]),
+                AlgNot.ucci_to_row_col(move_str[2:]))
+
+    @staticmethod
+    def row_col_to_ucci_move(beg_pos, end_pos):
+        """Converts a move given as two positions to a UCCI move string."""
+        return AlgNot.row_col_to_ucci(beg_pos) + AlgNot.row_col_to_ucci(end_pos)
+
 
 class Error(Exception):
     """Base class for all exceptions."""
@@ -2229,6 +4067,37 @@ class AlgNumOutOfBoundsError(AlgStrFormattingError):
                          + 'inclusive.')
 
 
+class UcciStrFormattingError(AlgStrFormattingError):
+    """Exception class for when a UCCI square or move string is not of the
+    form letter then digit (square) or twice that (move)."""
+    def __init__(self, ucci_str):
+        """Create an instance of UcciStrFormattingError."""
+        self._ucci_str = ucci_str
+        super().__init__(f'Invalid UCCI square or move "{ucci_str}".')
+
+
+class FenFormattingError(Error):
+    """Exception class for when a FEN string can not be parsed."""
+    def __init__(self, fen, reason):
+        """Create an instance of FenFormattingError.
+
+        fen should be the offending string and reason a short description
+        of what is wrong with it.
+        """
+        self._fen = fen
+        self._reason = reason
+        super().__init__(f'Invalid FEN "{fen}": {reason}.')
+
+
+class PlyOutOfRangeError(Error):
+    """Exception class for going to a ply outside of a game's history."""
+    def __init__(self, ply, max_ply):
+        """Create an instance of PlyOutOfRangeError."""
+        self._ply = ply
+        self._max_ply = max_ply
+        super().__init__(f'Ply {ply} is not in [0..{max_ply}].')
+
+
 class IllegalMoveError(Error):
     """Base class for performing invalid moves."""
     pass
@@ -2333,6 +4202,31 @@ class OutOfBoundsError(BoardError):
         super().__init__(self._msg)
 
 
+class DuplicatePositionError(BoardError):
+    """Exception class for when setting up two pieces on the same position."""
+    def __init__(self, pos):
+        """Create an instance of DuplicatePositionError.
+
+        pos should be the position given to more than one piece.
+        """
+        self._pos = pos
+        self._msg = f'More than one piece placed at {pos}.'
+        super().__init__(self._msg)
+
+
+class InactiveInCheckError(BoardError):
+    """Exception class for when a position is set up where the player not
+    to move is in check (i.e. their general could be taken)."""
+    def __init__(self, player):
+        """Create an instance of InactiveInCheckError.
+
+        player should be the player in check while not to move.
+        """
+        self._player = player
+        self._msg = f'Player ({player}) is in check but is not to move.'
+        super().__init__(self._msg)
+
+
 class PlayerError(Error):
     """Base exception class for Player errors"""
     pass
@@ -2353,6 +4247,22 @@ class AlreadyInPieceList(PlayerError):
         super().__init__(self._msg)
 
 
+class TooManyPiecesError(PlayerError):
+    """Exception class for when setting up a player with an invalid number of
+    pieces of one kind."""
+    def __init__(self, key, count, color):
+        """Create an instance of TooManyPiecesError.
+
+        key should be the offending piece kind, count how many were given
+        and color the player they were given to.
+        """
+        self._key = key
+        self._count = count
+        self._color = color
+        self._msg = f'Invalid number of {key} pieces ({count}) for {color}.'
+        super().__init__(self._msg)
+
+
 if __name__ == '__main__':
     # For python shell manual testing.
     game = XiangqiGame()